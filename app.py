@@ -4,13 +4,20 @@ import os
 import random
 import secrets
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from functools import wraps
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 
 from flask import (
     Flask,
+    Response,
     abort,
+    g,
+    has_request_context,
     jsonify,
     redirect,
     render_template,
@@ -21,16 +28,79 @@ from flask import (
 )
 from werkzeug.security import generate_password_hash
 
-from services.datasets import compute_stats, list_datasets, load_rows
-from services.draws import apply_filters, balance_pool_by_tiers, draw_assignments, make_bracket, make_round_robin
+from services.bracket import MAX_ENTRANTS as MAX_BRACKET_ENTRANTS
+from services.bracket import Bracket, entrant_ratings, replay, seed_order
+from services.datasets import (
+    DatasetNotFound,
+    cached_entries,
+    compute_facets,
+    compute_stats,
+    dataset_viewer,
+    list_datasets,
+    load_versioned,
+    register_dataset,
+    unregister_dataset,
+    user_dataset_csv,
+)
+from services.draft import DRAFT_ATTRS, MAX_POOL, UNDO, Draft
+from services.draft import replay as replay_draft
+from services.draws import (
+    balance_pool_by_tiers,
+    draw_indices,
+    make_bracket,
+    make_round_robin,
+    round_robin_page,
+    round_robin_rounds,
+    round_robin_size,
+    TEAM_FIELDS,
+)
+from services.fragments import Splicer, draw_row_fragment, dumps, team_fragment
+from services.fragments import stats as fragment_stats
+from services.groups import MAX_TEAMS as MAX_GROUP_TEAMS
+from services.groups import DrawTimeout, draw_groups
+from services.memory import GROUPS as MEMORY_GROUPS
+from services.memory import MEMORY
+from services.metrics import METRICS
+from services.pool_cache import CACHE as POOL_CACHE
+from services.pool_cache import SET_FILTERS, resolve_pool_ids, resolve_pool_page
+from services.pools import pools_body, presets_report, room_filters
+from services.profiling import HEADER as PROFILE_HEADER
+from services.profiling import PROFILER, folded, top_functions
+from services.response_cache import RESPONSES
+from services.ratings import LEADERBOARD_FIELDS, leaderboard, parse_result, player_history, record_results
+from services.search import indexes as search_indexes
+from services.search import search_teams
+from services.simulate import MAX_PARTICIPANTS as MAX_SIMULATE_TEAMS
+from services.simulate import seed_int, simulate_bracket, simulate_season, sport_for
+from services.swiss import pair_round
+from services.uploads import (
+    MAX_UPLOAD_BYTES,
+    UploadTooLarge,
+    convert_upload,
+    load_schema,
+    new_dataset_key,
+    save_stream,
+    upload_path,
+)
 
 APP_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(APP_DIR, "data", "history.sqlite3")
-POOLS_PATH = os.path.join(APP_DIR, "data", "pools.json")
+# HISTORY_DB aponta para outro arquivo (teste de carga sem sujar o historico).
+DB_PATH = os.getenv("HISTORY_DB") or os.path.join(APP_DIR, "data", "history.sqlite3")
 
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "dev-secret")
 
+# Chaveamentos ja reconstruidos neste processo: id -> (seq, arvore). Outros workers alcancam pelo log de ops.
+# LRU com LIVE_CACHE_SIZE entradas; quem sai e reconstruido do log na proxima leitura.
+LIVE_CACHE_SIZE = int(os.getenv("LIVE_CACHE_SIZE", "256"))
+_BRACKETS: "OrderedDict[str, Tuple[int, Bracket]]" = OrderedDict()
+_BRACKETS_LOCK = threading.Lock()
+# Mesmo esquema para drafts: id -> (seq, estado).
+_DRAFTS: "OrderedDict[str, Tuple[int, Draft]]" = OrderedDict()
+_DRAFTS_LOCK = threading.Lock()
+# Builds de datasets enviados rodam fora da requisicao, um por vez por processo.
+_UPLOAD_JOBS = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dataset-upload")
+
 ASSET_LINKS = [
     {
         "relation": ["delegate_permission/common.handle_all_urls"],
@@ -48,13 +118,78 @@ ASSET_LINKS = [
 ]
 
 
+SQL_KINDS = {"SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "COMMIT", "ROLLBACK", "CREATE", "ALTER", "PRAGMA"}
+
+
+def _count_sql(statement: str) -> None:
+    kind = statement.lstrip()[:8].split(None, 1)[0].upper() if statement.strip() else ""
+    METRICS.inc("sqlite_statements_total", (kind if kind in SQL_KINDS else "OTHER",))
+
+
+WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "BEGIN IMMEDIATE")
+
+
+def _timed_write(kind: str, fn: Callable[[], Any]) -> Any:
+    # Escritas esperam pelo lock do arquivo dentro do sqlite (busy timeout): o tempo delas mede a contencao.
+    started = time.perf_counter()
+    try:
+        return fn()
+    except sqlite3.OperationalError as e:
+        if "locked" in str(e) or "busy" in str(e):
+            METRICS.inc("sqlite_busy_total", (kind,))
+        raise
+    finally:
+        METRICS.observe("sqlite_write_seconds", time.perf_counter() - started, (kind,))
+
+
+def _write_kind(sql: str) -> Optional[str]:
+    head = sql.lstrip()[:15].upper()
+    for prefix in WRITE_PREFIXES:
+        if head.startswith(prefix):
+            return prefix.split()[0]
+    return None
+
+
+class _TimedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        kind = _write_kind(sql)
+        if kind is None:
+            return super().execute(sql, parameters)
+        return _timed_write(kind, lambda: super(_TimedCursor, self).execute(sql, parameters))
+
+    def executemany(self, sql, seq_of_parameters):
+        kind = _write_kind(sql) or "OTHER"
+        return _timed_write(kind, lambda: super(_TimedCursor, self).executemany(sql, seq_of_parameters))
+
+
+class _TimedConnection(sqlite3.Connection):
+    def cursor(self, factory=_TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        return _timed_write("COMMIT", super().commit)
+
+
+def db_connect(**kwargs: Any) -> sqlite3.Connection:
+    # Toda conexao do app passa por aqui para contar os comandos e medir as escritas (/metrics).
+    con = sqlite3.connect(DB_PATH, factory=_TimedConnection, **kwargs)
+    con.set_trace_callback(_count_sql)
+    return con
+
+
 def _now_iso() -> str:
     return datetime.utcnow().isoformat(timespec="seconds")
 
 
 def init_db() -> None:
     os.makedirs(os.path.join(APP_DIR, "data"), exist_ok=True)
-    con = sqlite3.connect(DB_PATH)
+    con = db_connect()
     try:
         cur = con.cursor()
         cur.execute(
@@ -94,29 +229,136 @@ def init_db() -> None:
             """
         )
 
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS brackets (
+                id TEXT PRIMARY KEY,
+                created_at TEXT NOT NULL,
+                entrants_json TEXT NOT NULL,
+                order_json TEXT NOT NULL,
+                seq INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS bracket_ops (
+                bracket_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                node INTEGER NOT NULL,
+                side INTEGER NOT NULL,
+                PRIMARY KEY (bracket_id, seq)
+            );
+            """
+        )
+
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS drafts (
+                id TEXT PRIMARY KEY,
+                created_at TEXT NOT NULL,
+                dataset_key TEXT NOT NULL,
+                participants_json TEXT NOT NULL,
+                rounds INTEGER NOT NULL,
+                pool_json TEXT NOT NULL,
+                seq INTEGER NOT NULL DEFAULT 0
+            );
+            """
+        )
+
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS draft_ops (
+                draft_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                op INTEGER NOT NULL,
+                PRIMARY KEY (draft_id, seq)
+            );
+            """
+        )
+
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dataset_uploads (
+                dataset_key TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                template TEXT NOT NULL,
+                status TEXT NOT NULL,
+                rows INTEGER NOT NULL DEFAULT 0,
+                report_json TEXT,
+                created_at TEXT NOT NULL,
+                finished_at TEXT
+            );
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_dataset_uploads_user ON dataset_uploads (user_id, created_at)")
+
+        # Ratings dos jogadores: log de resultados (fonte da verdade) + estado atual e historico derivados.
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rating_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at TEXT NOT NULL,
+                played_at INTEGER NOT NULL,
+                source TEXT NOT NULL,
+                ref TEXT,
+                player_a TEXT NOT NULL,
+                player_b TEXT NOT NULL,
+                score_a REAL NOT NULL
+            );
+            """
+        )
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_rating_events_ref ON rating_events (source, ref)")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS player_ratings (
+                player TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                elo REAL NOT NULL,
+                glicko REAL NOT NULL,
+                rd REAL NOT NULL,
+                games INTEGER NOT NULL,
+                wins INTEGER NOT NULL,
+                draws INTEGER NOT NULL,
+                losses INTEGER NOT NULL,
+                last_played INTEGER NOT NULL
+            );
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_player_ratings_elo ON player_ratings (elo DESC, player)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_player_ratings_glicko ON player_ratings (glicko DESC, player)")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rating_history (
+                player TEXT NOT NULL,
+                event_id INTEGER NOT NULL,
+                opponent TEXT NOT NULL,
+                score REAL NOT NULL,
+                elo REAL NOT NULL,
+                elo_delta REAL NOT NULL,
+                glicko REAL NOT NULL,
+                rd REAL NOT NULL,
+                PRIMARY KEY (player, event_id)
+            );
+            """
+        )
+
         con.commit()
     finally:
         con.close()
 
 
-def load_pools() -> Dict[str, Any]:
-    try:
-        with open(POOLS_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return data if isinstance(data, dict) else {}
-    except FileNotFoundError:
-        return {}
-    except Exception:
-        return {}
-
-
-def save_history(dataset_key: str, payload: Dict[str, Any]) -> None:
-    con = sqlite3.connect(DB_PATH)
+def save_history(dataset_key: str, payload: Union[Dict[str, Any], bytes]) -> None:
+    # Aceita o JSON ja montado da resposta para nao serializar o sorteio duas vezes.
+    payload_json = payload.decode("utf-8") if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False)
+    con = db_connect()
     try:
         cur = con.cursor()
         cur.execute(
             "INSERT INTO draws (created_at, dataset_key, payload_json) VALUES (?, ?, ?)",
-            (_now_iso(), dataset_key, json.dumps(payload, ensure_ascii=False)),
+            (_now_iso(), dataset_key, payload_json),
         )
         con.commit()
     finally:
@@ -124,7 +366,7 @@ def save_history(dataset_key: str, payload: Dict[str, Any]) -> None:
 
 
 def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
-    con = sqlite3.connect(DB_PATH)
+    con = db_connect()
     try:
         cur = con.cursor()
         cur.execute("SELECT id, email, password_hash, is_pro FROM users WHERE email = ?", (email,))
@@ -137,7 +379,7 @@ def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
 
 
 def create_user(email: str, password: str) -> Dict[str, Any]:
-    con = sqlite3.connect(DB_PATH)
+    con = db_connect()
     try:
         cur = con.cursor()
         cur.execute(
@@ -156,7 +398,7 @@ def generate_code(length: int = 6) -> str:
 
 
 def save_share(payload: Dict[str, Any]) -> str:
-    con = sqlite3.connect(DB_PATH)
+    con = db_connect()
     try:
         cur = con.cursor()
         for _ in range(5):
@@ -176,7 +418,7 @@ def save_share(payload: Dict[str, Any]) -> str:
 
 def load_share(code: str) -> Optional[Dict[str, Any]]:
     code = (code or "").strip().upper()
-    con = sqlite3.connect(DB_PATH)
+    con = db_connect()
     try:
         cur = con.cursor()
         cur.execute("SELECT payload_json FROM shares WHERE code = ?", (code,))
@@ -192,7 +434,7 @@ def update_share(code: str, payload: Dict[str, Any]) -> bool:
     code = (code or "").strip().upper()
     if not code:
         return False
-    con = sqlite3.connect(DB_PATH)
+    con = db_connect()
     try:
         cur = con.cursor()
         cur.execute("UPDATE shares SET payload_json = ? WHERE code = ?", (json.dumps(payload, ensure_ascii=False), code))
@@ -200,6 +442,417 @@ def update_share(code: str, payload: Dict[str, Any]) -> bool:
         return cur.rowcount > 0
     finally:
         con.close()
+
+
+def create_bracket(entrants: List[Dict[str, Any]], seeding: str, seed: Optional[str]) -> Tuple[str, Bracket]:
+    order = seed_order(entrant_ratings(entrants), seeding, seed)
+    bracket = Bracket(len(entrants), order)
+    con = db_connect()
+    try:
+        cur = con.cursor()
+        for _ in range(5):
+            bracket_id = generate_code(8)
+            cur.execute("SELECT id FROM brackets WHERE id = ?", (bracket_id,))
+            if not cur.fetchone():
+                cur.execute(
+                    "INSERT INTO brackets (id, created_at, entrants_json, order_json) VALUES (?, ?, ?, ?)",
+                    (bracket_id, _now_iso(), json.dumps(entrants, ensure_ascii=False), json.dumps(order)),
+                )
+                con.commit()
+                with _BRACKETS_LOCK:
+                    _remember(_BRACKETS, bracket_id, (0, bracket))
+                return bracket_id, bracket
+        raise RuntimeError("Nao foi possivel gerar codigo.")
+    finally:
+        con.close()
+
+
+def load_bracket_entrants(bracket_id: str) -> Optional[List[Dict[str, Any]]]:
+    con = db_connect()
+    try:
+        row = con.execute("SELECT entrants_json FROM brackets WHERE id = ?", (bracket_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+    finally:
+        con.close()
+
+
+def _bracket_ops_since(con: sqlite3.Connection, bracket_id: str, since: int) -> List[List[int]]:
+    cur = con.execute(
+        "SELECT node, side FROM bracket_ops WHERE bracket_id = ? AND seq > ? ORDER BY seq", (bracket_id, since)
+    )
+    return [[node, side] for node, side in cur.fetchall()]
+
+
+def _remember(cache: "OrderedDict[str, Any]", key: str, value: Any) -> None:
+    # Chamado com o lock do cache.
+    cache[key] = value
+    cache.move_to_end(key)
+    while len(cache) > LIVE_CACHE_SIZE:
+        cache.popitem(last=False)
+
+
+def _bracket_at(
+    con: sqlite3.Connection, bracket_id: str, view: Optional[Callable[[Bracket], Any]] = None
+) -> Optional[Tuple[int, Any]]:
+    # Arvore na ultima seq gravada; o cache do processo so aplica as ops que faltam.
+    # `view` roda com o lock: a leitura nao ve uma gravacao pela metade.
+    row = con.execute("SELECT order_json, seq FROM brackets WHERE id = ?", (bracket_id,)).fetchone()
+    if not row:
+        return None
+    seq = row[1]
+    with _BRACKETS_LOCK:
+        cached = _BRACKETS.get(bracket_id)
+        if cached is None or cached[0] > seq:
+            order = json.loads(row[0])
+            cached = (seq, replay(len(order), order, _bracket_ops_since(con, bracket_id, 0)))
+        elif cached[0] < seq:
+            for node, side in _bracket_ops_since(con, bracket_id, cached[0]):
+                cached[1].apply(node, side)
+            cached = (seq, cached[1])
+        _remember(_BRACKETS, bracket_id, cached)
+        return cached if view is None else (seq, view(cached[1]))
+
+
+def bracket_state(bracket_id: str, view: Callable[[Bracket], Any]) -> Optional[Tuple[int, Any]]:
+    con = db_connect()
+    try:
+        return _bracket_at(con, bracket_id, view)
+    finally:
+        con.close()
+
+
+def bracket_ops(bracket_id: str, since: int) -> Optional[Tuple[int, List[List[int]]]]:
+    con = db_connect()
+    try:
+        row = con.execute("SELECT seq FROM brackets WHERE id = ?", (bracket_id,)).fetchone()
+        if not row:
+            return None
+        return row[0], _bracket_ops_since(con, bracket_id, since)
+    finally:
+        con.close()
+
+
+def append_bracket_ops(bracket_id: str, expected_seq: int, ops: List[List[int]]) -> Tuple[int, List[List[int]]]:
+    """
+    Aplica as ops em ordem e grava no log. `expected_seq` e a seq que o cliente
+    conhece; se outro visualizador gravou antes, levanta LookupError (409).
+    """
+    con = db_connect(isolation_level=None)
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        state = _bracket_at(con, bracket_id)
+        if state is None:
+            con.execute("ROLLBACK")
+            raise KeyError(bracket_id)
+        seq, bracket = state
+        if expected_seq != seq:
+            con.execute("ROLLBACK")
+            raise LookupError(seq)
+
+        changed: Dict[int, int] = {}
+        applied = []
+        with _BRACKETS_LOCK:
+            snapshot = list(bracket.slots)
+            try:
+                for node, side in ops:
+                    for n, value in bracket.apply(int(node), int(side)):
+                        changed[n] = value
+                    applied.append((int(node), int(side)))
+                con.executemany(
+                    "INSERT INTO bracket_ops (bracket_id, seq, node, side) VALUES (?, ?, ?, ?)",
+                    [(bracket_id, seq + i + 1, node, side) for i, (node, side) in enumerate(applied)],
+                )
+                new_seq = seq + len(applied)
+                con.execute("UPDATE brackets SET seq = ? WHERE id = ?", (new_seq, bracket_id))
+                con.execute("COMMIT")
+            except BaseException:
+                # Op invalida ou falha no banco: o cache nao pode ficar a frente do log.
+                bracket.slots[:] = snapshot
+                if con.in_transaction:
+                    con.execute("ROLLBACK")
+                raise
+            _remember(_BRACKETS, bracket_id, (new_seq, bracket))
+        return new_seq, [[n, v] for n, v in changed.items()]
+    finally:
+        con.close()
+
+
+def create_draft(dataset: str, participants: List[str], rounds: int, pool: List[Dict[str, Any]]) -> Tuple[str, Draft]:
+    draft = Draft.from_pool(len(participants), rounds, pool)
+    con = db_connect()
+    try:
+        cur = con.cursor()
+        for _ in range(5):
+            draft_id = generate_code(8)
+            cur.execute("SELECT id FROM drafts WHERE id = ?", (draft_id,))
+            if not cur.fetchone():
+                cur.execute(
+                    "INSERT INTO drafts (id, created_at, dataset_key, participants_json, rounds, pool_json)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        draft_id,
+                        _now_iso(),
+                        dataset,
+                        json.dumps(participants, ensure_ascii=False),
+                        rounds,
+                        json.dumps(draft.teams, ensure_ascii=False),
+                    ),
+                )
+                con.commit()
+                with _DRAFTS_LOCK:
+                    _remember(_DRAFTS, draft_id, (0, draft))
+                return draft_id, draft
+        raise RuntimeError("Nao foi possivel gerar codigo.")
+    finally:
+        con.close()
+
+
+def load_draft_info(draft_id: str) -> Optional[Tuple[str, List[str]]]:
+    con = db_connect()
+    try:
+        row = con.execute("SELECT dataset_key, participants_json FROM drafts WHERE id = ?", (draft_id,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+    finally:
+        con.close()
+
+
+def _draft_ops_since(con: sqlite3.Connection, draft_id: str, since: int) -> List[int]:
+    cur = con.execute("SELECT op FROM draft_ops WHERE draft_id = ? AND seq > ? ORDER BY seq", (draft_id, since))
+    return [op for (op,) in cur.fetchall()]
+
+
+def _draft_at(
+    con: sqlite3.Connection, draft_id: str, view: Optional[Callable[[Draft], Any]] = None
+) -> Optional[Tuple[int, Any]]:
+    row = con.execute(
+        "SELECT participants_json, rounds, pool_json, seq FROM drafts WHERE id = ?", (draft_id,)
+    ).fetchone()
+    if not row:
+        return None
+    seq = row[3]
+    with _DRAFTS_LOCK:
+        cached = _DRAFTS.get(draft_id)
+        if cached is None or cached[0] > seq:
+            draft = replay_draft(len(json.loads(row[0])), row[1], json.loads(row[2]), _draft_ops_since(con, draft_id, 0))
+            cached = (seq, draft)
+        elif cached[0] < seq:
+            for op in _draft_ops_since(con, draft_id, cached[0]):
+                cached[1].apply(op)
+            cached = (seq, cached[1])
+        _remember(_DRAFTS, draft_id, cached)
+        return cached if view is None else (seq, view(cached[1]))
+
+
+def draft_state(draft_id: str, view: Callable[[Draft], Any]) -> Optional[Tuple[int, Any]]:
+    con = db_connect()
+    try:
+        return _draft_at(con, draft_id, view)
+    finally:
+        con.close()
+
+
+def draft_ops(draft_id: str, since: int) -> Optional[Tuple[int, List[int]]]:
+    con = db_connect()
+    try:
+        row = con.execute("SELECT seq FROM drafts WHERE id = ?", (draft_id,)).fetchone()
+        if not row:
+            return None
+        return row[0], _draft_ops_since(con, draft_id, since)
+    finally:
+        con.close()
+
+
+def append_draft_ops(draft_id: str, expected_seq: int, raw_ops: List[Dict[str, Any]]) -> Tuple[int, List[Dict[str, Any]]]:
+    """
+    Escolhas/desfazer em ordem, gravadas no log. Mesmo controle de concorrencia
+    dos chaveamentos: seq desatualizada levanta LookupError (409).
+    """
+    con = db_connect(isolation_level=None)
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        state = _draft_at(con, draft_id)
+        if state is None:
+            con.execute("ROLLBACK")
+            raise KeyError(draft_id)
+        seq, draft = state
+        if expected_seq != seq:
+            con.execute("ROLLBACK")
+            raise LookupError(seq)
+
+        applied: List[int] = []
+        events = []
+        with _DRAFTS_LOCK:
+            try:
+                for raw in raw_ops:
+                    op = draft.resolve(raw)
+                    events.append(draft.apply(op))
+                    applied.append(op)
+                con.executemany(
+                    "INSERT INTO draft_ops (draft_id, seq, op) VALUES (?, ?, ?)",
+                    [(draft_id, seq + i + 1, op) for i, op in enumerate(applied)],
+                )
+                new_seq = seq + len(applied)
+                con.execute("UPDATE drafts SET seq = ? WHERE id = ?", (new_seq, draft_id))
+                con.execute("COMMIT")
+            except BaseException:
+                # Op invalida ou falha no banco: desfaz o que ja foi aplicado em memoria
+                # (escolhas saem, desfazer devolve a escolha) para o cache seguir o log.
+                for op, event in zip(reversed(applied), reversed(events)):
+                    if op == UNDO:
+                        draft.pick(event["team"])
+                    else:
+                        draft.undo()
+                if con.in_transaction:
+                    con.execute("ROLLBACK")
+                raise
+            _remember(_DRAFTS, draft_id, (new_seq, draft))
+        return new_seq, events
+    finally:
+        con.close()
+
+
+@dataset_viewer
+def _dataset_viewer() -> Optional[int]:
+    # Sem requisicao (job de build) le tudo; numa requisicao sem login nenhum dataset de usuario.
+    if not has_request_context():
+        return None
+    return session.get("user_id") or 0
+
+
+@app.errorhandler(DatasetNotFound)
+def _dataset_not_found(e: DatasetNotFound):
+    return jsonify({"error": "Nao encontrado."}), 404
+
+
+def _set_upload_status(key: str, status: str, rows: int = 0, report: Optional[Dict[str, Any]] = None) -> None:
+    con = db_connect()
+    try:
+        con.execute(
+            "UPDATE dataset_uploads SET status = ?, rows = ?, report_json = ?, finished_at = ? WHERE dataset_key = ?",
+            (
+                status,
+                rows,
+                json.dumps(report, ensure_ascii=False) if report is not None else None,
+                _now_iso() if status in ("ready", "error") else None,
+                key,
+            ),
+        )
+        con.commit()
+    finally:
+        con.close()
+
+
+def build_uploaded_dataset(key: str, user_id: int, name: str, template: str) -> None:
+    """
+    Job em segundo plano: valida/normaliza o arquivo enviado em streaming e roda
+    o mesmo pipeline dos datasets embutidos (validacao, snapshot).
+    """
+    import build_datasets
+
+    src = upload_path(key)
+    registered = False
+    try:
+        _set_upload_status(key, "building")
+        report = convert_upload(src, user_dataset_csv(key), template)
+        if report["errors"]:
+            _set_upload_status(key, "error", report["rows"], report)
+            return
+        # O pipeline acha o CSV pelo registro; se o build falhar, o dataset sai de novo.
+        register_dataset(key, name, user_id, load_schema(template).get("sport") or "")
+        registered = True
+        result = build_datasets.build_one(key, {}, force=True)
+        if not result["ok"]:
+            unregister_dataset(key)
+            failed = [f"{stage}: {info['error']}" for stage, info in result["stages"].items() if info.get("error")]
+            report["errors"] = failed
+            _set_upload_status(key, "error", report["rows"], report)
+            return
+        report["stages"] = {stage: round(info["seconds"], 3) for stage, info in result["stages"].items()}
+        _set_upload_status(key, "ready", report["rows"], report)
+    except Exception as e:
+        if registered:
+            unregister_dataset(key)
+        _set_upload_status(key, "error", 0, {"errors": [str(e)], "warnings": []})
+    finally:
+        if os.path.exists(src):
+            os.remove(src)
+
+
+def create_upload(user_id: int, name: str, template: str) -> str:
+    key = new_dataset_key()
+    con = db_connect()
+    try:
+        con.execute(
+            "INSERT INTO dataset_uploads (dataset_key, user_id, name, template, status, created_at)"
+            " VALUES (?, ?, ?, ?, 'queued', ?)",
+            (key, user_id, name, template, _now_iso()),
+        )
+        con.commit()
+    finally:
+        con.close()
+    return key
+
+
+def load_upload(key: str, user_id: int) -> Optional[Dict[str, Any]]:
+    con = db_connect()
+    try:
+        row = con.execute(
+            "SELECT dataset_key, name, template, status, rows, report_json, created_at, finished_at"
+            " FROM dataset_uploads WHERE dataset_key = ? AND user_id = ?",
+            (key, user_id),
+        ).fetchone()
+    finally:
+        con.close()
+    if not row:
+        return None
+    return {
+        "key": row[0],
+        "label": row[1],
+        "template": row[2],
+        "status": row[3],
+        "rows": row[4],
+        "report": json.loads(row[5]) if row[5] else None,
+        "created_at": row[6],
+        "finished_at": row[7],
+    }
+
+
+def user_datasets(user_id: Optional[int]) -> List[Dict[str, Any]]:
+    if not user_id:
+        return []
+    con = db_connect()
+    try:
+        cur = con.execute(
+            "SELECT dataset_key, name FROM dataset_uploads WHERE user_id = ? AND status = 'ready' ORDER BY created_at",
+            (user_id,),
+        )
+        return [{"key": key, "label": name, "custom": True} for key, name in cur.fetchall()]
+    finally:
+        con.close()
+
+
+def add_rating_results(results: List[Tuple[str, str, float, Optional[str]]], source: str) -> Dict[str, Any]:
+    con = db_connect(isolation_level=None)
+    try:
+        return record_results(con, results, source)
+    finally:
+        con.close()
+
+
+def rating_leaderboard(by: str, cursor: str, limit: int) -> Dict[str, Any]:
+    con = db_connect()
+    try:
+        return leaderboard(con, by, cursor, limit)
+    finally:
+        con.close()
+
+
+def rating_player(name: str, cursor: str, limit: int) -> Optional[Dict[str, Any]]:
+    con = db_connect()
+    try:
+        return player_history(con, name, cursor, limit)
+    finally:
+        con.close()
 
 
 def ensure_guest_session() -> None:
@@ -225,17 +878,301 @@ def login_required(fn):
 
 
 init_db()
+METRICS.start_flusher()
+
+
+@METRICS.collector
+def _cache_metrics():
+    pool = POOL_CACHE.stats()
+    responses = RESPONSES.stats()
+    fragments = fragment_stats()
+    yield "cache_hits_total", "counter", "Acertos dos caches em memoria.", [
+        ({"cache": "pool"}, pool["hits"]),
+        ({"cache": "response"}, responses["hits"]),
+    ]
+    yield "cache_misses_total", "counter", "Faltas dos caches em memoria.", [
+        ({"cache": "pool"}, pool["misses"]),
+        ({"cache": "response"}, responses["misses"]),
+    ]
+    yield "cache_bytes", "gauge", "Bytes ocupados pelos caches em memoria.", [
+        ({"cache": "pool"}, pool["bytes"]),
+        ({"cache": "response"}, responses["bytes"]),
+        ({"cache": "fragments"}, sum(f["bytes"] for f in fragments.values())),
+    ]
+    yield "cache_entries", "gauge", "Entradas nos caches em memoria.", [
+        ({"cache": "pool"}, pool["entries"]),
+        ({"cache": "response"}, responses["entries"]),
+        ({"cache": "brackets"}, len(_BRACKETS)),
+        ({"cache": "drafts"}, len(_DRAFTS)),
+    ]
+
+
+MEMORY.track("datasets", cached_entries)
+MEMORY.track("pool_cache", POOL_CACHE.stats)
+MEMORY.track("response_cache", RESPONSES.stats)
+MEMORY.track(
+    "fragments",
+    lambda: {
+        "entries": sum(f["teams"] for f in fragment_stats().values()),
+        "bytes": sum(f["bytes"] for f in fragment_stats().values()),
+    },
+)
+MEMORY.track("search_index", search_indexes)
+MEMORY.track("brackets", lambda: _BRACKETS)
+MEMORY.track("drafts", lambda: _DRAFTS)
+MEMORY.track("profiles", PROFILER.records)
+# Fila do executor de uploads: so a quantidade (os itens sao chamadas pendentes).
+MEMORY.track("upload_queue", lambda: {"entries": _UPLOAD_JOBS._work_queue.qsize(), "bytes": None})
+
+
+@app.before_request
+def metrics_start():
+    # Registrado antes dos outros hooks para medir a requisicao inteira.
+    g.metrics_endpoint = request.url_rule.rule if request.url_rule is not None else "<nao encontrado>"
+    g.metrics_started = time.perf_counter()
+    METRICS.add("http_requests_in_flight", (g.metrics_endpoint,), 1)
+
+
+@app.after_request
+def metrics_record(response):
+    endpoint = g.get("metrics_endpoint")
+    if endpoint is None:
+        return response
+    METRICS.observe("http_request_duration_seconds", time.perf_counter() - g.metrics_started, (endpoint, request.method))
+    METRICS.inc("http_requests_total", (endpoint, request.method, str(response.status_code)))
+    if not response.is_streamed and response.content_length is not None:
+        METRICS.observe("http_response_size_bytes", response.content_length, (endpoint,))
+    return response
+
+
+@app.teardown_request
+def metrics_finish(error):
+    endpoint = g.pop("metrics_endpoint", None)
+    if endpoint is not None:
+        METRICS.add("http_requests_in_flight", (endpoint,), -1)
+
+
+@app.before_request
+def profile_start():
+    if not PROFILER.active or request.path.startswith("/static/") or (request.endpoint or "").startswith("admin_"):
+        return
+    rule = g.metrics_endpoint
+    g.profile = PROFILER.begin(PROFILER.wants(rule, request.headers.get(PROFILE_HEADER, ""), request.path))
+
+
+def _payload_shape() -> Dict[str, Any]:
+    # Formato do corpo JSON sem guardar o conteudo: listas viram tamanho, textos longos somem.
+    payload = request.get_json(silent=True) if request.is_json else None
+    shape: Dict[str, Any] = {}
+    if isinstance(payload, dict):
+        for key, value in list(payload.items())[:30]:
+            if isinstance(value, (list, dict)):
+                shape[key] = {"len": len(value)}
+            elif isinstance(value, (bool, int, float)) or (isinstance(value, str) and len(value) <= 40):
+                shape[key] = value
+    shape.update(g.get("profile_shape") or {})
+    return shape
+
+
+def _profile_end(status: int) -> Optional[int]:
+    state = g.pop("profile", None)
+    if state is None:
+        return None
+    return PROFILER.end(
+        state,
+        {
+            "endpoint": g.get("metrics_endpoint"),
+            "method": request.method,
+            "path": request.path,
+            "status": status,
+            "args": sorted(request.args.keys()),
+            "shape": _payload_shape(),
+        },
+    )
+
+
+@app.after_request
+def profile_record(response):
+    profile_id = _profile_end(response.status_code)
+    if profile_id is not None:
+        response.headers["X-Profile-Id"] = str(profile_id)
+    return response
+
+
+@app.teardown_request
+def profile_abort(error):
+    # Excecao antes do after_request: fecha o cProfile/amostragem mesmo assim.
+    if g.get("profile") is not None:
+        _profile_end(500)
 
 
 @app.before_request
 def auto_login_guest():
     if request.path.startswith("/static/"):
         return
-    if request.endpoint in {"login", "login_post", "register", "register_post"}:
+    if request.endpoint in {"login", "login_post", "register", "register_post", "metrics"}:
+        return
+    if (request.endpoint or "").startswith("admin_"):
         return
     ensure_guest_session()
 
 
+def _token_ok(header: str, token: str) -> bool:
+    # Tempo constante; em bytes porque compare_digest recusa str com acento.
+    return secrets.compare_digest(header.encode("utf-8"), f"Bearer {token}".encode("utf-8"))
+
+
+@app.get("/metrics")
+def metrics():
+    # Sem sessao (o scraper nao guarda cookie); com METRICS_TOKEN definido exige "Authorization: Bearer <token>".
+    token = os.getenv("METRICS_TOKEN", "")
+    if token and not _token_ok(request.headers.get("Authorization", ""), token):
+        abort(401)
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
+
+def admin_required(fn):
+    # Endpoints de diagnostico: so existem com ADMIN_TOKEN definido e exigem "Authorization: Bearer <token>".
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = os.getenv("ADMIN_TOKEN", "")
+        if not token:
+            abort(404)
+        if not _token_ok(request.headers.get("Authorization", ""), token):
+            abort(401)
+        return fn(*args, **kwargs)
+
+    return wrapper
+
+
+@app.get("/api/admin/profiles")
+@admin_required
+def admin_profiles():
+    return jsonify(
+        {
+            "endpoints": sorted(PROFILER.endpoints),
+            "slow_ms": PROFILER.slow_ms,
+            "profiles": PROFILER.list(),
+        }
+    )
+
+
+@app.delete("/api/admin/profiles")
+@admin_required
+def admin_profiles_clear():
+    PROFILER.clear()
+    return jsonify({"ok": True})
+
+
+def _profile_or_404(profile_id: int) -> Dict[str, Any]:
+    record = PROFILER.get(profile_id)
+    if record is None:
+        abort(404)
+    return record
+
+
+@app.get("/api/admin/profiles/<int:profile_id>")
+@admin_required
+def admin_profile(profile_id: int):
+    record = _profile_or_404(profile_id)
+    out = {k: v for k, v in record.items() if k not in ("pstats", "collapsed")}
+    out["top"] = top_functions(record)
+    return jsonify(out)
+
+
+@app.get("/api/admin/profiles/<int:profile_id>.prof")
+@admin_required
+def admin_profile_pstats(profile_id: int):
+    # Mesmo formato do Profile.dump_stats: abre com pstats.Stats(arquivo) ou snakeviz.
+    record = _profile_or_404(profile_id)
+    if "pstats" not in record:
+        return jsonify({"error": "Perfil amostrado: use o .folded."}), 404
+    resp = Response(record["pstats"], mimetype="application/octet-stream")
+    resp.headers["Content-Disposition"] = f'attachment; filename="profile-{profile_id}.prof"'
+    return resp
+
+
+@app.get("/api/admin/profiles/<int:profile_id>.folded")
+@admin_required
+def admin_profile_folded(profile_id: int):
+    # Pilhas colapsadas para flamegraph.pl / speedscope.
+    record = _profile_or_404(profile_id)
+    return Response(folded(record), mimetype="text/plain")
+
+
+@app.get("/api/admin/memory")
+@admin_required
+def admin_memory():
+    # ?deep=1 mede o grafo inteiro de cada estrutura (segundos em datasets grandes).
+    out = MEMORY.status()
+    out["structures"] = MEMORY.structures(deep=request.args.get("deep") == "1")
+    return jsonify(out)
+
+
+@app.post("/api/admin/memory/tracemalloc")
+@admin_required
+def admin_memory_tracemalloc():
+    payload = request.get_json(silent=True) or {}
+    action = payload.get("action")
+    if action == "start":
+        return jsonify(MEMORY.start(int(payload.get("frames") or 1)))
+    if action == "stop":
+        return jsonify(MEMORY.stop())
+    return jsonify({"error": "action deve ser start ou stop."}), 400
+
+
+@app.post("/api/admin/memory/snapshots")
+@admin_required
+def admin_memory_snapshot():
+    payload = request.get_json(silent=True) or {}
+    try:
+        meta = MEMORY.snapshot(str(payload.get("label") or ""), collect=payload.get("gc", True) is not False)
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify(meta), 201
+
+
+def _memory_args() -> Tuple[str, int]:
+    group = request.args.get("group") or "lineno"
+    if group not in MEMORY_GROUPS:
+        abort(400)
+    return group, _page_limit(30)
+
+
+@app.get("/api/admin/memory/snapshots/<int:snapshot_id>")
+@admin_required
+def admin_memory_top(snapshot_id: int):
+    group, limit = _memory_args()
+    try:
+        return jsonify(MEMORY.top(snapshot_id, group, limit))
+    except KeyError:
+        return jsonify({"error": "Snapshot nao encontrado."}), 404
+
+
+@app.delete("/api/admin/memory/snapshots/<int:snapshot_id>")
+@admin_required
+def admin_memory_drop(snapshot_id: int):
+    try:
+        MEMORY.drop(snapshot_id)
+    except KeyError:
+        return jsonify({"error": "Snapshot nao encontrado."}), 404
+    return jsonify({"ok": True})
+
+
+@app.get("/api/admin/memory/diff")
+@admin_required
+def admin_memory_diff():
+    group, limit = _memory_args()
+    try:
+        old, new = int(request.args.get("a", "")), int(request.args.get("b", ""))
+    except ValueError:
+        return jsonify({"error": "Informe a e b (ids dos snapshots)."}), 400
+    try:
+        return jsonify(MEMORY.diff(old, new, group, limit))
+    except KeyError:
+        return jsonify({"error": "Snapshot nao encontrado."}), 404
+
+
 @app.get("/login")
 def login():
     return redirect(url_for("index"))
@@ -292,80 +1229,169 @@ def share_page(code: str):
 
 
 
+def _json_bytes(body: bytes):
+    return app.response_class(body, mimetype="application/json")
+
+
+def _conditional_json(body: bytes, etag: str):
+    resp = _json_bytes(body)
+    resp.set_etag(etag)
+    # Sempre revalida: o navegador guarda o corpo e o servidor responde 304 enquanto a versao nao mudar.
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp.make_conditional(request)
+
+
+def _cached_json(name: str, dataset: str, build: Callable[[List[Dict[str, Any]]], Any]):
+    if not dataset:
+        body, etag = RESPONSES.get(name, "", "", lambda: build([]))
+        return _conditional_json(body, etag)
+    try:
+        version, rows = load_versioned(dataset)
+        body, etag = RESPONSES.get(name, dataset, version, lambda: build(rows))
+    except DatasetNotFound:
+        raise
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+    return _conditional_json(body, etag)
+
+
 @app.get("/api/datasets")
 @login_required
 def api_datasets():
-    return jsonify({"datasets": list_datasets()})
+    custom = user_datasets(session.get("user_id"))
+    if custom:
+        # Lista com os datasets enviados pelo usuario nao entra no cache compartilhado.
+        return jsonify({"datasets": list_datasets() + custom})
+    return _cached_json("datasets", "", lambda rows: {"datasets": list_datasets()})
+
+
+@app.post("/api/datasets/upload")
+@login_required
+def api_datasets_upload():
+    """
+    Corpo da requisicao = o arquivo CSV ou XLSX (sem multipart), para gravar em
+    disco em streaming. `name` e `template` (chave do datasets.json) vao na query.
+    """
+    name = (request.args.get("name") or "").strip()[:60]
+    template = (request.args.get("template") or "fc25").strip()
+    if not name:
+        return jsonify({"error": "Informe o nome do dataset."}), 400
+    try:
+        load_schema(template)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if request.content_length is not None and request.content_length > MAX_UPLOAD_BYTES:
+        return jsonify({"error": f"Arquivo maior que {MAX_UPLOAD_BYTES // (1024 * 1024)} MB."}), 413
+
+    key = create_upload(session["user_id"], name, template)
+    try:
+        size = save_stream(request.stream, upload_path(key))
+    except UploadTooLarge:
+        _set_upload_status(key, "error", 0, {"errors": ["Arquivo grande demais."], "warnings": []})
+        return jsonify({"error": f"Arquivo maior que {MAX_UPLOAD_BYTES // (1024 * 1024)} MB."}), 413
+    if not size:
+        _set_upload_status(key, "error", 0, {"errors": ["Arquivo vazio."], "warnings": []})
+        return jsonify({"error": "Envie o arquivo no corpo da requisicao."}), 400
+    _UPLOAD_JOBS.submit(build_uploaded_dataset, key, session["user_id"], name, template)
+    return jsonify({"dataset": key, "status": "queued", "bytes": size}), 202
+
+
+@app.get("/api/datasets/uploads/<key>")
+@login_required
+def api_datasets_upload_status(key: str):
+    upload = load_upload((key or "").strip(), session["user_id"])
+    if upload is None:
+        return jsonify({"error": "Nao encontrado."}), 404
+    return jsonify(upload)
 
 
 @app.get("/api/pools")
 @login_required
 def api_pools():
-    return jsonify(load_pools())
+    body, etag = pools_body()
+    return _conditional_json(body, etag)
+
+
+@app.get("/api/pools/report")
+@login_required
+def api_pools_report():
+    return jsonify(presets_report())
+
+
+@app.get("/api/pool_cache")
+@login_required
+def api_pool_cache():
+    return jsonify(POOL_CACHE.stats())
 
 
 @app.get("/api/stats")
 @login_required
 def api_stats():
     dataset = request.args.get("dataset", "fc25")
-    try:
-        return jsonify(compute_stats(dataset))
-    except Exception as e:
-        return jsonify({"error": str(e)}), 400
+    return _cached_json("stats", dataset, lambda rows: compute_stats(dataset))
 
 
 @app.get("/api/teams_info")
 @login_required
 def api_teams_info():
     dataset = request.args.get("dataset", "fc25")
-    try:
+
+    def build(rows):
         stats = compute_stats(dataset)
-        return jsonify(
-            {
-                "total_teams": stats.get("valid_rows", 0),
-                "max_overall": stats.get("max_overall", 0),
-                "min_overall": stats.get("min_overall", 0),
-                "counts": {
-                    "clubs": stats.get("club", 0),
-                    "women": stats.get("women", 0),
-                    "men": stats.get("men", 0),
-                    "national": stats.get("national", 0),
-                },
-            }
-        )
-    except Exception as e:
-        return jsonify({"error": str(e)}), 400
+        return {
+            "total_teams": stats.get("valid_rows", 0),
+            "max_overall": stats.get("max_overall", 0),
+            "min_overall": stats.get("min_overall", 0),
+            "counts": {
+                "clubs": stats.get("club", 0),
+                "women": stats.get("women", 0),
+                "men": stats.get("men", 0),
+                "national": stats.get("national", 0),
+            },
+            "tier_cutoffs": stats.get("tier_cutoffs", []),
+        }
+
+    return _cached_json("teams_info", dataset, build)
 
 
-@app.post("/api/facets")
+@app.route("/api/facets", methods=["GET", "POST"])
 @login_required
 def api_facets():
-    payload = request.get_json(force=True, silent=False) or {}
-    dataset = payload.get("dataset") or "fc25"
+    # GET aceita If-None-Match; o POST continua por compatibilidade.
+    if request.method == "POST":
+        payload = request.get_json(force=True, silent=False) or {}
+        dataset = payload.get("dataset") or "fc25"
+    else:
+        dataset = request.args.get("dataset", "fc25")
+    return _cached_json("facets", dataset, lambda rows: {"dataset": dataset, **compute_facets(rows)})
+
+
+def _args_filters() -> Dict[str, Any]:
+    # Mesmos filtros do pool via query string: listas repetidas (?countries=A&countries=B) ou separadas por virgula.
+    filters: Dict[str, Any] = {}
+    for name in SET_FILTERS:
+        values = [v.strip() for raw in request.args.getlist(name) for v in raw.split(",") if v.strip()]
+        if values:
+            filters[name] = values
+    for name in ("overall_min", "overall_max"):
+        if request.args.get(name):
+            filters[name] = int(request.args[name])
+    if request.args.get("include_invalid") in ("1", "true"):
+        filters["include_invalid"] = True
+    return filters
+
+
+@app.get("/api/teams/search")
+@login_required
+def api_teams_search():
+    dataset = request.args.get("dataset") or "fc25"
+    query = (request.args.get("q") or "").strip()[:80]
     try:
-        rows = load_rows(dataset)
-    except Exception as e:
+        limit = int(request.args.get("limit") or 10)
+        out = search_teams(dataset, query, _args_filters(), (request.args.get("preset") or "").strip(), limit)
+    except ValueError as e:
         return jsonify({"error": str(e)}), 400
-
-    def uniq(field: str):
-        s = set()
-        for r in rows:
-            v = (r.get(field) or "").strip()
-            if v:
-                s.add(v)
-        return sorted(s)
-
-    return jsonify(
-        {
-            "dataset": dataset,
-            "team_types": uniq("team_type"),
-            "genders": uniq("gender"),
-            "competitions": uniq("competition"),
-            "countries": uniq("country"),
-            "conferences": uniq("conference"),
-            "divisions": uniq("division"),
-        }
-    )
+    return _json_bytes(dumps(out))
 
 
 @app.post("/api/pool_preview")
@@ -374,11 +1400,14 @@ def api_pool_preview():
     payload = request.get_json(force=True, silent=False) or {}
     dataset = payload.get("dataset") or "fc25"
     filters = payload.get("filters") or {}
+    preset = (payload.get("preset") or "").strip()
+    cursor = (payload.get("cursor") or "").strip()
     limit = int(payload.get("limit") or 30)
 
     try:
-        rows = load_rows(dataset)
-        pool = apply_filters(rows, filters)
+        page = resolve_pool_page(dataset, filters, preset, cursor, max(0, min(limit, 200)))
+    except DatasetNotFound:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -397,10 +1426,18 @@ def api_pool_preview():
             "conference": t.get("conference"),
             "division": t.get("division"),
         }
-        for t in pool[: max(0, min(limit, 200))]
+        for t in page["rows"]
     ]
 
-    return jsonify({"dataset": dataset, "count": len(pool), "sample": sample})
+    return jsonify(
+        {
+            "dataset": dataset,
+            "count": page["count"],
+            "offset": page["offset"],
+            "sample": sample,
+            "next_cursor": page["next_cursor"],
+        }
+    )
 
 
 @app.post("/api/draw")
@@ -415,6 +1452,7 @@ def api_draw():
     avoid_repeat_window = int(payload.get("avoid_repeat_window") or 1)
     exclude_team_ids = payload.get("exclude_team_ids") or []
     seed = (payload.get("seed") or "").strip()
+    preset = (payload.get("preset") or "").strip()
 
     if not isinstance(participants, list) or not all(isinstance(p, str) for p in participants):
         return jsonify({"error": "participants deve ser uma lista de strings."}), 400
@@ -465,11 +1503,12 @@ def api_draw():
         }
 
     try:
-        rows = load_rows(dataset)
-        pool = apply_filters(rows, filters)
+        # O pool e uma lista de indices de linha; os times entram na resposta como JSON pre-codificado.
+        version, rows, ids = resolve_pool_ids(dataset, filters, preset)
+        pool = list(ids)
         if exclude_team_ids:
             exclude_set = {str(x) for x in exclude_team_ids}
-            pool = [t for t in pool if str(t.get("team_id")) not in exclude_set]
+            pool = [i for i in pool if str(rows[i].get("team_id")) not in exclude_set]
         if balance_mode == "tiers":
             pool = balance_pool_by_tiers(pool)
         if len(participants) > len(pool):
@@ -480,10 +1519,19 @@ def api_draw():
             ), 400
         if seed:
             random.seed(seed)
-        draw_rows = draw_assignments(participants, pool)
+        g.profile_shape = {"pool": len(pool), "participants": len(participants), "balance_mode": balance_mode}
+        picks = draw_indices(participants, pool)
+    except DatasetNotFound:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
+    splicer = Splicer()
+    draw_rows = [
+        splicer.ref(draw_row_fragment(person, team_fragment(dataset, version, rows, i)))
+        for person, i in zip(participants, picks)
+    ]
+
     meta = {
         "seed": seed or "auto",
         "timestamp": _now_iso(),
@@ -494,13 +1542,15 @@ def api_draw():
     out = {
         "dataset": dataset,
         "participants": participants,
+        "preset": preset or None,
         "filters": filters,
         "pool_count": len(pool),
         "draw": draw_rows,
         "meta": meta,
     }
-    save_history(dataset, out)
-    return jsonify(out)
+    body = splicer.render(out)
+    save_history(dataset, body)
+    return _json_bytes(body)
 
 
 @app.post("/api/bracket")
@@ -510,7 +1560,173 @@ def api_bracket():
     draw_rows = payload.get("draw") or []
     if not isinstance(draw_rows, list) or len(draw_rows) < 2:
         return jsonify({"error": "Envie o campo draw com ao menos 2 participantes."}), 400
-    return jsonify(make_bracket(draw_rows))
+    splicer = Splicer()
+    return _json_bytes(splicer.render(make_bracket([splicer.ref(dumps(r)) for r in draw_rows])))
+
+
+@app.post("/api/brackets")
+@login_required
+def api_brackets_create():
+    payload = request.get_json(force=True, silent=False) or {}
+    draw_rows = payload.get("draw") or []
+    if not isinstance(draw_rows, list) or len(draw_rows) < 2:
+        return jsonify({"error": "Envie o campo draw com ao menos 2 participantes."}), 400
+    if len(draw_rows) > MAX_BRACKET_ENTRANTS:
+        return jsonify({"error": f"Chaveamento grande demais (max {MAX_BRACKET_ENTRANTS} participantes)."}), 400
+    seeding = (payload.get("seeding") or "overall").strip().lower()
+    if seeding not in ("overall", "random"):
+        return jsonify({"error": "seeding deve ser overall ou random."}), 400
+    bracket_id, bracket = create_bracket(draw_rows, seeding, payload.get("seed") or None)
+    return jsonify({"id": bracket_id, "seq": 0, "participants": draw_rows, **bracket.to_dict()})
+
+
+@app.get("/api/brackets/<bracket_id>")
+@login_required
+def api_brackets_get(bracket_id: str):
+    bracket_id = (bracket_id or "").strip().upper()
+    since = request.args.get("since")
+    if since is not None:
+        # Sincronizacao: so as ops depois da seq que o visualizador ja tem.
+        try:
+            found = bracket_ops(bracket_id, int(since))
+        except ValueError:
+            return jsonify({"error": "since invalido."}), 400
+        if found is None:
+            return jsonify({"error": "Nao encontrado."}), 404
+        return jsonify({"id": bracket_id, "seq": found[0], "ops": found[1]})
+
+    state = bracket_state(bracket_id, Bracket.to_dict)
+    entrants = load_bracket_entrants(bracket_id)
+    if state is None or entrants is None:
+        return jsonify({"error": "Nao encontrado."}), 404
+    return jsonify({"id": bracket_id, "seq": state[0], "participants": entrants, **state[1]})
+
+
+@app.post("/api/brackets/<bracket_id>/ops")
+@login_required
+def api_brackets_ops(bracket_id: str):
+    payload = request.get_json(force=True, silent=False) or {}
+    ops = payload.get("ops") or []
+    if not isinstance(ops, list) or not all(isinstance(op, list) and len(op) == 2 for op in ops):
+        return jsonify({"error": "ops deve ser uma lista de [partida, lado]."}), 400
+    try:
+        seq, changed = append_bracket_ops(bracket_id.strip().upper(), int(payload.get("seq") or 0), ops)
+    except KeyError:
+        return jsonify({"error": "Nao encontrado."}), 404
+    except LookupError as e:
+        return jsonify({"error": "Chaveamento alterado por outra pessoa. Sincronize.", "seq": e.args[0]}), 409
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"seq": seq, "changed": changed})
+
+
+def _parse_swiss_rounds(raw: Any, players: int) -> List[List[Tuple[int, Optional[int], Optional[float]]]]:
+    if not isinstance(raw, list):
+        raise ValueError("rounds deve ser uma lista de rodadas.")
+    rounds = []
+    for games in raw:
+        parsed = []
+        for game in games if isinstance(games, list) else [None]:
+            if not isinstance(game, list) or len(game) != 3:
+                raise ValueError("Cada jogo deve ser [a, b, pontos_de_a] (b=null para folga).")
+            a, b, result = game
+            if not isinstance(a, int) or not 0 <= a < players:
+                raise ValueError("Jogador invalido.")
+            if b is not None and (not isinstance(b, int) or not 0 <= b < players or b == a):
+                raise ValueError("Adversario invalido.")
+            if result not in (None, 0, 0.5, 1):
+                raise ValueError("Resultado deve ser 1, 0.5, 0 ou null.")
+            parsed.append((a, b, None if result is None else float(result)))
+        rounds.append(parsed)
+    return rounds
+
+
+@app.post("/api/swiss")
+@login_required
+def api_swiss():
+    payload = request.get_json(force=True, silent=False) or {}
+    draw_rows = payload.get("draw") or []
+    if not isinstance(draw_rows, list) or len(draw_rows) < 2:
+        return jsonify({"error": "Envie o campo draw com ao menos 2 participantes."}), 400
+    try:
+        rounds = _parse_swiss_rounds(payload.get("rounds") or [], len(draw_rows))
+        ratings = [int(r.get("overall") or 0) if isinstance(r, dict) else 0 for r in draw_rows]
+        out = pair_round(len(draw_rows), rounds, ratings)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return _json_bytes(dumps(out))
+
+
+GROUP_SEPARATE_FIELDS = ("country", "competition", "league", "conference", "division")
+
+
+@app.post("/api/groups")
+@login_required
+def api_groups():
+    payload = request.get_json(force=True, silent=False) or {}
+    draw_rows = payload.get("draw") or []
+    if not isinstance(draw_rows, list) or len(draw_rows) < 2 or not all(isinstance(r, dict) for r in draw_rows):
+        return jsonify({"error": "Envie o campo draw com ao menos 2 participantes."}), 400
+    if len(draw_rows) > MAX_GROUP_TEAMS:
+        return jsonify({"error": f"Sorteio grande demais para grupos (max {MAX_GROUP_TEAMS} participantes)."}), 400
+    separate_by = payload.get("separate_by") or ["country"]
+    if not isinstance(separate_by, list) or any(f not in GROUP_SEPARATE_FIELDS for f in separate_by):
+        return jsonify({"error": f"separate_by aceita: {', '.join(GROUP_SEPARATE_FIELDS)}."}), 400
+    try:
+        groups = int(payload.get("groups") or 0)
+        time_budget = min(5.0, max(0.1, float(payload.get("time_budget") or 2.0)))
+        out = draw_groups(
+            draw_rows,
+            groups,
+            separate_by,
+            seed=(payload.get("seed") or None),
+            time_budget=time_budget,
+            count_only=payload.get("mode") == "count",
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except DrawTimeout:
+        return jsonify({"error": "Nenhum sorteio encontrado dentro do tempo limite. Reduza os participantes ou as restricoes."}), 400
+    # A contagem passa facil de 2^53: vai como texto.
+    out["count"] = None if out["count"] is None else str(out["count"])
+    return _json_bytes(dumps(out))
+
+
+@app.post("/api/simulate")
+@login_required
+def api_simulate():
+    payload = request.get_json(force=True, silent=False) or {}
+    draw_rows = payload.get("draw") or []
+    if not isinstance(draw_rows, list) or len(draw_rows) < 2 or not all(isinstance(r, dict) for r in draw_rows):
+        return jsonify({"error": "Envie o campo draw com ao menos 2 participantes."}), 400
+    if len(draw_rows) > MAX_SIMULATE_TEAMS:
+        return jsonify({"error": f"Simulacao grande demais (max {MAX_SIMULATE_TEAMS} participantes)."}), 400
+    fmt = (payload.get("format") or "round_robin").strip().lower()
+    sport = sport_for(payload.get("dataset") or "fc25")
+    seed = seed_int((payload.get("seed") or "").strip())
+    try:
+        iterations = int(payload.get("iterations") or 10_000)
+        # Orcamento de latencia: o Monte Carlo para no que couber e informa quantas iteracoes rodou.
+        time_budget = min(3.0, max(0.05, float(payload.get("time_budget") or 1.0)))
+        if fmt == "bracket":
+            seeding = (payload.get("seeding") or "overall").strip().lower()
+            out = simulate_bracket(draw_rows, iterations, seeding, sport, seed, time_budget)
+        elif fmt == "round_robin":
+            out = simulate_season(
+                draw_rows,
+                iterations,
+                bool(payload.get("double") or False),
+                int(payload.get("playoff_spots") or 4),
+                sport,
+                seed,
+                time_budget,
+            )
+        else:
+            return jsonify({"error": "format deve ser round_robin ou bracket."}), 400
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    out["format"] = fmt
+    return _json_bytes(dumps(out))
 
 
 @app.post("/api/round_robin")
@@ -520,7 +1736,169 @@ def api_round_robin():
     draw_rows = payload.get("draw") or []
     if not isinstance(draw_rows, list) or len(draw_rows) < 2:
         return jsonify({"error": "Envie o campo draw com ao menos 2 participantes."}), 400
-    return jsonify(make_round_robin(draw_rows))
+    double = bool(payload.get("double") or False)
+    fmt = (payload.get("format") or "matches").strip().lower()
+
+    if fmt == "ndjson":
+        return app.response_class(_round_robin_ndjson(draw_rows, double), mimetype="application/x-ndjson")
+    if fmt == "indexed":
+        # Partidas como pares de indices em `participants`; pagina por rodada.
+        try:
+            round_from = int(payload.get("round_from") or 1)
+            rounds = int(payload.get("rounds") or 0)
+        except (TypeError, ValueError):
+            return jsonify({"error": "round_from/rounds invalidos."}), 400
+        out = round_robin_page(len(draw_rows), double, round_from, rounds)
+        if round_from <= 1:
+            out["participants"] = draw_rows
+        return _json_bytes(dumps(out))
+
+    # Cada linha do sorteio e codificada uma vez, nao uma vez por partida.
+    splicer = Splicer()
+    return _json_bytes(splicer.render(make_round_robin([splicer.ref(dumps(r)) for r in draw_rows], double)))
+
+
+def _round_robin_ndjson(draw_rows: List[Dict[str, Any]], double: bool):
+    total_rounds, total_matches = round_robin_size(len(draw_rows), double)
+    head = {
+        "players": len(draw_rows),
+        "total_rounds": total_rounds,
+        "total_matches": total_matches,
+        "participants": draw_rows,
+    }
+    yield dumps(head) + b"\n"
+    for r, pairs in enumerate(round_robin_rounds(len(draw_rows), double), start=1):
+        yield dumps({"round": r, "matches": pairs}) + b"\n"
+
+
+@app.post("/api/drafts")
+@login_required
+def api_drafts_create():
+    payload = request.get_json(force=True, silent=False) or {}
+    dataset = payload.get("dataset") or "fc25"
+    participants = [str(p).strip() for p in payload.get("participants") or [] if str(p).strip()]
+    if len(participants) < 2:
+        return jsonify({"error": "Informe ao menos 2 participantes."}), 400
+    try:
+        rounds = int(payload.get("rounds") or 1)
+        _, rows, ids = resolve_pool_ids(dataset, payload.get("filters") or {}, (payload.get("preset") or "").strip())
+        if len(ids) > MAX_POOL:
+            return jsonify({"error": f"Pool grande demais para draft (max {MAX_POOL}). Filtre mais."}), 400
+        pool = [{f: rows[i].get(f) for f in TEAM_FIELDS} for i in ids]
+        draft_id, draft = create_draft(dataset, participants, rounds, pool)
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    out = {"id": draft_id, "seq": 0, "dataset": dataset, "participants": participants, "pool": draft.teams}
+    return _json_bytes(dumps({**out, **draft.to_dict()}))
+
+
+@app.get("/api/drafts/<draft_id>")
+@login_required
+def api_drafts_get(draft_id: str):
+    draft_id = (draft_id or "").strip().upper()
+    since = request.args.get("since")
+    if since is not None:
+        # Visualizadores so recebem o log depois da seq que ja tem (posicao no pool, -1 = desfazer).
+        try:
+            found = draft_ops(draft_id, int(since))
+        except ValueError:
+            return jsonify({"error": "since invalido."}), 400
+        if found is None:
+            return jsonify({"error": "Nao encontrado."}), 404
+        return jsonify({"id": draft_id, "seq": found[0], "ops": found[1]})
+
+    state = draft_state(draft_id, lambda d: dict(d.to_dict(), pool=d.teams))
+    info = load_draft_info(draft_id)
+    if state is None or info is None:
+        return jsonify({"error": "Nao encontrado."}), 404
+    out = {"id": draft_id, "seq": state[0], "dataset": info[0], "participants": info[1]}
+    return _json_bytes(dumps({**out, **state[1]}))
+
+
+@app.get("/api/drafts/<draft_id>/best")
+@login_required
+def api_drafts_best(draft_id: str):
+    by = (request.args.get("by") or "overall").strip().lower()
+    if by not in DRAFT_ATTRS:
+        return jsonify({"error": f"by aceita: {', '.join(DRAFT_ATTRS)}."}), 400
+    try:
+        limit = min(50, max(1, int(request.args.get("limit") or 5)))
+    except ValueError:
+        return jsonify({"error": "limit invalido."}), 400
+    state = draft_state((draft_id or "").strip().upper(), lambda d: d.best(by, limit))
+    if state is None:
+        return jsonify({"error": "Nao encontrado."}), 404
+    return jsonify({"seq": state[0], "by": by, "teams": state[1]})
+
+
+@app.post("/api/drafts/<draft_id>/ops")
+@login_required
+def api_drafts_ops(draft_id: str):
+    payload = request.get_json(force=True, silent=False) or {}
+    ops = payload.get("ops") or []
+    if not isinstance(ops, list) or not ops:
+        return jsonify({"error": "ops deve ser uma lista de {team}, {best} ou {undo}."}), 400
+    try:
+        seq, events = append_draft_ops(draft_id.strip().upper(), int(payload.get("seq") or 0), ops)
+    except KeyError:
+        return jsonify({"error": "Nao encontrado."}), 404
+    except LookupError as e:
+        return jsonify({"error": "Draft alterado por outra pessoa. Sincronize.", "seq": e.args[0]}), 409
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"seq": seq, "events": events})
+
+
+RATING_SOURCES = ("bracket", "round_robin", "swiss", "groups", "manual")
+
+
+@app.post("/api/ratings/results")
+@login_required
+def api_ratings_results():
+    payload = request.get_json(force=True, silent=False) or {}
+    raw = payload.get("results") or []
+    source = (payload.get("source") or "manual").strip().lower()
+    if source not in RATING_SOURCES:
+        return jsonify({"error": f"source aceita: {', '.join(RATING_SOURCES)}."}), 400
+    if not isinstance(raw, list) or not raw or len(raw) > 500:
+        return jsonify({"error": "Envie results com 1 a 500 jogos."}), 400
+    try:
+        results = [parse_result(r) for r in raw]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return _json_bytes(dumps(add_rating_results(results, source)))
+
+
+def _page_limit(default: int = 50) -> int:
+    try:
+        return min(200, max(1, int(request.args.get("limit") or default)))
+    except ValueError:
+        return default
+
+
+@app.get("/api/ratings/leaderboard")
+@login_required
+def api_ratings_leaderboard():
+    by = (request.args.get("by") or "elo").strip().lower()
+    if by not in LEADERBOARD_FIELDS:
+        return jsonify({"error": f"by aceita: {', '.join(LEADERBOARD_FIELDS)}."}), 400
+    try:
+        out = rating_leaderboard(by, (request.args.get("cursor") or "").strip(), _page_limit())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return _json_bytes(dumps(out))
+
+
+@app.get("/api/ratings/players/<name>")
+@login_required
+def api_ratings_player(name: str):
+    try:
+        out = rating_player(name, (request.args.get("cursor") or "").strip(), _page_limit())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if out is None:
+        return jsonify({"error": "Nao encontrado."}), 404
+    return _json_bytes(dumps(out))
 
 
 @app.post("/api/share")
@@ -546,6 +1924,8 @@ def api_share_get(code: str):
     payload = load_share(code)
     if not payload:
         return jsonify({"error": "Nao encontrado."}), 404
+    if isinstance(payload, dict):
+        payload["filters"] = room_filters(payload)
     return jsonify(payload)
 
 
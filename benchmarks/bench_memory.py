@@ -0,0 +1,69 @@
+"""
+Memoria das linhas carregadas: dict do csv.DictReader (formato antigo) vs
+TeamRecord (tupla + categorias internadas).
+
+    python benchmarks/bench_memory.py --dataset fc25 --copies 50
+"""
+
+import argparse
+import csv
+import gc
+import os
+import sys
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.datasets import DATASETS, INT_FIELDS, _to_int  # noqa: E402
+from services.records import make_record  # noqa: E402
+
+
+def _parse_dict(r: Dict[str, Any]) -> Dict[str, Any]:
+    for k in INT_FIELDS:
+        if k in r:
+            r[k] = _to_int(r.get(k))
+    r["is_valid"] = str(r.get("is_valid", "")).lower() in ("true", "1", "yes")
+    return r
+
+
+def _parse_record(r: Dict[str, Any]):
+    return make_record(_parse_dict(r))
+
+
+def _load(path: str, copies: int, parse: Callable[[Dict[str, Any]], Any]) -> List[Any]:
+    rows = []
+    for _ in range(copies):
+        with open(path, "r", encoding="utf-8") as f:
+            for r in csv.DictReader(f):
+                rows.append(parse(r))
+    return rows
+
+
+def measure(path: str, copies: int, parse: Callable[[Dict[str, Any]], Any]) -> Dict[str, int]:
+    gc.collect()
+    tracemalloc.start()
+    rows = _load(path, copies, parse)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = len(rows)
+    del rows
+    return {"rows": count, "bytes": current, "peak": peak}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Compara memoria de dict vs TeamRecord.")
+    ap.add_argument("--dataset", default="fc25", choices=sorted(DATASETS))
+    ap.add_argument("--copies", type=int, default=20, help="Quantas vezes o CSV e carregado (simula datasets maiores).")
+    args = ap.parse_args()
+
+    path = DATASETS[args.dataset]["path"]
+    old = measure(path, args.copies, _parse_dict)
+    new = measure(path, args.copies, _parse_record)
+    for name, m in (("dict", old), ("TeamRecord", new)):
+        print(f"{name:<11} {m['rows']:>8} linhas  {m['bytes'] / 1024:>9.1f} KiB  ({m['bytes'] / m['rows']:.0f} B/linha)")
+    print(f"Reducao: {100 * (1 - new['bytes'] / old['bytes']):.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+"""
+Benchmarks de services.draws e services.datasets sobre datasets sinteticos
+(gerados a partir do teams_fc25.csv) de 10^3 a 10^6 times.
+
+    python benchmarks/bench_suite.py                          # 10^3..10^5, grava benchmarks/results/<data>.json
+    python benchmarks/bench_suite.py --sizes 1000,1000000 --only load_rows,apply_filters
+    python benchmarks/bench_suite.py --save-baseline          # grava benchmarks/baseline.json
+    python benchmarks/bench_suite.py --baseline benchmarks/baseline.json --threshold 0.15
+
+Com --baseline, sai com codigo 1 se algum caso ficar mais de `threshold` mais
+lento (ops/s) ou usar mais memoria de pico que no baseline.
+"""
+
+import argparse
+import csv
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from services import datasets as ds  # noqa: E402
+from services.draws import (  # noqa: E402
+    apply_filters,
+    balance_pool_by_tiers,
+    draw_assignments,
+    make_bracket,
+    make_round_robin,
+)
+
+SOURCE_CSV = os.path.join(ds.DATA_DIR, "teams_fc25.csv")
+SYNTH_DIR = os.path.join(ds.DATA_DIR, "build", "bench")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+# Diferenca de pico abaixo disto e ruido do alocador, nao regressao.
+PEAK_SLACK_BYTES = 64 * 1024
+
+FILTER_MIXES: Dict[str, Dict[str, Any]] = {
+    "all": {"mode": "all"},
+    "top100": {"mode": "top", "top_n": 100},
+    "clubs_men": {"mode": "all", "team_types": ["CLUB"], "genders": ["MEN"]},
+    "competition_min70": {"mode": "all", "competitions": ["CLUBS"], "overall_min": 70},
+    "national_range": {"mode": "all", "team_types": ["NATIONAL"], "overall_min": 60, "overall_max": 80, "include_invalid": True},
+}
+
+
+# --- dados sinteticos ---
+
+
+def _clamp(value: float) -> int:
+    return max(1, min(99, int(round(value))))
+
+
+def synthetic_csv(n: int, seed: int = 0) -> str:
+    """
+    CSV com `n` times no layout do teams_fc25.csv. Cada linha parte de um time
+    real sorteado (mantem a correlacao tipo/genero/competicao/pais) com id e
+    nome proprios e ratings perturbados. Gerado uma vez por (n, seed).
+    """
+    path = os.path.join(SYNTH_DIR, f"teams_{n}_{seed}.csv")
+    if os.path.exists(path):
+        return path
+    with open(SOURCE_CSV, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        fields = list(reader.fieldnames or [])
+        templates = list(reader)
+    rng = random.Random(f"{n}:{seed}")
+    os.makedirs(SYNTH_DIR, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for i in range(n):
+            row = dict(rng.choice(templates))
+            delta = rng.gauss(0, 4)
+            row["team_id"] = str(10_000_000 + i)
+            row["team_name"] = f"{row['team_name']} {i}"
+            row["overall"] = str(_clamp(ds._to_int(row["overall"]) + delta))
+            for field in ("attack", "midfield", "defence"):
+                row[field] = str(_clamp(ds._to_int(row[field]) + delta + rng.gauss(0, 2)))
+            writer.writerow(row)
+    os.replace(tmp, path)
+    return path
+
+
+def register(n: int, seed: int) -> str:
+    key = f"bench_{n}"
+    ds.DATASETS[key] = {"label": f"Sintetico {n}", "path": synthetic_csv(n, seed), "sport": "football"}
+    return key
+
+
+# --- casos ---
+
+
+class Case:
+    """`fn` medida; `setup` roda antes de cada chamada fora do tempo. `scales` = depende do tamanho do dataset."""
+
+    def __init__(self, name: str, fn: Callable[[], Any], setup: Optional[Callable[[], None]] = None, scales: bool = True):
+        self.name = name
+        self.fn = fn
+        self.setup = setup
+        self.scales = scales
+
+
+def build_cases(key: str) -> List[Case]:
+    rows = ds.load_rows(key)
+    pool = apply_filters(rows, {"mode": "all"})
+    participants = [f"P{i}" for i in range(64)]
+    draw64 = draw_assignments(participants, pool)
+    draw48 = draw64[:48]
+    draw20 = draw64[:20]
+
+    def cold_load() -> None:
+        ds._CACHE.pop(key, None)
+
+    def cold_stats() -> None:
+        ds._STATS.pop(key, None)
+
+    cases = [
+        Case("load_rows", lambda: ds.load_rows(key), cold_load),
+        Case("compute_stats", lambda: ds.compute_stats(key), cold_stats),
+        Case("draw_assignments/32", lambda: draw_assignments(participants[:32], pool)),
+        Case("balance_pool_by_tiers", lambda: balance_pool_by_tiers(pool)),
+        Case("make_bracket/64", lambda: make_bracket(draw64), scales=False),
+        Case("make_bracket/48", lambda: make_bracket(draw48), scales=False),
+        Case("make_round_robin/20", lambda: make_round_robin(draw20, double=True), scales=False),
+    ]
+    cases[2:2] = [Case(f"apply_filters/{mix}", lambda f=f: apply_filters(rows, f)) for mix, f in FILTER_MIXES.items()]
+    return cases
+
+
+# --- medicao ---
+
+
+def _timings(case: Case, min_time: float, min_calls: int) -> List[float]:
+    """Segundos por chamada. Sem setup, chamadas rapidas sao agrupadas em lotes de >= 1 ms."""
+    samples: List[float] = []
+    spent = 0.0
+    batch = 1
+    if case.setup is None:
+        while True:
+            t0 = time.perf_counter()
+            for _ in range(batch):
+                case.fn()
+            elapsed = time.perf_counter() - t0
+            if elapsed >= 0.001 or batch >= 1 << 16:
+                break
+            batch *= 4
+    # min_calls vale ate 20x min_time: load_rows com 10^6 linhas nao repete 5 vezes.
+    while spent < min_time or (len(samples) < min_calls and spent < 20 * min_time):
+        if case.setup is not None:
+            case.setup()
+        t0 = time.perf_counter()
+        for _ in range(batch):
+            case.fn()
+        elapsed = time.perf_counter() - t0
+        samples.append(elapsed / batch)
+        spent += elapsed
+    return samples
+
+
+def _memory(case: Case) -> Dict[str, int]:
+    """Pico e memoria retida de uma chamada (com o resultado ainda vivo) e blocos liquidos alocados."""
+    if case.setup is not None:
+        case.setup()
+    gc.collect()
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    blocks = sys.getallocatedblocks()
+    result = case.fn()
+    current, peak = tracemalloc.get_traced_memory()
+    net_blocks = sys.getallocatedblocks() - blocks
+    tracemalloc.stop()
+    del result
+    return {"peak_bytes": peak - base, "retained_bytes": current - base, "net_blocks": net_blocks}
+
+
+def run_case(case: Case, seed: int, min_time: float, min_calls: int) -> Dict[str, Any]:
+    random.seed(seed)
+    if case.setup is not None:
+        case.setup()
+    case.fn()  # aquece caches de atributo/indices que nao sao o alvo da medida
+    random.seed(seed)
+    samples = _timings(case, min_time, min_calls)
+    median = statistics.median(samples)
+    out = {
+        "ops_per_sec": round(1.0 / median, 2) if median > 0 else None,
+        "median_s": median,
+        "min_s": min(samples),
+        "calls": len(samples),
+    }
+    out.update(_memory(case))
+    return out
+
+
+def run(sizes: List[int], seed: int, only: List[str], min_time: float, min_calls: int, budget: float) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    skipped: Dict[str, str] = {}
+    too_slow: Dict[str, int] = {}
+    fixed_done = set()
+    for n in sizes:
+        key = register(n, seed)
+        for case in build_cases(key):
+            if only and not any(case.name.startswith(o) for o in only):
+                continue
+            if not case.scales and case.name in fixed_done:
+                continue
+            name = f"{case.name}@{n}" if case.scales else case.name
+            if case.name in too_slow:
+                skipped[name] = f"chamada acima de {budget:g}s em n={too_slow[case.name]}"
+                print(f"{name:<40} pulado ({skipped[name]})", flush=True)
+                continue
+            res = run_case(case, seed, min_time, min_calls)
+            results[name] = res
+            fixed_done.add(case.name)
+            if res["median_s"] > budget:
+                too_slow[case.name] = n
+            print(
+                f"{name:<40} {res['ops_per_sec']:>12,.2f} ops/s  {res['median_s'] * 1000:>10.3f} ms"
+                f"  pico {res['peak_bytes'] / 1024:>10.1f} KiB  blocos {res['net_blocks']:>9}",
+                flush=True,
+            )
+        ds._CACHE.pop(key, None)
+        ds._STATS.pop(key, None)
+        gc.collect()
+    return {"meta": _meta(sizes, seed), "results": results, "skipped": skipped}
+
+
+def _meta(sizes: List[int], seed: int) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=5
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "sizes": sizes,
+        "seed": seed,
+    }
+
+
+# --- baseline ---
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Regressoes (texto) dos casos presentes nos dois arquivos."""
+    problems = []
+    base_results = baseline.get("results") or {}
+    for name, res in sorted(current["results"].items()):
+        base = base_results.get(name)
+        if base is None:
+            continue
+        if base.get("ops_per_sec") and res["ops_per_sec"] < base["ops_per_sec"] * (1 - threshold):
+            drop = 100 * (1 - res["ops_per_sec"] / base["ops_per_sec"])
+            problems.append(f"{name}: {res['ops_per_sec']:,.1f} ops/s vs {base['ops_per_sec']:,.1f} (-{drop:.0f}%)")
+        base_peak = base.get("peak_bytes") or 0
+        if res["peak_bytes"] > base_peak * (1 + threshold) and res["peak_bytes"] - base_peak > PEAK_SLACK_BYTES:
+            problems.append(f"{name}: pico {res['peak_bytes'] / 1024:,.0f} KiB vs {base_peak / 1024:,.0f} KiB")
+    return problems
+
+
+def _write(path: str, doc: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Benchmarks de draws/datasets com datasets sinteticos.")
+    ap.add_argument("--sizes", default=",".join(str(n) for n in DEFAULT_SIZES), help="Tamanhos separados por virgula (ate 1000000).")
+    ap.add_argument("--only", default="", help="Prefixos de caso separados por virgula (ex.: load_rows,apply_filters).")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--min-time", type=float, default=0.5, help="Segundos minimos medidos por caso.")
+    ap.add_argument("--min-calls", type=int, default=5)
+    ap.add_argument("--budget", type=float, default=5.0, help="Caso com chamada acima disto (s) e pulado nos tamanhos maiores.")
+    ap.add_argument("--out", default="", help="Arquivo JSON de saida (padrao: benchmarks/results/<data>.json).")
+    ap.add_argument("--baseline", default="", help="JSON de uma execucao anterior para comparar.")
+    ap.add_argument("--threshold", type=float, default=0.15, help="Regressao tolerada (0.15 = 15%%).")
+    ap.add_argument("--save-baseline", action="store_true", help=f"Grava o resultado tambem em {os.path.relpath(BASELINE, ROOT)}.")
+    args = ap.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    only = [o.strip() for o in args.only.split(",") if o.strip()]
+    doc = run(sizes, args.seed, only, args.min_time, args.min_calls, args.budget)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    _write(out, doc)
+    print(f"Resultado: {os.path.relpath(out, ROOT)}")
+    if args.save_baseline:
+        _write(BASELINE, doc)
+        print(f"Baseline: {os.path.relpath(BASELINE, ROOT)}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("machine") != doc["meta"]["machine"]:
+            print("Aviso: baseline de outra maquina; ops/s nao sao comparaveis.")
+        problems = compare(doc, baseline, args.threshold)
+        if problems:
+            print(f"Regressoes acima de {args.threshold:.0%}:")
+            for p in problems:
+                print(f"  {p}")
+            sys.exit(1)
+        print("Sem regressoes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,466 @@
+"""
+Teste de carga HTTP da API: trafego misto (sorteio, preview, share, export)
+com chegadas de Poisson em taxa fixa, contra um gunicorn local iniciado aqui
+para cada configuracao (ou contra --url ja rodando).
+
+    python benchmarks/load_test.py --rates 5,20,40 --duration 30
+    python benchmarks/load_test.py --config w1t4:workers=1,threads=4 \\
+        --config w1t8:workers=1,threads=8 --config sem-cache:threads=4,POOL_CACHE_BYTES=0
+    python benchmarks/load_test.py --url http://127.0.0.1:5000 --rates 10
+
+Chaves em maiusculas na --config viram variaveis de ambiente do servidor.
+A latencia conta a partir do horario agendado da chegada (inclui fila do
+cliente), entao o servidor saturado aparece nos percentis, nao escondido.
+"""
+
+import argparse
+import contextlib
+import http.client
+import json
+import os
+import queue
+import random
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+DEFAULT_MIX = "draw=40,preview=25,share_create=10,share_poll=15,share_update=5,export=5"
+DEFAULT_CONFIG = "w1t4:workers=1,threads=4"
+NAMES = ["Ana", "Bruno", "Carla", "Diego", "Elisa", "Fabio", "Gabi", "Hugo", "Iris", "Joao", "Kaio", "Lia", "Mateus", "Nina"]
+FILTERS = [
+    {"mode": "all"},
+    {"mode": "top", "top_n": 50},
+    {"mode": "all", "team_types": ["CLUB"], "genders": ["MEN"], "overall_min": 75},
+    {"mode": "all", "team_types": ["NATIONAL"]},
+]
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank sobre a lista ja ordenada."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-int(p * len(sorted_values)) // 100))
+    return sorted_values[min(len(sorted_values), rank) - 1]
+
+
+# --- configuracoes e servidor ---
+
+
+def parse_config(spec: str) -> Dict[str, Any]:
+    """"nome:workers=2,threads=4,POOL_CACHE_BYTES=0" -> {name, workers, threads, env}."""
+    name, _, rest = spec.partition(":")
+    config: Dict[str, Any] = {"name": name or spec, "workers": 1, "threads": 4, "env": {}}
+    for item in filter(None, (p.strip() for p in rest.split(","))):
+        key, _, value = item.partition("=")
+        if key in ("workers", "threads"):
+            config[key] = int(value)
+        elif key.isupper():
+            config["env"][key] = value
+        else:
+            raise SystemExit(f"Chave invalida na config {name}: {key}")
+    return config
+
+
+class Server:
+    """gunicorn gthread local com banco e metricas proprios (diretorio temporario apagado ao sair)."""
+
+    def __init__(self, config: Dict[str, Any], port: int, log_path: str):
+        self.config = config
+        self.port = port
+        self.log_path = log_path
+        self.tmp = tempfile.mkdtemp(prefix="loadtest-")
+        self.proc: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "Server":
+        metrics_dir = os.path.join(self.tmp, "metrics")
+        os.makedirs(metrics_dir)
+        env = dict(os.environ)
+        env.update(
+            HISTORY_DB=os.path.join(self.tmp, "history.sqlite3"),
+            PROMETHEUS_MULTIPROC_DIR=metrics_dir,
+            METRICS_FLUSH_SECONDS="1",
+            FLASK_DEBUG="0",
+        )
+        env.pop("METRICS_TOKEN", None)
+        env.update(self.config["env"])
+        cmd = [
+            sys.executable, "-m", "gunicorn", "-k", "gthread",
+            "-w", str(self.config["workers"]), "--threads", str(self.config["threads"]),
+            "-b", f"127.0.0.1:{self.port}", "--timeout", "120", "--keep-alive", "5", "app:app",
+        ]  # fmt: skip
+        self.log = open(self.log_path, "ab")
+        self.proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=self.log, stderr=subprocess.STDOUT)
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                self.__exit__()
+                raise SystemExit(f"gunicorn saiu com codigo {self.proc.returncode}; veja {self.log_path}")
+            try:
+                status, _ = request_once(self.url, "GET", "/metrics")
+                if status == 200:
+                    return self
+            except OSError:
+                pass
+            time.sleep(0.2)
+        self.__exit__()
+        raise SystemExit(f"gunicorn nao respondeu em 60s; veja {self.log_path}")
+
+    def __exit__(self, *exc) -> None:
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.send_signal(signal.SIGTERM)
+            try:
+                self.proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        self.log.close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+def request_once(base: str, method: str, path: str) -> Tuple[int, bytes]:
+    parts = urlsplit(base)
+    con = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+    try:
+        con.request(method, path)
+        resp = con.getresponse()
+        return resp.status, resp.read()
+    finally:
+        con.close()
+
+
+# --- metricas do servidor ---
+
+_SAMPLE = re.compile(r'^(\w+)(?:\{([^}]*)\})? (\S+)$')
+
+
+def scrape(base: str) -> Dict[Tuple[str, str], float]:
+    """(serie, labels) -> valor do /metrics; vazio se o endpoint nao responder."""
+    try:
+        status, body = request_once(base, "GET", "/metrics")
+    except OSError:
+        return {}
+    if status != 200:
+        return {}
+    out: Dict[Tuple[str, str], float] = {}
+    for line in body.decode("utf-8", "replace").splitlines():
+        m = _SAMPLE.match(line)
+        if m:
+            out[(m.group(1), m.group(2) or "")] = float(m.group(3))
+    return out
+
+
+def sqlite_delta(before: Dict[Tuple[str, str], float], after: Dict[Tuple[str, str], float]) -> Dict[str, Any]:
+    """Escritas, tempo medio/total de escrita (inclui espera pelo lock), escritas > 100 ms e busy no periodo."""
+
+    def total(series: str, label_filter: str = "") -> float:
+        return sum(v - before.get(k, 0.0) for k, v in after.items() if k[0] == series and label_filter in k[1])
+
+    writes = total("sqlite_write_seconds_count")
+    seconds = total("sqlite_write_seconds_sum")
+    fast = total("sqlite_write_seconds_bucket", 'le="0.1"')
+    return {
+        "writes": int(writes),
+        "write_seconds": round(seconds, 4),
+        "mean_write_ms": round(1000 * seconds / writes, 3) if writes else None,
+        "writes_over_100ms": int(writes - fast),
+        "busy_errors": int(total("sqlite_busy_total")),
+    }
+
+
+# --- trafego ---
+
+
+class Client:
+    """Conexao keep-alive + cookie de sessao por thread (cada thread e um visitante)."""
+
+    def __init__(self, base: str):
+        parts = urlsplit(base)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.con: Optional[http.client.HTTPConnection] = None
+        self.cookie = ""
+
+    def call(self, method: str, path: str, body: Any = None) -> Tuple[int, bytes]:
+        data = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        if self.cookie:
+            headers["Cookie"] = self.cookie
+        for attempt in (0, 1):
+            if self.con is None:
+                self.con = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.con.request(method, path, body=data, headers=headers)
+                resp = self.con.getresponse()
+                payload = resp.read()
+            except (http.client.HTTPException, OSError):
+                # Keep-alive fechado pelo servidor: reconecta uma vez.
+                self.con.close()
+                self.con = None
+                if attempt:
+                    raise
+                continue
+            cookie = resp.getheader("Set-Cookie")
+            if cookie:
+                self.cookie = cookie.split(";", 1)[0]
+            return resp.status, payload
+        raise OSError("sem resposta")
+
+
+class Traffic:
+    """Cenarios do trafego misto; os codigos de share criados viram salas para poll/update."""
+
+    def __init__(self, base: str, dataset: str, rng: random.Random):
+        self.base = base
+        self.dataset = dataset
+        self.rng = rng
+        self.rooms: List[str] = []
+        self.last_draw: List[Dict[str, Any]] = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # Visitantes reaproveitados entre as taxas: criar sessao de convidado e caro e nao e o que se mede.
+        self.idle: "queue.SimpleQueue[Client]" = queue.SimpleQueue()
+
+    def acquire(self) -> None:
+        try:
+            self.local.client = self.idle.get_nowait()
+        except queue.Empty:
+            self.local.client = Client(self.base)
+
+    def release(self) -> None:
+        self.idle.put(self.local.client)
+
+    def client(self) -> Client:
+        return self.local.client
+
+    def _players(self) -> List[str]:
+        return self.rng.sample(NAMES, self.rng.randint(4, len(NAMES)))
+
+    def _room(self) -> Optional[str]:
+        with self.lock:
+            return self.rng.choice(self.rooms) if self.rooms else None
+
+    def draw(self) -> Tuple[str, int]:
+        body = {
+            "dataset": self.dataset,
+            "participants": self._players(),
+            "filters": self.rng.choice(FILTERS),
+            "balance_mode": self.rng.choice(["random", "tiers"]),
+        }
+        status, payload = self.client().call("POST", "/api/draw", body)
+        if status == 200:
+            rows = json.loads(payload).get("draw") or []
+            with self.lock:
+                self.last_draw = rows
+        return "draw", status
+
+    def preview(self) -> Tuple[str, int]:
+        body = {"dataset": self.dataset, "filters": self.rng.choice(FILTERS), "limit": 30}
+        return "preview", self.client().call("POST", "/api/pool_preview", body)[0]
+
+    def _share_payload(self) -> Dict[str, Any]:
+        with self.lock:
+            rows = list(self.last_draw)
+        return {"dataset": self.dataset, "draw": rows, "meta": {"updated": time.time()}}
+
+    def share_create(self) -> Tuple[str, int]:
+        status, payload = self.client().call("POST", "/api/share", self._share_payload())
+        if status == 200:
+            with self.lock:
+                self.rooms.append(json.loads(payload)["code"])
+                if len(self.rooms) > 500:
+                    del self.rooms[:100]
+        return "share_create", status
+
+    def share_poll(self) -> Tuple[str, int]:
+        code = self._room()
+        if code is None:
+            return self.share_create()
+        return "share_poll", self.client().call("GET", f"/api/share/{code}")[0]
+
+    def share_update(self) -> Tuple[str, int]:
+        code = self._room()
+        if code is None:
+            return self.share_create()
+        return "share_update", self.client().call("PUT", f"/api/share/{code}", self._share_payload())[0]
+
+    def export(self) -> Tuple[str, int]:
+        with self.lock:
+            rows = list(self.last_draw)
+        if not rows:
+            return self.draw()
+        return "export", self.client().call("POST", "/api/export_xlsx", {"draw": rows})[0]
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    mix = []
+    for item in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, weight = item.partition("=")
+        if not hasattr(Traffic, name) or name.startswith("_"):
+            raise SystemExit(f"Cenario desconhecido: {name}")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def run_rate(base: str, traffic: Traffic, mix: List[Tuple[str, float]], rate: float, duration: float, concurrency: int, seed: int) -> Dict[str, Any]:
+    """
+    Chegadas de Poisson a `rate` req/s por `duration` s. Cada chegada vai para
+    um pool de `concurrency` threads; se todas estiverem ocupadas ela espera na
+    fila e essa espera entra na latencia.
+    """
+    rng = random.Random(seed)
+    names = [n for n, _ in mix]
+    weights = [w for _, w in mix]
+    samples: List[Tuple[str, float, int]] = []
+    failures: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def job(scenario: str, scheduled: float) -> None:
+        traffic.acquire()
+        try:
+            endpoint, status = getattr(traffic, scenario)()
+        except Exception as e:  # conexao recusada/timeout contam como erro do endpoint
+            endpoint, status = scenario, 0
+            with lock:
+                failures[type(e).__name__] = failures.get(type(e).__name__, 0) + 1
+        finally:
+            traffic.release()
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            samples.append((endpoint, elapsed, status))
+
+    before = scrape(base)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        t = 0.0
+        while True:
+            t += rng.expovariate(rate)
+            if t >= duration:
+                break
+            scheduled = started + t
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(job, rng.choices(names, weights)[0], scheduled)
+    wall = time.perf_counter() - started
+    time.sleep(1.5)  # deixa os workers gravarem o agregado das metricas
+    return summarize(samples, wall, rate, failures, sqlite_delta(before, scrape(base)))
+
+
+def summarize(
+    samples: List[Tuple[str, float, int]], wall: float, rate: float, failures: Dict[str, int], sqlite: Dict[str, Any]
+) -> Dict[str, Any]:
+    by_endpoint: Dict[str, List[Tuple[float, int]]] = {}
+    for endpoint, elapsed, status in samples:
+        by_endpoint.setdefault(endpoint, []).append((elapsed, status))
+    by_endpoint["TOTAL"] = [(e, s) for _, e, s in samples]
+
+    endpoints = {}
+    for endpoint, items in sorted(by_endpoint.items()):
+        latencies = sorted(e for e, _ in items)
+        errors = sum(1 for _, s in items if s == 0 or s >= 400)
+        endpoints[endpoint] = {
+            "requests": len(items),
+            "throughput_rps": round(len(items) / wall, 2),
+            "error_rate": round(errors / len(items), 4) if items else 0.0,
+            "p50_ms": _ms(percentile(latencies, 50)),
+            "p95_ms": _ms(percentile(latencies, 95)),
+            "p99_ms": _ms(percentile(latencies, 99)),
+            "max_ms": _ms(latencies[-1] if latencies else None),
+        }
+    return {"target_rps": rate, "wall_s": round(wall, 2), "endpoints": endpoints, "failures": failures, "sqlite": sqlite}
+
+
+def _ms(value: Optional[float]) -> Optional[float]:
+    return round(value * 1000, 2) if value is not None else None
+
+
+def print_run(label: str, res: Dict[str, Any]) -> None:
+    print(f"\n== {label}  alvo {res['target_rps']:g} req/s, {res['wall_s']:g}s")
+    print(f"{'endpoint':<14} {'req':>6} {'req/s':>8} {'erro%':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for endpoint, e in res["endpoints"].items():
+        print(
+            f"{endpoint:<14} {e['requests']:>6} {e['throughput_rps']:>8.2f} {100 * e['error_rate']:>6.1f}"
+            + "".join(f" {v if v is not None else '-':>9}" for v in (e["p50_ms"], e["p95_ms"], e["p99_ms"], e["max_ms"]))
+        )
+    sq = res["sqlite"]
+    if sq.get("writes"):
+        print(
+            f"sqlite: {sq['writes']} escritas, media {sq['mean_write_ms']} ms, "
+            f"{sq['writes_over_100ms']} acima de 100 ms, {sq['busy_errors']} 'database is locked'"
+        )
+    if res["failures"]:
+        print(f"falhas de conexao: {res['failures']}")
+
+
+def print_comparison(runs: List[Dict[str, Any]]) -> None:
+    print(f"\n{'config':<16} {'alvo':>6} {'req/s':>8} {'erro%':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'sqlite ms':>10}")
+    for run in runs:
+        total = run["result"]["endpoints"].get("TOTAL") or {}
+        sq = run["result"]["sqlite"]
+        print(
+            f"{run['config']:<16} {run['result']['target_rps']:>6g} {total.get('throughput_rps', 0):>8.2f}"
+            f" {100 * total.get('error_rate', 0):>6.1f} {total.get('p50_ms') or '-':>9} {total.get('p95_ms') or '-':>9}"
+            f" {total.get('p99_ms') or '-':>9} {sq.get('mean_write_ms') or '-':>10}"
+        )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Teste de carga HTTP com percentis por endpoint.")
+    ap.add_argument("--config", action="append", default=[], help=f"nome:chave=valor,... (padrao {DEFAULT_CONFIG}). Repetivel.")
+    ap.add_argument("--url", default="", help="Servidor ja rodando (ignora --config).")
+    ap.add_argument("--rates", default="10", help="Taxas de chegada em req/s, separadas por virgula.")
+    ap.add_argument("--duration", type=float, default=20.0, help="Segundos por taxa.")
+    ap.add_argument("--warmup", type=float, default=3.0, help="Segundos de aquecimento (nao medidos) por servidor.")
+    ap.add_argument("--concurrency", type=int, default=64, help="Maximo de requisicoes simultaneas do cliente.")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="Pesos dos cenarios.")
+    ap.add_argument("--dataset", default="fc25")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default="", help="JSON de saida (padrao: benchmarks/results/load-<data>.json).")
+    args = ap.parse_args()
+
+    mix = parse_mix(args.mix)
+    rates = [float(r) for r in args.rates.split(",") if r.strip()]
+    configs = [parse_config(c) for c in (args.config or [DEFAULT_CONFIG])]
+    if args.url:
+        configs = [{"name": "externo", "url": args.url.rstrip("/")}]
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    log_path = os.path.join(RESULTS_DIR, f"load-{stamp}.log")
+
+    runs: List[Dict[str, Any]] = []
+    for config in configs:
+        server = contextlib.nullcontext() if "url" in config else Server(config, args.port, log_path)
+        with server as running:
+            base = config.get("url") or running.url
+            traffic = Traffic(base, args.dataset, random.Random(args.seed))
+            if args.warmup > 0:
+                run_rate(base, traffic, mix, max(rates), args.warmup, args.concurrency, args.seed + 1)
+            for rate in rates:
+                res = run_rate(base, traffic, mix, rate, args.duration, args.concurrency, args.seed)
+                print_run(f"{config['name']}", res)
+                runs.append({"config": config["name"], "settings": {k: v for k, v in config.items() if k != "name"}, "result": res})
+
+    if len(runs) > 1:
+        print_comparison(runs)
+    out = args.out or os.path.join(RESULTS_DIR, f"load-{stamp}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"mix": dict(mix), "duration_s": args.duration, "runs": runs}, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    print(f"\nResultado: {os.path.relpath(out, ROOT)}")
+
+
+if __name__ == "__main__":
+    main()
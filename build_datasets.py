@@ -0,0 +1,314 @@
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.changelog import KEY_FIELDS, read_csv, row_key, summarize, write_incremental
+from services.datasets import BUILD_DIR, DATASETS, INT_FIELDS, write_snapshot
+from services.pools import POOLS_PATH, read_pools, resolve_presets
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_PATH = os.path.join(BUILD_DIR, "manifest.json")
+
+# Bump quando a logica de algum estagio mudar, para invalidar o cache.
+PIPELINE_VERSION = "2"
+
+SOURCES: Dict[str, Dict[str, str]] = {
+    "fc25": {"kind": "xlsx", "path": os.path.join(BASE_DIR, "times_fc25.xlsx"), "importer": "import_xlsx_teams"},
+    "nba": {"kind": "xlsx", "path": os.path.join(BASE_DIR, "times_nba.xlsx"), "importer": "import_xlsx_nba"},
+}
+
+REQUIRED_COLUMNS = ["team_id", "team_name", "team_type", "gender", "overall", "attack", "midfield", "defence", "is_valid"]
+COLUMN_DEFAULTS = {"team_type": "CLUB", "gender": "MEN", "is_valid": "1"}
+UPPER_FIELDS = ("team_type", "gender")
+
+
+def _sha1_bytes(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def _sha1_file(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _sha1_json(obj: Any) -> str:
+    return _sha1_bytes(json.dumps(obj, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+
+
+def _dump(path: str, obj: Any) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def _load(path: str) -> Any:
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _write_json(path: str, obj: Any) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+class BuildError(Exception):
+    pass
+
+
+# Cada estagio recebe o contexto e devolve o caminho do artefato que produziu.
+
+
+def stage_source(ctx: Dict[str, Any]) -> str:
+    source = ctx["source"]
+    out = os.path.join(ctx["dir"], "source.pkl")
+    if source["kind"] == "xlsx":
+        importer = importlib.import_module(source["importer"])
+        headers, rows = importer.read_teams_from_xlsx(source["path"])
+    elif source["kind"] == "scrape":
+        import build_teams_dataset
+
+        scraped = os.path.join(ctx["dir"], "scraped.csv")
+        build_teams_dataset.build_dataset(output_csv=scraped)
+        headers, rows = read_csv(scraped)
+    else:
+        headers, rows = read_csv(source["path"])
+    _dump(out, {"headers": headers, "rows": rows})
+    return out
+
+
+def stage_normalize(ctx: Dict[str, Any]) -> str:
+    data = _load(ctx["artifacts"]["source"])
+    headers = [h.strip() for h in data["headers"] if h and h.strip()]
+    for col in REQUIRED_COLUMNS:
+        if col not in headers:
+            headers.append(col)
+
+    rows: List[Dict[str, str]] = []
+    for raw in data["rows"]:
+        row: Dict[str, str] = {}
+        for h in headers:
+            v = raw.get(h)
+            v = "" if v is None else str(v).strip()
+            if not v and h in COLUMN_DEFAULTS:
+                v = COLUMN_DEFAULTS[h]
+            if h in INT_FIELDS:
+                try:
+                    v = str(int(float(v))) if v else "0"
+                except ValueError:
+                    v = "0"
+            elif h in UPPER_FIELDS:
+                v = v.upper()
+            row[h] = v
+        rows.append(row)
+
+    out = os.path.join(ctx["dir"], "normalized.pkl")
+    _dump(out, {"headers": headers, "rows": rows})
+    return out
+
+
+def stage_validate(ctx: Dict[str, Any]) -> str:
+    data = _load(ctx["artifacts"]["normalize"])
+    rows = data["rows"]
+    errors: List[str] = []
+    warnings: List[str] = []
+
+    if not rows:
+        errors.append("Dataset vazio.")
+    seen: Dict[str, int] = {}
+    for i, r in enumerate(rows, start=2):
+        if not r.get("team_id") or not r.get("team_name"):
+            errors.append(f"Linha {i}: team_id/team_name vazio.")
+        key = row_key(r)
+        if key in seen:
+            errors.append(f"Linha {i}: chave duplicada ({'/'.join(KEY_FIELDS)} = {key}), ja usada na linha {seen[key]}.")
+        seen[key] = i
+        overall = int(r.get("overall") or 0)
+        if overall < 0 or overall > 99:
+            warnings.append(f"Linha {i}: overall fora de 0-99 ({overall}).")
+
+    presets = resolve_presets(rows, ctx["pools"].get(ctx["dataset"]) or [])
+    for key, p in presets.items():
+        if p["unknown_ids"]:
+            warnings.append(f"Preset {key}: ids inexistentes no dataset: {', '.join(p['unknown_ids'])}")
+        if p["ambiguous_ids"]:
+            warnings.append(f"Preset {key}: ids que casam com mais de um time: {', '.join(p['ambiguous_ids'])}")
+
+    report = {"dataset": ctx["dataset"], "rows": len(rows), "errors": errors, "warnings": warnings}
+    out = os.path.join(ctx["dir"], "validation.json")
+    _write_json(out, report)
+    if errors:
+        raise BuildError(f"{len(errors)} erro(s) de validacao; veja {out}")
+    return out
+
+
+def stage_snapshot(ctx: Dict[str, Any]) -> str:
+    data = _load(ctx["artifacts"]["normalize"])
+    csv_path = DATASETS[ctx["dataset"]]["path"]
+    changelog = write_incremental(csv_path, data["headers"], data["rows"])
+    ctx["notes"].append(summarize(changelog))
+    return write_snapshot(ctx["dataset"])
+
+
+# (nome, dependencias, funcao, entradas externas extras para a chave de cache, depende do CSV publicado)
+STAGES: List[Tuple[str, List[str], Callable[[Dict[str, Any]], str], Callable[[Dict[str, Any]], Any], bool]] = [
+    ("source", [], stage_source, lambda ctx: ctx["source_key"], False),
+    ("normalize", ["source"], stage_normalize, lambda ctx: None, False),
+    ("validate", ["normalize"], stage_validate, lambda ctx: ctx["pools_key"], False),
+    ("snapshot", ["validate", "normalize"], stage_snapshot, lambda ctx: None, True),
+]
+
+
+def _csv_stamp(dataset: str) -> Optional[List[int]]:
+    try:
+        st = os.stat(DATASETS[dataset]["path"])
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _source_for(dataset: str, scrape: bool) -> Dict[str, str]:
+    if scrape and dataset == "fc25":
+        return {"kind": "scrape"}
+    source = SOURCES.get(dataset)
+    if source and os.path.exists(source["path"]):
+        return source
+    return {"kind": "csv", "path": DATASETS[dataset]["path"]}
+
+
+def _source_key(source: Dict[str, str]) -> Any:
+    if source["kind"] == "scrape":
+        # Rede nao tem hash de conteudo confiavel: sempre roda (o scraper tem cache proprio).
+        return time.time()
+    if source["kind"] == "xlsx":
+        module = importlib.import_module(source["importer"])
+        return [_sha1_file(source["path"]), _sha1_file(module.__file__)]
+    return _sha1_file(source["path"])
+
+
+def build_one(dataset: str, manifest: Dict[str, Any], force: bool = False, scrape: bool = False) -> Dict[str, Any]:
+    """
+    Roda o DAG de estagios de um dataset. Um estagio e pulado quando a chave
+    (hash das entradas + artefatos das dependencias) bate com o manifest.
+    """
+    out_dir = os.path.join(BUILD_DIR, dataset)
+    os.makedirs(out_dir, exist_ok=True)
+    source = _source_for(dataset, scrape)
+    ctx: Dict[str, Any] = {
+        "dataset": dataset,
+        "dir": out_dir,
+        "source": source,
+        "source_key": _source_key(source),
+        "pools": read_pools(),
+        "pools_key": _sha1_file(POOLS_PATH) if os.path.exists(POOLS_PATH) else None,
+        "artifacts": {},
+        "notes": [],
+    }
+    previous = manifest.get(dataset) or {}
+    stages: Dict[str, Dict[str, Any]] = {}
+    result: Dict[str, Any] = {"dataset": dataset, "stages": stages, "ok": True}
+
+    for name, deps, fn, extra, watches_csv in STAGES:
+        started = time.perf_counter()
+        dep_hashes = [stages[d]["output_sha1"] for d in deps]
+        key = _sha1_json([PIPELINE_VERSION, name, dep_hashes, extra(ctx)])
+        prev = previous.get(name) or {}
+        output = prev.get("output")
+        cached = (
+            not force
+            and prev.get("key") == key
+            and output
+            and os.path.exists(output)
+            and _sha1_file(output) == prev.get("output_sha1")
+            and (not watches_csv or prev.get("csv_stamp") == _csv_stamp(dataset))
+        )
+        try:
+            if not cached:
+                output = fn(ctx)
+        except Exception as e:
+            stages[name] = {"status": "error", "error": str(e), "seconds": time.perf_counter() - started}
+            result["ok"] = False
+            break
+        ctx["artifacts"][name] = output
+        stages[name] = {
+            "status": "cached" if cached else "built",
+            "key": key,
+            "output": output,
+            "output_sha1": prev.get("output_sha1") if cached else _sha1_file(output),
+            "seconds": time.perf_counter() - started,
+        }
+        if watches_csv:
+            stages[name]["csv_stamp"] = _csv_stamp(dataset)
+
+    result["notes"] = ctx["notes"]
+    return result
+
+
+def load_manifest() -> Dict[str, Any]:
+    try:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def build_all(datasets: List[str], jobs: int = 0, force: bool = False, scrape: bool = False) -> List[Dict[str, Any]]:
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    manifest = load_manifest()
+    jobs = jobs or min(len(datasets), os.cpu_count() or 1)
+    if jobs <= 1 or len(datasets) <= 1:
+        results = [build_one(d, manifest, force, scrape) for d in datasets]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(build_one, d, manifest, force, scrape) for d in datasets]
+            results = [f.result() for f in futures]
+
+    for r in results:
+        if r["ok"]:
+            manifest[r["dataset"]] = r["stages"]
+    _write_json(MANIFEST_PATH, manifest)
+    return results
+
+
+def _print_report(results: List[Dict[str, Any]], total: float) -> None:
+    for r in results:
+        print(f"== {r['dataset']} ({'OK' if r['ok'] else 'FALHOU'})")
+        for name, st in r["stages"].items():
+            line = f"   {name:<10} {st['status']:<7} {st['seconds'] * 1000:8.1f} ms"
+            if st.get("error"):
+                line += f"  {st['error']}"
+            print(line)
+        for note in r.get("notes") or []:
+            print(f"   CSV: {note}")
+    print(f"Total: {total:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build dos datasets: fonte -> normalizacao -> validacao -> snapshot.")
+    parser.add_argument("datasets", nargs="*", help="chaves dos datasets (padrao: todos)")
+    parser.add_argument("--jobs", type=int, default=0, help="processos em paralelo (padrao: um por dataset)")
+    parser.add_argument("--force", action="store_true", help="ignora o cache de estagios")
+    parser.add_argument("--scrape", action="store_true", help="fc25 vem do FIFACM em vez do XLSX")
+    args = parser.parse_args()
+
+    keys = args.datasets or list(DATASETS.keys())
+    unknown = [k for k in keys if k not in DATASETS]
+    if unknown:
+        parser.error(f"Dataset invalido: {', '.join(unknown)}")
+
+    t0 = time.perf_counter()
+    results = build_all(keys, jobs=args.jobs, force=args.force, scrape=args.scrape)
+    _print_report(results, time.perf_counter() - t0)
+    raise SystemExit(0 if all(r["ok"] for r in results) else 1)
@@ -1,15 +1,22 @@
-﻿import csv
+﻿import argparse
+import hashlib
+import json
 import os
 import re
 import time
-from dataclasses import dataclass
-from typing import List, Tuple
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
 from bs4 import BeautifulSoup
 
+from services.changelog import summarize, write_csv, write_incremental
+from services.fetcher import CachedFetcher
+
 BASE = "https://www.fifacm.com"
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 LEAGUES_URL = f"{BASE}/25/leagues"
+CACHE_DIR = os.path.join(BASE_DIR, "data", ".scrape_cache")
+CHECKPOINT_DIR = os.path.join(BASE_DIR, "data", ".scrape_checkpoints")
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
@@ -19,9 +26,6 @@ HEADERS = {
     "Referer": BASE,
 }
 
-SESSION = requests.Session()
-SESSION.headers.update(HEADERS)
-
 @dataclass
 class Team:
     team_name: str
@@ -32,17 +36,7 @@ class Team:
     defence: int
     team_url: str
 
-def _get(url: str) -> str:
-    r = SESSION.get(url, timeout=30)
-    if r.status_code == 403:
-        raise RuntimeError(
-            "Acesso negado (HTTP 403). O site pode bloquear automatizacao. "
-            "Tente novamente mais tarde ou use outra rede."
-        )
-    r.raise_for_status()
-    return r.text
-
-def _parse_leagues(html: str) -> List[Tuple[str, str]]:
+def _parse_leagues(html: str, base: str = BASE) -> List[Tuple[str, str]]:
     """
     Retorna lista de (league_name, league_url).
     """
@@ -55,7 +49,7 @@ def _parse_leagues(html: str) -> List[Tuple[str, str]]:
         name = a.get_text(strip=True)
         if not href or not name:
             continue
-        full = f"{BASE}{href}"
+        full = f"{base}{href}"
         key = (name, full)
         if key in seen:
             continue
@@ -63,7 +57,7 @@ def _parse_leagues(html: str) -> List[Tuple[str, str]]:
         out.append(key)
     return out
 
-def _extract_team_cards(league_name: str, league_url: str, html: str) -> List[Team]:
+def _extract_team_cards(league_name: str, league_url: str, html: str, base: str = BASE) -> List[Team]:
     """
     Nas paginas de liga do FIFACM, os times aparecem em blocos com texto tipo:
     "OVR 80 ATT 77 MID 78 DEF 80"
@@ -74,7 +68,7 @@ def _extract_team_cards(league_name: str, league_url: str, html: str) -> List[Te
     teams: List[Team] = []
     for a in anchors:
         href = a.get("href", "").strip()
-        full_url = f"{BASE}{href}" if href.startswith("/") else href
+        full_url = f"{base}{href}" if href.startswith("/") else href
         text = " ".join(a.get_text(" ", strip=True).split())
 
         # Exemplo de padrao que aparece na liga:
@@ -112,19 +106,103 @@ def _extract_team_cards(league_name: str, league_url: str, html: str) -> List[Te
         uniq[t.team_url] = t
     return list(uniq.values())
 
-def build_dataset(output_csv: str = os.path.join(BASE_DIR, "data", "teams_fc25.csv"), sleep_s: float = 0.2) -> int:
-    leagues_html = _get(LEAGUES_URL)
-    leagues = _parse_leagues(leagues_html)
+def _team_id_from_url(url: str) -> str:
+    m = re.search(r"/team/(\d+)", url)
+    return m.group(1) if m else url
 
-    all_teams: List[Team] = []
-    for league_name, league_url in leagues:
+
+def _checkpoint_path(checkpoint_dir: str, league_url: str) -> str:
+    key = hashlib.sha1(league_url.encode("utf-8")).hexdigest()
+    return os.path.join(checkpoint_dir, f"{key}.json")
+
+
+def _load_checkpoint(checkpoint_dir: str, league_url: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_checkpoint_path(checkpoint_dir, league_url), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _save_checkpoint(checkpoint_dir: str, league_name: str, league_url: str, sha1: str, teams: List[Team]) -> None:
+    path = _checkpoint_path(checkpoint_dir, league_url)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "league": league_name,
+                "league_url": league_url,
+                "sha1": sha1,
+                "saved_at": time.time(),
+                "teams": [asdict(t) for t in teams],
+            },
+            f,
+            ensure_ascii=False,
+        )
+    os.replace(tmp, path)
+
+
+def _scrape_league(
+    fetcher: CachedFetcher,
+    league_name: str,
+    league_url: str,
+    base: str,
+    checkpoint_dir: str,
+    max_age_s: float,
+) -> Tuple[List[Team], str]:
+    """
+    Retorna (times, origem). Ligas com checkpoint recente nem vao para a rede;
+    paginas que nao mudaram (304 ou mesmo sha1) reaproveitam o checkpoint.
+    """
+    cp = _load_checkpoint(checkpoint_dir, league_url)
+    if cp and max_age_s > 0 and time.time() - cp.get("saved_at", 0) < max_age_s:
+        return [Team(**t) for t in cp["teams"]], "checkpoint"
+
+    html, sha1, _ = fetcher.get(league_url)
+    if cp and cp.get("sha1") == sha1:
+        teams = [Team(**t) for t in cp["teams"]]
+        _save_checkpoint(checkpoint_dir, league_name, league_url, sha1, teams)
+        return teams, "unchanged"
+
+    teams = _extract_team_cards(league_name, league_url, html, base)
+    _save_checkpoint(checkpoint_dir, league_name, league_url, sha1, teams)
+    return teams, "parsed"
+
+
+def build_dataset(
+    output_csv: str = os.path.join(BASE_DIR, "data", "teams_fc25.csv"),
+    sleep_s: float = 0.2,
+    incremental: bool = False,
+    workers: int = 8,
+    base_url: str = BASE,
+    cache_dir: Optional[str] = CACHE_DIR,
+    checkpoint_dir: str = CHECKPOINT_DIR,
+    max_age_s: float = 3600,
+) -> int:
+    # sleep_s continua sendo o intervalo minimo entre requisicoes, agora como limite global.
+    rate = 1.0 / sleep_s if sleep_s > 0 else 1000.0
+    headers = dict(HEADERS, Referer=base_url)
+    fetcher = CachedFetcher(headers, cache_dir=cache_dir, rate=rate)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+
+    leagues_html, _, _ = fetcher.get(f"{base_url}/25/leagues")
+    leagues = _parse_leagues(leagues_html, base_url)
+
+    def work(league: Tuple[str, str]) -> Tuple[List[Team], str]:
+        league_name, league_url = league
         try:
-            html = _get(league_url)
-            teams = _extract_team_cards(league_name, league_url, html)
-            all_teams.extend(teams)
-            time.sleep(sleep_s)
+            return _scrape_league(fetcher, league_name, league_url, base_url, checkpoint_dir, max_age_s)
         except Exception as e:
             print(f"[WARN] Falha ao processar liga: {league_name} ({league_url}). Erro: {e}")
+            return [], "error"
+
+    all_teams: List[Team] = []
+    origins: Dict[str, int] = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for teams, origin in pool.map(work, leagues):
+            all_teams.extend(teams)
+            origins[origin] = origins.get(origin, 0) + 1
+    print(f"[INFO] Ligas: {len(leagues)} ({', '.join(f'{k}={v}' for k, v in sorted(origins.items()))})")
 
     # Dedup global por nome+liga+overall (caso algum time apareca em mais de uma lista)
     seen = set()
@@ -138,14 +216,50 @@ def build_dataset(output_csv: str = os.path.join(BASE_DIR, "data", "teams_fc25.c
 
     final.sort(key=lambda x: (-x.overall, x.team_name.lower()))
 
-    with open(output_csv, "w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["team_name", "league", "overall", "attack", "midfield", "defence", "team_url"])
-        for t in final:
-            w.writerow([t.team_name, t.league, t.overall, t.attack, t.midfield, t.defence, t.team_url])
+    headers = ["team_id", "team_name", "league", "overall", "attack", "midfield", "defence", "team_url"]
+    rows = []
+    seen_ids = set()
+    for t in final:
+        team_id = _team_id_from_url(t.team_url)
+        if team_id in seen_ids:
+            continue
+        seen_ids.add(team_id)
+        rows.append(
+            {
+                "team_id": team_id,
+                "team_name": t.team_name,
+                "league": t.league,
+                "overall": t.overall,
+                "attack": t.attack,
+                "midfield": t.midfield,
+                "defence": t.defence,
+                "team_url": t.team_url,
+            }
+        )
+
+    if incremental:
+        changelog = write_incremental(output_csv, headers, rows)
+        print(f"[INFO] {summarize(changelog)}")
+    else:
+        write_csv(output_csv, headers, rows)
 
-    return len(final)
+    return len(rows)
 
 if __name__ == "__main__":
-    n = build_dataset()
+    parser = argparse.ArgumentParser(description="Gera o CSV do FC 25 a partir do FIFACM.")
+    parser.add_argument("--incremental", action="store_true", help="so regrava o CSV se algo mudou")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--sleep", type=float, default=0.2, help="intervalo minimo global entre requisicoes")
+    parser.add_argument("--base-url", default=BASE)
+    parser.add_argument("--max-age", type=float, default=3600, help="segundos em que um checkpoint evita a rede")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+    n = build_dataset(
+        incremental=args.incremental,
+        workers=args.workers,
+        sleep_s=args.sleep,
+        base_url=args.base_url.rstrip("/"),
+        cache_dir=None if args.no_cache else CACHE_DIR,
+        max_age_s=0 if args.no_cache else args.max_age,
+    )
     print(f"OK. Dataset gerado com {n} times em data/teams_fc25.csv")
@@ -1,9 +1,10 @@
-﻿import csv
-import os
-import re
+﻿import os
+import sys
 import zipfile
-import xml.etree.ElementTree as ET
-from typing import Dict, List, Optional
+from typing import Dict, List, Tuple
+
+from services.changelog import summarize, write_csv, write_incremental
+from services.xlsx import iter_rows, read_shared_strings, sheet_paths
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 XLSX_PATH = os.path.join(BASE_DIR, "times_nba.xlsx")
@@ -13,55 +14,6 @@ SHEETS = {
     "WNBA_TEAMS": "WOMEN",
 }
 
-NS = {"a": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
-
-
-def col_to_idx(col: str) -> int:
-    idx = 0
-    for ch in col:
-        idx = idx * 26 + (ord(ch) - 64)
-    return idx - 1
-
-
-def _sheet_file_by_name(zf: zipfile.ZipFile, name: str) -> Optional[str]:
-    wb = ET.fromstring(zf.read("xl/workbook.xml"))
-    for sheet in wb.findall("a:sheets/a:sheet", NS):
-        if sheet.get("name") == name:
-            sheet_id = sheet.get("sheetId")
-            if sheet_id and sheet_id.isdigit():
-                return f"xl/worksheets/sheet{sheet_id}.xml"
-    return None
-
-
-def _parse_sheet(zf: zipfile.ZipFile, sheet_path: str) -> List[List[str]]:
-    root = ET.fromstring(zf.read(sheet_path))
-    rows: List[List[str]] = []
-    for row in root.findall("a:sheetData/a:row", NS):
-        cells: Dict[int, str] = {}
-        for c in row.findall("a:c", NS):
-            ref = c.get("r")
-            if not ref:
-                continue
-            col = re.match(r"[A-Z]+", ref)
-            if not col:
-                continue
-            idx = col_to_idx(col.group(0))
-            value = ""
-            if c.get("t") == "inlineStr":
-                t = c.find("a:is/a:t", NS)
-                value = t.text if t is not None else ""
-            else:
-                v = c.find("a:v", NS)
-                value = v.text if v is not None else ""
-            cells[idx] = value
-        if cells:
-            max_idx = max(cells.keys())
-            row_vals = [""] * (max_idx + 1)
-            for i, v in cells.items():
-                row_vals[i] = v
-            rows.append(row_vals)
-    return rows
-
 
 def _to_int(value: str) -> int:
     try:
@@ -76,23 +28,26 @@ def _get_cell(row: List[str], idx: int) -> str:
     return ""
 
 
-def build_csv_from_xlsx(xlsx_path: str, output_csv: str) -> int:
+def read_teams_from_xlsx(xlsx_path: str) -> Tuple[List[str], List[Dict[str, str]]]:
     if not os.path.exists(xlsx_path):
         raise FileNotFoundError(f"Arquivo nao encontrado: {xlsx_path}")
 
     rows_out: List[Dict[str, str]] = []
 
     with zipfile.ZipFile(xlsx_path, "r") as zf:
+        shared_strings = read_shared_strings(zf)
+        paths = sheet_paths(zf)
         for sheet_name, gender in SHEETS.items():
-            sheet_path = _sheet_file_by_name(zf, sheet_name)
-            if not sheet_path or sheet_path not in zf.namelist():
+            sheet_path = paths.get(sheet_name)
+            if not sheet_path:
                 continue
 
-            rows = _parse_sheet(zf, sheet_path)
-            if not rows:
+            rows = iter_rows(zf, sheet_path, shared_strings)
+            header_row = next(rows, None)
+            if header_row is None:
                 continue
 
-            header = [h.strip() for h in rows[0]]
+            header = [h.strip() for h in header_row]
             header_map = {name: idx for idx, name in enumerate(header) if name}
 
             required = ["team_name", "overall", "conference", "division"]
@@ -100,7 +55,7 @@ def build_csv_from_xlsx(xlsx_path: str, output_csv: str) -> int:
             if missing:
                 raise ValueError(f"Colunas obrigatorias ausentes em {sheet_name}: {', '.join(missing)}")
 
-            for row in rows[1:]:
+            for row in rows:
                 team_name = _get_cell(row, header_map["team_name"]).strip()
                 if not team_name:
                     continue
@@ -159,8 +114,6 @@ def build_csv_from_xlsx(xlsx_path: str, output_csv: str) -> int:
     if not rows_out:
         raise ValueError("Nenhum dado encontrado nas abas NBA_TEAMS/WNBA_TEAMS.")
 
-    os.makedirs(os.path.dirname(output_csv), exist_ok=True)
-
     headers = [
         "team_id",
         "team_name",
@@ -190,15 +143,23 @@ def build_csv_from_xlsx(xlsx_path: str, output_csv: str) -> int:
         "city",
     ]
 
-    with open(output_csv, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=headers)
-        w.writeheader()
-        for row in rows_out:
-            w.writerow(row)
+    return headers, rows_out
+
 
-    return len(rows_out)
+def build_csv_from_xlsx(xlsx_path: str, output_csv: str, incremental: bool = False) -> int:
+    headers, rows = read_teams_from_xlsx(xlsx_path)
+    if incremental:
+        write_incremental(output_csv, headers, rows)
+    else:
+        write_csv(output_csv, headers, rows)
+    return len(rows)
 
 
 if __name__ == "__main__":
-    n = build_csv_from_xlsx(XLSX_PATH, OUTPUT_CSV)
-    print(f"OK. CSV gerado com {n} times em data/teams_nba.csv")
+    if "--incremental" in sys.argv[1:]:
+        headers, rows = read_teams_from_xlsx(XLSX_PATH)
+        changelog = write_incremental(OUTPUT_CSV, headers, rows)
+        print(f"OK. {len(rows)} times em data/teams_nba.csv. {summarize(changelog)}")
+    else:
+        n = build_csv_from_xlsx(XLSX_PATH, OUTPUT_CSV)
+        print(f"OK. CSV gerado com {n} times em data/teams_nba.csv")
@@ -1,64 +1,15 @@
-﻿import csv
-import os
-import re
-import zipfile
-import xml.etree.ElementTree as ET
-from typing import Dict, List, Optional, Tuple
+﻿import os
+import sys
+from typing import Dict, List, Tuple
+
+from services.changelog import summarize, write_csv, write_incremental
+from services.xlsx import open_sheet_rows
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 XLSX_PATH = os.path.join(BASE_DIR, "times_fc25.xlsx")
 OUTPUT_CSV = os.path.join(BASE_DIR, "data", "teams_fc25.csv")
 SHEET_NAME = "ALL_CLASSIFIED"
 
-NS = {"a": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
-
-
-def col_to_idx(col: str) -> int:
-    idx = 0
-    for ch in col:
-        idx = idx * 26 + (ord(ch) - 64)
-    return idx - 1
-
-
-def _sheet_file_by_name(zf: zipfile.ZipFile, name: str) -> Optional[str]:
-    wb = ET.fromstring(zf.read("xl/workbook.xml"))
-    for sheet in wb.findall("a:sheets/a:sheet", NS):
-        if sheet.get("name") == name:
-            sheet_id = sheet.get("sheetId")
-            if sheet_id and sheet_id.isdigit():
-                return f"xl/worksheets/sheet{sheet_id}.xml"
-    return None
-
-
-def _parse_sheet(zf: zipfile.ZipFile, sheet_path: str) -> List[List[str]]:
-    root = ET.fromstring(zf.read(sheet_path))
-    rows: List[List[str]] = []
-    for row in root.findall("a:sheetData/a:row", NS):
-        cells: Dict[int, str] = {}
-        for c in row.findall("a:c", NS):
-            ref = c.get("r")
-            if not ref:
-                continue
-            col = re.match(r"[A-Z]+", ref)
-            if not col:
-                continue
-            idx = col_to_idx(col.group(0))
-            value = ""
-            if c.get("t") == "inlineStr":
-                t = c.find("a:is/a:t", NS)
-                value = t.text if t is not None else ""
-            else:
-                v = c.find("a:v", NS)
-                value = v.text if v is not None else ""
-            cells[idx] = value
-        if cells:
-            max_idx = max(cells.keys())
-            row_vals = [""] * (max_idx + 1)
-            for i, v in cells.items():
-                row_vals[i] = v
-            rows.append(row_vals)
-    return rows
-
 
 def _to_int(value: str) -> int:
     try:
@@ -83,21 +34,16 @@ def _infer_category(team_type: str, gender: str) -> str:
     return "clubs"
 
 
-def build_csv_from_xlsx(xlsx_path: str, output_csv: str) -> int:
+def read_teams_from_xlsx(xlsx_path: str) -> Tuple[List[str], List[Dict[str, str]]]:
     if not os.path.exists(xlsx_path):
         raise FileNotFoundError(f"Arquivo nao encontrado: {xlsx_path}")
 
-    with zipfile.ZipFile(xlsx_path, "r") as zf:
-        sheet_path = _sheet_file_by_name(zf, SHEET_NAME)
-        if not sheet_path or sheet_path not in zf.namelist():
-            raise FileNotFoundError(f"Aba {SHEET_NAME} nao encontrada no XLSX.")
-
-        rows = _parse_sheet(zf, sheet_path)
-
-    if not rows:
+    rows = open_sheet_rows(xlsx_path, SHEET_NAME)
+    header_row = next(rows, None)
+    if header_row is None:
         raise ValueError("Planilha vazia.")
 
-    header = [h.strip() for h in rows[0]]
+    header = [h.strip() for h in header_row]
     header_map = {name: idx for idx, name in enumerate(header) if name}
 
     required = ["team_name", "overall", "attack", "midfield", "defence", "team_url"]
@@ -105,11 +51,9 @@ def build_csv_from_xlsx(xlsx_path: str, output_csv: str) -> int:
     if missing:
         raise ValueError(f"Colunas obrigatorias ausentes: {', '.join(missing)}")
 
-    os.makedirs(os.path.dirname(output_csv), exist_ok=True)
-
     best: Dict[Tuple[str, str, str], Dict[str, str]] = {}
 
-    for row in rows[1:]:
+    for row in rows:
         team_name = _get_cell(row, header_map["team_name"]).strip()
         if not team_name:
             continue
@@ -201,15 +145,23 @@ def build_csv_from_xlsx(xlsx_path: str, output_csv: str) -> int:
         "category",
     ]
 
-    with open(output_csv, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=headers)
-        w.writeheader()
-        for row in ordered:
-            w.writerow(row)
+    return headers, ordered
+
 
-    return len(ordered)
+def build_csv_from_xlsx(xlsx_path: str, output_csv: str, incremental: bool = False) -> int:
+    headers, rows = read_teams_from_xlsx(xlsx_path)
+    if incremental:
+        write_incremental(output_csv, headers, rows)
+    else:
+        write_csv(output_csv, headers, rows)
+    return len(rows)
 
 
 if __name__ == "__main__":
-    n = build_csv_from_xlsx(XLSX_PATH, OUTPUT_CSV)
-    print(f"OK. CSV gerado com {n} times em data/teams_fc25.csv")
+    if "--incremental" in sys.argv[1:]:
+        headers, rows = read_teams_from_xlsx(XLSX_PATH)
+        changelog = write_incremental(OUTPUT_CSV, headers, rows)
+        print(f"OK. {len(rows)} times em data/teams_fc25.csv. {summarize(changelog)}")
+    else:
+        n = build_csv_from_xlsx(XLSX_PATH, OUTPUT_CSV)
+        print(f"OK. CSV gerado com {n} times em data/teams_fc25.csv")
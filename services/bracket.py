@@ -0,0 +1,150 @@
+import random
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# Valores de um no da arvore: indice do participante (>= 0), ainda sem vencedor ou folga.
+OPEN = -1
+BYE = -2
+MAX_ENTRANTS = 1024
+
+
+def _num(value: Any) -> int:
+    try:
+        return int(float(value)) if value not in ("", None) else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+def seed_positions(size: int) -> List[int]:
+    """Ordem das sementes nas folhas (1 x N, 2 x N-1...): as melhores so se cruzam no fim."""
+    order = [1]
+    while len(order) < size:
+        m = 2 * len(order) + 1
+        order = [x for s in order for x in (s, m - s)]
+    return order
+
+
+def round_name(players: int) -> str:
+    if players <= 2:
+        return "Final"
+    if players == 4:
+        return "Semifinal"
+    if players == 8:
+        return "Quartas de final"
+    if players == 16:
+        return "Oitavas de final"
+    return f"Rodada de {players}"
+
+
+def entrant_ratings(entrants: Sequence[Any]) -> List[int]:
+    """Overall de cada participante do sorteio; ausente ou invalido conta como 0."""
+    return [_num(e.get("overall")) if isinstance(e, dict) else 0 for e in entrants]
+
+
+def seed_order(ratings: Sequence[int], seeding: str = "overall", seed: Optional[str] = None) -> List[int]:
+    """Indices dos participantes da semente 1 em diante: por overall (desc, estavel) ou aleatorio."""
+    indices = list(range(len(ratings)))
+    if seeding == "random":
+        random.Random(seed).shuffle(indices)
+    else:
+        indices.sort(key=lambda i: -ratings[i])
+    return indices
+
+
+class Bracket:
+    """
+    Mata-mata como arvore binaria completa num array (heap 1-based): o no `i`
+    e a partida entre os vencedores de `2i` e `2i+1`; as folhas `size..2*size-1`
+    sao os participantes. Um resultado so mexe no caminho ate a raiz, O(log n).
+    """
+
+    __slots__ = ("size", "slots", "entrants")
+
+    def __init__(self, entrants: int, order: Sequence[int]):
+        size = 1
+        while size < entrants:
+            size *= 2
+        self.size = size
+        self.entrants = entrants
+        self.slots = [OPEN] * (2 * size)
+        for pos, seed in enumerate(seed_positions(size)):
+            self.slots[size + pos] = order[seed - 1] if seed <= entrants else BYE
+        for node in range(size - 1, 0, -1):
+            self.slots[node] = self._auto(node)
+
+    def _auto(self, node: int) -> int:
+        # Folga passa o outro lado direto; sem os dois lados definidos a partida fica aberta.
+        a, b = self.slots[2 * node], self.slots[2 * node + 1]
+        if a == BYE:
+            return b if b != OPEN else OPEN
+        if b == BYE:
+            return a if a != OPEN else OPEN
+        return OPEN
+
+    def apply(self, node: int, side: int) -> List[Tuple[int, int]]:
+        """
+        Registra o vencedor da partida `node` (side 0/1) ou limpa o resultado
+        (side -1). Retorna os nos alterados como pares (no, valor).
+        """
+        if not 1 <= node < self.size:
+            raise ValueError("Partida invalida.")
+        a, b = self.slots[2 * node], self.slots[2 * node + 1]
+        if side == -1:
+            new = self._auto(node)
+        elif side in (0, 1):
+            if a < 0 or b < 0:
+                raise ValueError("Partida ainda sem os dois participantes.")
+            new = a if side == 0 else b
+        else:
+            raise ValueError("Lado invalido.")
+
+        old = self.slots[node]
+        if old == new:
+            return []
+        self.slots[node] = new
+        changed = [(node, new)]
+
+        # Sobe pela arvore: o vencedor antigo sai das fases seguintes; folgas avancam sozinhas.
+        parent = node // 2
+        while parent >= 1:
+            value = self.slots[parent]
+            if old >= 0 and value == old:
+                value = OPEN
+            if value == OPEN:
+                value = self._auto(parent)
+            if value == self.slots[parent]:
+                break
+            self.slots[parent] = value
+            changed.append((parent, value))
+            parent //= 2
+        return changed
+
+    def champion(self) -> Optional[int]:
+        return self.slots[1] if self.size > 1 and self.slots[1] >= 0 else None
+
+    def rounds(self) -> List[Dict[str, Any]]:
+        out = []
+        width = self.size // 2
+        while width >= 1:
+            matches = [
+                {"node": n, "a": self.slots[2 * n], "b": self.slots[2 * n + 1], "winner": self.slots[n]}
+                for n in range(width, 2 * width)
+            ]
+            out.append({"name": round_name(width * 2), "matches": matches})
+            width //= 2
+        return out
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "players": self.entrants,
+            "slots": list(self.slots),
+            "rounds": self.rounds(),
+            "champion": self.champion(),
+        }
+
+
+def replay(entrants: int, order: Sequence[int], ops: Sequence[Sequence[int]]) -> Bracket:
+    bracket = Bracket(entrants, order)
+    for node, side in ops:
+        bracket.apply(node, side)
+    return bracket
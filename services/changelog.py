@@ -0,0 +1,204 @@
+import csv
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# NBA e WNBA compartilham abreviacoes (CHI, IND...), entao a chave inclui o genero.
+KEY_FIELDS = ("team_id", "gender")
+RATING_FIELDS = ("overall", "attack", "midfield", "defence")
+
+
+def _to_int(value: Any) -> int:
+    try:
+        return int(float(value)) if value not in ("", None) else 0
+    except Exception:
+        return 0
+
+
+def _text(value: Any) -> str:
+    return "" if value is None else str(value)
+
+
+def row_key(row: Dict[str, Any]) -> str:
+    return "|".join(_text(row.get(f)).strip() for f in KEY_FIELDS)
+
+
+def row_hash(row: Dict[str, Any], fields: Iterable[str]) -> str:
+    raw = "\x1f".join(_text(row.get(f)) for f in fields)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _mix(key: str, digest: str) -> int:
+    return int(hashlib.sha1(f"{key}\x1e{digest}".encode("utf-8")).hexdigest(), 16)
+
+
+def version_of(hashes: Dict[str, str]) -> str:
+    # XOR dos hashes por linha: nao depende da ordem e pode ser atualizado linha a linha.
+    acc = 0
+    for key, digest in hashes.items():
+        acc ^= _mix(key, digest)
+    return f"{acc:040x}"
+
+
+def bump_version(version: str, key: str, old_digest: Optional[str], new_digest: Optional[str]) -> str:
+    acc = int(version, 16)
+    if old_digest is not None:
+        acc ^= _mix(key, old_digest)
+    if new_digest is not None:
+        acc ^= _mix(key, new_digest)
+    return f"{acc:040x}"
+
+
+def hash_rows(rows: Iterable[Dict[str, Any]], fields: List[str]) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for r in rows:
+        key = row_key(r)
+        if key in out:
+            raise ValueError(f"Chave duplicada no dataset: {key}")
+        out[key] = row_hash(r, fields)
+    return out
+
+
+def read_csv(path: str) -> Tuple[List[str], List[Dict[str, str]]]:
+    if not os.path.exists(path):
+        return [], []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+        return list(reader.fieldnames or []), rows
+
+
+def write_csv(path: str, headers: List[str], rows: Iterable[Dict[str, Any]]) -> None:
+    """Regrava o CSV inteiro; o changelog ao lado descrevia o arquivo anterior e e apagado."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=headers, extrasaction="ignore")
+        w.writeheader()
+        for row in rows:
+            w.writerow(row)
+    discard_changelog(path)
+    os.replace(tmp, path)
+
+
+def _key_fields(row: Dict[str, Any]) -> Dict[str, str]:
+    return {f: _text(row.get(f)) for f in KEY_FIELDS}
+
+
+def diff_rows(old_rows: List[Dict[str, Any]], new_rows: List[Dict[str, Any]], fields: List[str]) -> Dict[str, Any]:
+    old_by_key = {row_key(r): r for r in old_rows}
+    old_hashes = hash_rows(old_rows, fields)
+    new_hashes = hash_rows(new_rows, fields)
+
+    added: List[Dict[str, Any]] = []
+    added_at: List[int] = []
+    changed: List[Dict[str, Any]] = []
+    unchanged = 0
+    for pos, r in enumerate(new_rows):
+        key = row_key(r)
+        old_digest = old_hashes.get(key)
+        if old_digest is None:
+            added.append({f: _text(r.get(f)) for f in fields})
+            added_at.append(pos)
+            continue
+        if old_digest == new_hashes[key]:
+            unchanged += 1
+            continue
+        old = old_by_key[key]
+        changes = {
+            f: [_text(old.get(f)), _text(r.get(f))] for f in fields if _text(old.get(f)) != _text(r.get(f))
+        }
+        deltas = {
+            f: _to_int(r.get(f)) - _to_int(old.get(f))
+            for f in RATING_FIELDS
+            if f in changes and _to_int(r.get(f)) != _to_int(old.get(f))
+        }
+        item = _key_fields(r)
+        item.update({"row": {f: _text(r.get(f)) for f in fields}, "changes": changes, "rating_deltas": deltas})
+        changed.append(item)
+
+    removed = [_key_fields(old_by_key[k]) for k in old_hashes if k not in new_hashes]
+    # Quem aplica o changelog so reproduz a ordem do arquivo novo se as linhas mantidas nao trocaram de lugar.
+    kept_old = [k for k in old_hashes if k in new_hashes]
+    kept_new = [k for k in new_hashes if k in old_hashes]
+
+    return {
+        "fields": list(fields),
+        "from_version": version_of(old_hashes),
+        "to_version": version_of(new_hashes),
+        "added": added,
+        "added_at": added_at,
+        "reordered": kept_old != kept_new,
+        "removed": removed,
+        "changed": changed,
+        "unchanged": unchanged,
+    }
+
+
+def has_changes(changelog: Dict[str, Any]) -> bool:
+    return bool(changelog.get("added") or changelog.get("removed") or changelog.get("changed"))
+
+
+def changelog_path_for(csv_path: str) -> str:
+    base, _ = os.path.splitext(csv_path)
+    return f"{base}.changelog.json"
+
+
+def discard_changelog(csv_path: str) -> None:
+    try:
+        os.remove(changelog_path_for(csv_path))
+    except FileNotFoundError:
+        pass
+
+
+def file_stamp(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def read_changelog(csv_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(changelog_path_for(csv_path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else None
+    except FileNotFoundError:
+        return None
+    except Exception:
+        return None
+
+
+def write_incremental(output_csv: str, headers: List[str], rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Compara as linhas novas com o CSV atual (por team_id/genero) e so regrava o
+    arquivo quando algo mudou, deixando ao lado um changelog JSON com o diff.
+    """
+    old_headers, old_rows = read_csv(output_csv)
+    changelog = diff_rows(old_rows, rows, headers)
+    changelog["csv"] = os.path.basename(output_csv)
+    changelog["created_at"] = datetime.utcnow().isoformat(timespec="seconds")
+    if old_headers != headers:
+        changelog["headers_changed"] = True
+
+    if not has_changes(changelog) and old_headers == headers:
+        return changelog
+
+    write_csv(output_csv, headers, rows)
+    # Carimbo do CSV que este changelog descreve: quem le confere antes de aplicar.
+    changelog["csv_stamp"] = list(file_stamp(output_csv))
+    tmp = f"{changelog_path_for(output_csv)}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(changelog, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, changelog_path_for(output_csv))
+    return changelog
+
+
+def summarize(changelog: Dict[str, Any]) -> str:
+    if not has_changes(changelog) and not changelog.get("headers_changed"):
+        return "Sem alteracoes."
+    rating_updates = sum(1 for c in changelog.get("changed", []) if c.get("rating_deltas"))
+    return (
+        f"{len(changelog.get('added', []))} novos, {len(changelog.get('removed', []))} removidos, "
+        f"{len(changelog.get('changed', []))} alterados ({rating_updates} com mudanca de rating)."
+    )
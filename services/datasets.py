@@ -1,18 +1,35 @@
 ﻿import csv
+import json
 import os
-from typing import Any, Dict, List
+import pickle
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.changelog import bump_version, changelog_path_for, read_changelog, row_hash, row_key, version_of
+from services.metrics import METRICS
+from services.records import make_record
 
 APP_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(os.path.dirname(APP_DIR), "data")
+BUILD_DIR = os.path.join(DATA_DIR, "build")
+# Datasets enviados pelos usuarios: <chave>.csv + <chave>.json (rotulo, dono, esporte).
+USER_DIR = os.path.join(DATA_DIR, "uploads")
+USER_KEY = re.compile(r"^u_[0-9a-f]{12}$")
+# Muda quando o formato das linhas em memoria muda; snapshots antigos sao ignorados.
+SNAPSHOT_FORMAT = 2
 
 DATASETS = {
     "fc25": {
         "label": "FC 25",
         "path": os.path.join(DATA_DIR, "teams_fc25.csv"),
+        "sport": "soccer",
     },
     "nba": {
         "label": "NBA 2K25",
         "path": os.path.join(DATA_DIR, "teams_nba.csv"),
+        "sport": "basketball",
     },
 }
 
@@ -26,53 +43,365 @@ def _to_int(value: Any) -> int:
 def list_datasets() -> List[Dict[str, Any]]:
     out = []
     for key, meta in DATASETS.items():
-        out.append({"key": key, "label": meta.get("label", key)})
+        if meta.get("owner") is None:
+            out.append({"key": key, "label": meta.get("label", key)})
     return out
 
 
-def load_rows(dataset: str) -> List[Dict[str, Any]]:
-    if dataset not in DATASETS:
-        raise ValueError("Dataset invalido.")
-    path = DATASETS[dataset]["path"]
-    if not os.path.exists(path):
-        raise FileNotFoundError(f"Arquivo nao encontrado: {path}")
+def user_dataset_csv(key: str) -> str:
+    return os.path.join(USER_DIR, f"{key}.csv")
+
+
+def register_dataset(key: str, label: str, owner: int, sport: str) -> Dict[str, Any]:
+    """Publica um dataset enviado: grava o meta ao lado do CSV e registra neste processo."""
+    meta = {"label": label, "owner": owner, "sport": sport}
+    tmp = os.path.join(USER_DIR, f"{key}.json.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp, os.path.join(USER_DIR, f"{key}.json"))
+    DATASETS[key] = dict(meta, path=user_dataset_csv(key))
+    return DATASETS[key]
+
+
+def unregister_dataset(key: str) -> None:
+    """Desfaz register_dataset e apaga o CSV publicado (build que falhou)."""
+    DATASETS.pop(key, None)
+    with _LOCK:
+        _CACHE.pop(key, None)
+    for path in (os.path.join(USER_DIR, f"{key}.json"), user_dataset_csv(key), changelog_path_for(user_dataset_csv(key))):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def dataset_meta(dataset: str) -> Optional[Dict[str, Any]]:
+    """Meta do dataset; datasets de usuario publicados por outro worker sao achados pelo arquivo."""
+    meta = DATASETS.get(dataset)
+    if meta is not None or not USER_KEY.match(dataset or ""):
+        return meta
+    try:
+        with open(os.path.join(USER_DIR, f"{dataset}.json"), "r", encoding="utf-8") as f:
+            meta = dict(json.load(f), path=user_dataset_csv(dataset))
+    except (FileNotFoundError, ValueError):
+        return None
+    DATASETS[dataset] = meta
+    return meta
+
+
+INT_FIELDS = [
+    "overall",
+    "attack",
+    "midfield",
+    "defence",
+    "avg_age",
+    "stadium_capacity",
+    "youth_development",
+    "profitability",
+    "intl_prestige",
+    "since_year",
+    "worth_int",
+    "budget_int",
+]
+
+_CACHE: Dict[str, Dict[str, Any]] = {}
+_LOCK = threading.RLock()
+_LISTENERS: List[Callable[[str, Optional[Dict[str, Any]]], None]] = []
+_VIEWER: List[Callable[[], Optional[int]]] = []
+
+
+class DatasetNotFound(KeyError):
+    """Dataset de usuario pedido por outro usuario: tratado como inexistente."""
+
+
+def on_dataset_change(fn: Callable[[str, Optional[Dict[str, Any]]], None]):
+    """
+    Registra um callback chamado quando o CSV de um dataset muda. Recebe o
+    changelog aplicado (ou None quando o dataset foi relido por inteiro).
+    """
+    _LISTENERS.append(fn)
+    return fn
 
+
+def dataset_viewer(fn: Callable[[], Optional[int]]):
+    """
+    Registra quem esta lendo os datasets (o usuario da sessao). None libera
+    tudo (jobs de build, CLI); fora disso so o dono le um dataset de usuario.
+    """
+    _VIEWER[:] = [fn]
+    return fn
+
+
+def _parse_row(r: Dict[str, Any]) -> Dict[str, Any]:
+    for k in INT_FIELDS:
+        if k in r:
+            r[k] = _to_int(r.get(k))
+    r["is_valid"] = str(r.get("is_valid", "")).lower() in ("true", "1", "yes")
+    # Registro compacto (tupla + categorias internadas); continua lendo como dict.
+    return make_record(r)
+
+
+def _file_stamp(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _read_entry(path: str, stamp: Tuple[int, int]) -> Dict[str, Any]:
     rows: List[Dict[str, Any]] = []
+    hashes: Dict[str, str] = {}
     with open(path, "r", encoding="utf-8") as f:
         reader = csv.DictReader(f)
+        fields = list(reader.fieldnames or [])
         for r in reader:
-            for k in [
-                "overall",
-                "attack",
-                "midfield",
-                "defence",
-                "avg_age",
-                "stadium_capacity",
-                "youth_development",
-                "profitability",
-                "intl_prestige",
-                "since_year",
-                "worth_int",
-                "budget_int",
-            ]:
-                if k in r:
-                    r[k] = _to_int(r.get(k))
-            r["is_valid"] = str(r.get("is_valid", "")).lower() in ("true", "1", "yes")
-            rows.append(r)
-    return rows
+            hashes[row_key(r)] = row_hash(r, fields)
+            rows.append(_parse_row(r))
+    return {"stamp": stamp, "fields": fields, "rows": rows, "hashes": hashes, "version": version_of(hashes)}
 
 
-def compute_stats(dataset: str) -> Dict[str, Any]:
-    rows = load_rows(dataset)
-    valid = [r for r in rows if r.get("is_valid", True)]
+def snapshot_path(dataset: str) -> str:
+    return os.path.join(BUILD_DIR, f"{dataset}.snapshot.pkl")
+
+
+def write_snapshot(dataset: str) -> str:
+    """Grava o dataset ja convertido (linhas, hashes, versao) para carga rapida."""
+    path = DATASETS[dataset]["path"]
+    entry = dict(_read_entry(path, _file_stamp(path)), format=SNAPSHOT_FORMAT)
+    out = snapshot_path(dataset)
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    tmp = f"{out}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, out)
+    return out
+
+
+def _read_snapshot(dataset: str, stamp: Tuple[int, int]) -> Optional[Dict[str, Any]]:
+    try:
+        with open(snapshot_path(dataset), "rb") as f:
+            entry = pickle.load(f)
+    except (FileNotFoundError, pickle.UnpicklingError, EOFError):
+        return None
+    if not isinstance(entry, dict) or entry.get("stamp") != stamp or entry.get("format") != SNAPSHOT_FORMAT:
+        return None
+    return entry
+
+
+def _apply_changelog(entry: Dict[str, Any], changelog: Dict[str, Any], stamp: Tuple[int, int]) -> Optional[Dict[str, Any]]:
+    """
+    Aplica o diff sobre a entrada em cache. Recusa (None, releitura completa)
+    changelog que nao descreve o arquivo atual (carimbo diferente), que parte
+    de outra versao ou que nao permite reproduzir a ordem das linhas do CSV.
+    """
+    if changelog.get("csv_stamp") != list(stamp) or changelog.get("reordered", True):
+        return None
+    if changelog.get("from_version") != entry["version"] or changelog.get("fields") != entry["fields"]:
+        return None
+    added_at = changelog.get("added_at")
+    if not isinstance(added_at, list) or len(added_at) != len(changelog.get("added", [])):
+        return None
+    fields = entry["fields"]
+    hashes = dict(entry["hashes"])
+    version = entry["version"]
+    replaced: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    for item in changelog.get("removed", []):
+        key = row_key(item)
+        version = bump_version(version, key, hashes.pop(key, None), None)
+        replaced[key] = None
+    for item in changelog.get("changed", []):
+        raw = dict(item.get("row") or {})
+        key = row_key(raw)
+        digest = row_hash(raw, fields)
+        version = bump_version(version, key, hashes.get(key), digest)
+        hashes[key] = digest
+        replaced[key] = _parse_row(raw)
+
+    # Copy-on-write: as listas/dicts antigos podem estar em uso por outra requisicao.
+    kept: List[Dict[str, Any]] = []
+    for r in entry["rows"]:
+        key = row_key(r)
+        if key in replaced:
+            if replaced[key] is not None:
+                kept.append(replaced[key])
+            continue
+        kept.append(r)
+    # Linhas novas entram na posicao que tem no CSV: mesma lista que uma leitura do zero.
+    added: Dict[int, Dict[str, Any]] = {}
+    for pos, raw in zip(added_at, changelog.get("added", [])):
+        raw = dict(raw)
+        key = row_key(raw)
+        digest = row_hash(raw, fields)
+        version = bump_version(version, key, hashes.get(key), digest)
+        hashes[key] = digest
+        added[pos] = _parse_row(raw)
+    total = len(kept) + len(added)
+    if len(added) != len(added_at) or any(not isinstance(pos, int) or not 0 <= pos < total for pos in added):
+        return None
+    rest = iter(kept)
+    rows = [added[pos] if pos in added else next(rest) for pos in range(total)]
+
+    if version != changelog.get("to_version"):
+        return None
+    return {"stamp": stamp, "fields": fields, "rows": rows, "hashes": hashes, "version": version}
+
+
+def _entry(dataset: str) -> Dict[str, Any]:
+    meta = dataset_meta(dataset)
+    if meta is None:
+        raise ValueError("Dataset invalido.")
+    owner = meta.get("owner")
+    if owner is not None and _VIEWER:
+        viewer = _VIEWER[0]()
+        if viewer is not None and viewer != owner:
+            raise DatasetNotFound(dataset)
+    path = meta["path"]
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Arquivo nao encontrado: {path}")
+
+    stamp = _file_stamp(path)
+    cached = _CACHE.get(dataset)
+    if cached is not None and cached["stamp"] == stamp:
+        METRICS.inc("dataset_cache_total", (dataset, "hit"))
+        return cached
+
+    with _LOCK:
+        cached = _CACHE.get(dataset)
+        if cached is not None and cached["stamp"] == stamp:
+            METRICS.inc("dataset_cache_total", (dataset, "hit"))
+            return cached
+        started = time.perf_counter()
+        entry = None
+        source = "changelog"
+        changelog = read_changelog(path) if cached is not None else None
+        if changelog is not None:
+            entry = _apply_changelog(cached, changelog, stamp)
+        if entry is None:
+            changelog = None
+            source = "snapshot"
+            entry = _read_snapshot(dataset, stamp)
+            if entry is None:
+                source = "csv"
+                entry = _read_entry(path, stamp)
+        _CACHE[dataset] = entry
+        METRICS.inc("dataset_cache_total", (dataset, source))
+        METRICS.observe("dataset_load_seconds", time.perf_counter() - started, (dataset, source))
+
+    if cached is not None:
+        for fn in _LISTENERS:
+            fn(dataset, changelog)
+    return entry
+
+
+def cached_entries() -> Dict[str, Dict[str, Any]]:
+    """Datasets carregados em memoria (linhas, hashes e versao), para diagnostico."""
+    return dict(_CACHE)
+
+
+def dataset_version(dataset: str) -> str:
+    return _entry(dataset)["version"]
+
+
+def load_rows(dataset: str) -> List[Dict[str, Any]]:
+    return _entry(dataset)["rows"]
+
+
+def load_versioned(dataset: str) -> Tuple[str, List[Dict[str, Any]]]:
+    # Versao e linhas do mesmo snapshot (indices derivados nao podem misturar versoes).
+    entry = _entry(dataset)
+    return entry["version"], entry["rows"]
+
+
+FACET_FIELDS = {
+    "team_types": "team_type",
+    "genders": "gender",
+    "competitions": "competition",
+    "countries": "country",
+    "conferences": "conference",
+    "divisions": "division",
+}
+
+
+def facet_index(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, List[int]]]:
+    out: Dict[str, Dict[str, List[int]]] = {facet: {} for facet in FACET_FIELDS}
+    for i, r in enumerate(rows):
+        for facet, field in FACET_FIELDS.items():
+            v = (r.get(field) or "").strip()
+            if v:
+                out[facet].setdefault(v, []).append(i)
+    return out
+
+
+def compute_facets(rows: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    return {facet: sorted(values) for facet, values in facet_index(rows).items()}
+
+
+STAT_FIELDS = ("overall", "attack", "midfield", "defence")
+PERCENTILES = (10, 25, 50, 75, 90)
+_STATS: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+
+
+def _percentile(hist: Dict[int, int], total: int, p: int) -> int:
+    # Nearest-rank direto do histograma (valores inteiros), sem ordenar a lista de ratings.
+    rank = max(1, -(-p * total // 100))
+    seen = 0
+    for value in sorted(hist):
+        seen += hist[value]
+        if seen >= rank:
+            return value
+    return 0
+
+
+def _tier_cutoffs(hist: Dict[int, int], total: int, tiers: int = 4) -> List[int]:
+    # Menor overall de cada pote (do mais forte ao mais fraco), para potes de tamanho parecido.
+    return [_percentile(hist, total, 100 - 100 * i // tiers) for i in range(1, tiers)]
+
+
+def build_stats(dataset: str, rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    hists: Dict[str, Dict[int, int]] = {f: {} for f in STAT_FIELDS}
+    competitions: Dict[str, int] = {}
+    counts = {"club": 0, "national": 0, "women": 0, "men": 0}
+    valid = 0
+    for r in rows:
+        if not r.get("is_valid", True):
+            continue
+        valid += 1
+        team_type = (r.get("team_type") or "").upper()
+        gender = (r.get("gender") or "").upper()
+        if team_type == "CLUB":
+            counts["club"] += 1
+        elif team_type == "NATIONAL":
+            counts["national"] += 1
+        if gender == "WOMEN":
+            counts["women"] += 1
+        elif gender == "MEN":
+            counts["men"] += 1
+        competition = (r.get("competition") or "").strip()
+        if competition:
+            competitions[competition] = competitions.get(competition, 0) + 1
+        for f in STAT_FIELDS:
+            v = r.get(f, 0)
+            hists[f][v] = hists[f].get(v, 0) + 1
+
+    overall = hists["overall"]
     return {
         "dataset": dataset,
         "total_rows": len(rows),
-        "valid_rows": len(valid),
-        "club": sum(1 for t in valid if (t.get("team_type") or "").upper() == "CLUB"),
-        "national": sum(1 for t in valid if (t.get("team_type") or "").upper() == "NATIONAL"),
-        "women": sum(1 for t in valid if (t.get("gender") or "").upper() == "WOMEN"),
-        "men": sum(1 for t in valid if (t.get("gender") or "").upper() == "MEN"),
-        "max_overall": max((t.get("overall", 0) for t in valid), default=0),
-        "min_overall": min((t.get("overall", 0) for t in valid), default=0),
+        "valid_rows": valid,
+        **counts,
+        "max_overall": max(overall, default=0),
+        "min_overall": min(overall, default=0),
+        "competitions": dict(sorted(competitions.items())),
+        "histograms": {f: [[v, h[v]] for v in sorted(h)] for f, h in hists.items()},
+        "percentiles": {f: {f"p{p}": _percentile(h, valid, p) for p in PERCENTILES} for f, h in hists.items()},
+        "tier_cutoffs": _tier_cutoffs(overall, valid) if valid else [],
     }
+
+
+def compute_stats(dataset: str) -> Dict[str, Any]:
+    """Estatisticas do dataset, calculadas uma vez por versao numa unica passada."""
+    version, rows = load_versioned(dataset)
+    cached = _STATS.get(dataset)
+    if cached is None or cached[0] != version:
+        cached = (version, build_stats(dataset, rows))
+        _STATS[dataset] = cached
+    return cached[1]
@@ -0,0 +1,154 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from services.draws import rating_order
+
+# Atributos com consulta de "melhor disponivel"; cada um tem seu bitset na ordem daquele atributo.
+DRAFT_ATTRS = ("overall", "attack", "midfield", "defence")
+# Op de desfazer no log (as outras ops sao a posicao do time escolhido no pool).
+UNDO = -1
+MAX_POOL = 3000
+
+
+def _num(value: Any) -> int:
+    try:
+        return int(float(value)) if value not in ("", None) else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+def snake_slot(pick: int, participants: int) -> Tuple[int, int]:
+    """(rodada, participante) da escolha `pick` (0-based): rodadas impares voltam do ultimo para o primeiro."""
+    rnd, k = divmod(pick, participants)
+    return rnd, (participants - 1 - k if rnd % 2 else k)
+
+
+class Draft:
+    """
+    Draft em serpentina sobre um pool fixo. O pool fica em ordem de rating
+    (posicao 0 = melhor) e a disponibilidade e um bitset por atributo
+    (inteiro Python, bit k = k-esimo melhor naquele atributo ainda livre).
+    Escolher e desfazer mexem num bit por atributo; o melhor disponivel e o
+    bit menos significativo ligado (`x & -x`), sem varrer a lista.
+    """
+
+    __slots__ = ("participants", "rounds", "teams", "rank", "by_rank", "available", "picks")
+
+    def __init__(self, participants: int, rounds: int, teams: Sequence[Dict[str, Any]]):
+        if participants < 2:
+            raise ValueError("Informe ao menos 2 participantes.")
+        if rounds < 1:
+            raise ValueError("Informe ao menos 1 rodada.")
+        if len(teams) < participants * rounds:
+            raise ValueError("Pool com menos times que escolhas do draft.")
+        self.participants = participants
+        self.rounds = rounds
+        self.teams = list(teams)
+        full = (1 << len(self.teams)) - 1
+        # rank[attr][pos] = colocacao do time naquele atributo; by_rank e o inverso.
+        self.rank: Dict[str, List[int]] = {}
+        self.by_rank: Dict[str, List[int]] = {}
+        self.available: Dict[str, int] = {}
+        for attr in DRAFT_ATTRS:
+            order = sorted(range(len(self.teams)), key=lambda p: (-_num(self.teams[p].get(attr)), p))
+            ranks = [0] * len(order)
+            for r, p in enumerate(order):
+                ranks[p] = r
+            self.by_rank[attr] = order
+            self.rank[attr] = ranks
+            self.available[attr] = full
+        self.picks: List[int] = []
+
+    @classmethod
+    def from_pool(cls, participants: int, rounds: int, pool: Sequence[Dict[str, Any]]) -> "Draft":
+        """Pool em qualquer ordem: reordena por rating (mesma ordem dos sorteios) antes de montar."""
+        return cls(participants, rounds, [pool[i] for i in rating_order(list(pool))])
+
+    @property
+    def total_picks(self) -> int:
+        return self.participants * self.rounds
+
+    def on_clock(self) -> Optional[int]:
+        if len(self.picks) >= self.total_picks:
+            return None
+        return snake_slot(len(self.picks), self.participants)[1]
+
+    def is_available(self, pos: int) -> bool:
+        return 0 <= pos < len(self.teams) and bool(self.available["overall"] >> self.rank["overall"][pos] & 1)
+
+    def _toggle(self, pos: int) -> None:
+        for attr in DRAFT_ATTRS:
+            self.available[attr] ^= 1 << self.rank[attr][pos]
+
+    def pick(self, pos: int) -> Dict[str, Any]:
+        if self.on_clock() is None:
+            raise ValueError("Draft encerrado.")
+        if not self.is_available(pos):
+            raise ValueError("Time indisponivel.")
+        number = len(self.picks)
+        rnd, participant = snake_slot(number, self.participants)
+        self._toggle(pos)
+        self.picks.append(pos)
+        return {"pick": number, "round": rnd, "participant": participant, "team": pos}
+
+    def undo(self) -> Dict[str, Any]:
+        if not self.picks:
+            raise ValueError("Nenhuma escolha para desfazer.")
+        pos = self.picks.pop()
+        self._toggle(pos)
+        return {"undo": len(self.picks), "team": pos}
+
+    def resolve(self, raw: Dict[str, Any]) -> int:
+        """Op do cliente para op do log: `{team: posicao}`, `{best: atributo}` ou `{undo: true}`."""
+        if not isinstance(raw, dict):
+            raise ValueError("Op invalida.")
+        if raw.get("undo"):
+            return UNDO
+        if raw.get("best"):
+            best = self.best(str(raw["best"]))
+            if not best:
+                raise ValueError("Nenhum time disponivel.")
+            return best[0]
+        team = raw.get("team")
+        if not isinstance(team, int) or isinstance(team, bool):
+            raise ValueError("Informe team (posicao no pool), best ou undo.")
+        return team
+
+    def apply(self, op: int) -> Dict[str, Any]:
+        return self.undo() if op == UNDO else self.pick(op)
+
+    def best(self, attr: str = "overall", limit: int = 1) -> List[int]:
+        """Posicoes dos `limit` melhores disponiveis por `attr`, O(limit) operacoes de bit."""
+        if attr not in DRAFT_ATTRS:
+            raise ValueError(f"Atributo aceita: {', '.join(DRAFT_ATTRS)}.")
+        bits = self.available[attr]
+        order = self.by_rank[attr]
+        out = []
+        while bits and len(out) < limit:
+            low = bits & -bits
+            out.append(order[low.bit_length() - 1])
+            bits ^= low
+        return out
+
+    def rosters(self) -> List[List[int]]:
+        out: List[List[int]] = [[] for _ in range(self.participants)]
+        for number, pos in enumerate(self.picks):
+            out[snake_slot(number, self.participants)[1]].append(pos)
+        return out
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rounds": self.rounds,
+            "pick": len(self.picks),
+            "total_picks": self.total_picks,
+            "on_clock": self.on_clock(),
+            "picks": list(self.picks),
+            "rosters": self.rosters(),
+            "available": bin(self.available["overall"]).count("1"),
+        }
+
+
+def replay(participants: int, rounds: int, pool: Sequence[Dict[str, Any]], ops: Sequence[int]) -> Draft:
+    draft = Draft(participants, rounds, pool)
+    for op in ops:
+        draft.apply(op)
+    return draft
@@ -1,5 +1,7 @@
-﻿import random
-from typing import Any, Dict, List
+﻿import heapq
+import random
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 
 def _to_int(value: Any) -> int:
@@ -9,29 +11,64 @@ def _to_int(value: Any) -> int:
         return 0
 
 
-def apply_filters(rows: List[Dict[str, Any]], filters: Dict[str, Any]) -> List[Dict[str, Any]]:
-    include_team_ids = {str(x) for x in (filters.get("include_team_ids") or []) if str(x).strip()}
-    team_types = set(filters.get("team_types") or ["CLUB", "NATIONAL"])
-    genders = set(filters.get("genders") or ["MEN", "WOMEN"])
-    competitions = set(filters.get("competitions") or [])
-    countries = set(filters.get("countries") or [])
-    conferences = set(filters.get("conferences") or [])
+def _rating_key(t: Dict[str, Any]):
+    return (
+        _to_int(t.get("overall", 0)),
+        _to_int(t.get("attack", 0)),
+        _to_int(t.get("midfield", 0)),
+        _to_int(t.get("defence", 0)),
+    )
+
+
+def rating_order(rows: List[Dict[str, Any]]) -> List[int]:
+    # Permutacao estavel por rating (desc): filtrar nessa ordem dispensa o sort.
+    return sorted(range(len(rows)), key=lambda i: _rating_key(rows[i]), reverse=True)
+
+
+def filter_indices(
+    rows: List[Dict[str, Any]],
+    filters: Dict[str, Any],
+    candidates: Optional[Iterable[int]] = None,
+    order: Optional[Sequence[int]] = None,
+) -> List[int]:
+    """
+    Mesma regra de apply_filters, mas devolve indices em `rows` (ordenados por
+    rating). `candidates` (indices crescentes) restringe a varredura a um subconjunto;
+    `order` (de rating_order) evita o sort e encerra o modo top no top_n-esimo time.
+    """
+    include_team_ids = {str(x) for x in (filters.get("include_team_ids") or []) if str(x).strip()}
+    team_types = set(filters.get("team_types") or ["CLUB", "NATIONAL"])
+    genders = set(filters.get("genders") or ["MEN", "WOMEN"])
+    competitions = set(filters.get("competitions") or [])
+    countries = set(filters.get("countries") or [])
+    conferences = set(filters.get("conferences") or [])
     divisions = set(filters.get("divisions") or [])
     overall_min = int(filters.get("overall_min") or 0)
     overall_max = int(filters.get("overall_max") or 999)
     include_invalid = bool(filters.get("include_invalid") or False)
-
-    out = []
-    for t in rows:
-        if not include_invalid and not t.get("is_valid", True):
-            continue
-        if include_team_ids and str(t.get("team_id")) not in include_team_ids:
-            continue
-        if team_types and (t.get("team_type") or "") not in team_types:
-            continue
-        if genders and (t.get("gender") or "") not in genders:
-            continue
-        if competitions and (t.get("competition") or "") not in competitions:
+    mode = filters.get("mode", "all")
+    top_n = int(filters.get("top_n") or 0)
+    limit = top_n if mode == "top" and top_n > 0 else 0
+    presorted = candidates is None and order is not None
+
+    out = []
+    if candidates is not None:
+        scan: Iterable[int] = candidates
+    elif order is not None:
+        scan = order
+    else:
+        scan = range(len(rows))
+    for i in scan:
+        t = rows[i]
+        if not include_invalid and not t.get("is_valid", True):
+            continue
+        if include_team_ids and str(t.get("team_id")) not in include_team_ids:
+            continue
+        if team_types and (t.get("team_type") or "") not in team_types:
+            continue
+        if genders and (t.get("gender") or "") not in genders:
+            continue
+        if competitions and (t.get("competition") or "") not in competitions:
             continue
         if countries and (t.get("country") or "") not in countries:
             continue
@@ -43,52 +80,55 @@ def apply_filters(rows: List[Dict[str, Any]], filters: Dict[str, Any]) -> List[D
         overall = _to_int(t.get("overall", 0))
         if overall < overall_min or overall > overall_max:
             continue
-        out.append(t)
-
-    out.sort(
-        key=lambda x: (
-            _to_int(x.get("overall", 0)),
-            _to_int(x.get("attack", 0)),
-            _to_int(x.get("midfield", 0)),
-            _to_int(x.get("defence", 0)),
-        ),
-        reverse=True,
-    )
+        out.append(i)
+        if presorted and limit and len(out) >= limit:
+            break
+
+    if presorted:
+        return out
+    if limit:
+        # Candidatos sem ordem previa: top-k em O(n log k) (mesmo resultado de sorted(...)[:k]).
+        return heapq.nlargest(limit, out, key=lambda i: _rating_key(rows[i]))
+    out.sort(key=lambda i: _rating_key(rows[i]), reverse=True)
+    return out
 
-    mode = filters.get("mode", "all")
-    top_n = int(filters.get("top_n") or 0)
-    if mode == "top" and top_n > 0:
-        out = out[:top_n]
 
-    return out
+def apply_filters(rows: List[Dict[str, Any]], filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [rows[i] for i in filter_indices(rows, filters)]
+
+
+# Campos do time copiados para cada linha do sorteio.
+TEAM_FIELDS = (
+    "team_id",
+    "team_name",
+    "team_type",
+    "gender",
+    "overall",
+    "attack",
+    "midfield",
+    "defence",
+    "competition",
+    "country",
+    "conference",
+    "division",
+)
 
 
-def draw_assignments(participants: List[str], pool: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    pool_copy = pool[:]
+def draw_indices(participants: List[str], pool: Sequence[Any]) -> List[Any]:
+    # Mesmo embaralhamento de draw_assignments: com a mesma seed, o mesmo time para cada participante.
+    pool_copy = list(pool)
     random.shuffle(pool_copy)
+    return pool_copy[: len(participants)]
 
+
+def draw_assignments(participants: List[str], pool: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     result = []
-    for i, person in enumerate(participants):
-        t = pool_copy[i]
-        result.append(
-            {
-                "participant": person,
-                "team_id": t.get("team_id"),
-                "team_name": t.get("team_name"),
-                "team_type": t.get("team_type"),
-                "gender": t.get("gender"),
-                "overall": t.get("overall"),
-                "attack": t.get("attack"),
-                "midfield": t.get("midfield"),
-                "defence": t.get("defence"),
-                "competition": t.get("competition"),
-                "country": t.get("country"),
-                "conference": t.get("conference"),
-                "division": t.get("division"),
-            }
-        )
-
-    return result
+    for person, t in zip(participants, draw_indices(participants, pool)):
+        row = {"participant": person}
+        row.update((f, t.get(f)) for f in TEAM_FIELDS)
+        result.append(row)
+
+    return result
 
 
 def balance_pool_by_tiers(pool: List[Dict[str, Any]], tiers: int = 4) -> List[Dict[str, Any]]:
@@ -147,23 +187,60 @@ def make_bracket(draw_rows: List[Dict[str, Any]]) -> Dict[str, Any]:
     return {"count": total, "rounds": rounds}
 
 
-def make_round_robin(draw_rows: List[Dict[str, Any]]) -> Dict[str, Any]:
-    players = draw_rows[:]
-    if len(players) % 2 == 1:
-        players.append(None)
-
-    total = len(players)
-    rounds = total - 1 if total > 1 else 0
-    matches = []
-
-    for r in range(rounds):
-        for i in range(total // 2):
-            a = players[i]
-            b = players[total - 1 - i]
-            if a is None or b is None:
-                continue
-            matches.append({"round": r + 1, "a": a, "b": b})
-
-        players = [players[0]] + [players[-1]] + players[1:-1]
-
+def round_robin_rounds(players: int, double: bool = False) -> Iterator[List[Tuple[int, int]]]:
+    """
+    Metodo do circulo: gera uma rodada por vez como pares (mandante, visitante)
+    de indices. A posicao 0 fica fixa e as demais giram (com numero impar de
+    jogadores a posicao fixa e a folga); o mando alterna de modo que cada jogador
+    tenha no maximo um mando a mais que o outro e no maximo uma sequencia
+    repetida. No turno e returno o segundo turno inverte os mandos.
+    """
+    if players < 2:
+        return
+    total = players + players % 2
+    shift = players % 2
+    legs = 2 if double else 1
+    for leg in range(legs):
+        for r in range(total - 1):
+            pos = [0] + [1 + (k - 1 - r) % (total - 1) for k in range(1, total)]
+            matches = []
+            for k in range(total // 2):
+                a, b = pos[k] - shift, pos[total - 1 - k] - shift
+                if a < 0 or b < 0:
+                    continue
+                if (r % 2 == 1) if k == 0 else (k % 2 == 1):
+                    a, b = b, a
+                matches.append((b, a) if leg else (a, b))
+            yield matches
+
+
+def round_robin_size(players: int, double: bool = False) -> Tuple[int, int]:
+    """(rodadas, partidas) sem gerar a tabela."""
+    if players < 2:
+        return 0, 0
+    legs = 2 if double else 1
+    return legs * (players + players % 2 - 1), legs * players * (players - 1) // 2
+
+
+def round_robin_page(players: int, double: bool = False, round_from: int = 1, rounds: int = 0) -> Dict[str, Any]:
+    """Rodadas `round_from`.. (1-based) como pares de indices; `rounds`=0 devolve ate o fim."""
+    total_rounds, total_matches = round_robin_size(players, double)
+    start = max(1, round_from)
+    stop = total_rounds + 1 if rounds <= 0 else min(total_rounds + 1, start + rounds)
+    page = islice(round_robin_rounds(players, double), start - 1, stop - 1)
+    return {
+        "players": players,
+        "total_rounds": total_rounds,
+        "total_matches": total_matches,
+        "rounds": [{"round": r, "matches": pairs} for r, pairs in enumerate(page, start=start)],
+        "next_round": stop if stop <= total_rounds else None,
+    }
+
+
+def make_round_robin(draw_rows: List[Dict[str, Any]], double: bool = False) -> Dict[str, Any]:
+    matches = [
+        {"round": r, "a": draw_rows[a], "b": draw_rows[b]}
+        for r, pairs in enumerate(round_robin_rounds(len(draw_rows), double), start=1)
+        for a, b in pairs
+    ]
     return {"players": len(draw_rows), "total_matches": len(matches), "matches": matches}
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+
+
+class TokenBucket:
+    """Limitador global: `rate` requisicoes/s com rajadas de ate `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = max(0.001, float(rate))
+        self.capacity = max(1, int(burst))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class HttpCache:
+    """Cache em disco: corpo + metadados (ETag/Last-Modified) por URL."""
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json"), os.path.join(self.cache_dir, f"{key}.html")
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "r", encoding="utf-8") as f:
+                meta["body"] = f.read()
+            return meta
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, url: str, body: str, etag: Optional[str], last_modified: Optional[str]) -> Dict[str, Any]:
+        meta_path, body_path = self._paths(url)
+        meta = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "sha1": _digest(body),
+            "fetched_at": datetime.utcnow().isoformat(timespec="seconds"),
+        }
+        for path, content in ((body_path, body), (meta_path, json.dumps(meta, ensure_ascii=False))):
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp, path)
+        meta["body"] = body
+        return meta
+
+
+class CachedFetcher:
+    """
+    GET com limite de taxa global e revalidacao condicional (If-None-Match /
+    If-Modified-Since). Cada thread usa sua propria requests.Session.
+    """
+
+    def __init__(
+        self,
+        headers: Dict[str, str],
+        cache_dir: Optional[str] = None,
+        rate: float = 5.0,
+        burst: int = 1,
+        timeout: float = 30,
+    ):
+        self.headers = dict(headers)
+        self.cache = HttpCache(cache_dir) if cache_dir else None
+        self.bucket = TokenBucket(rate, burst)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+
+    def get(self, url: str) -> Tuple[str, str, bool]:
+        """Retorna (html, sha1 do corpo, mudou_desde_o_cache)."""
+        cached = self.cache.get(url) if self.cache else None
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        self.bucket.acquire()
+        r = self._session().get(url, headers=headers, timeout=self.timeout)
+        if r.status_code == 304 and cached:
+            return cached["body"], cached["sha1"], False
+        if r.status_code == 403:
+            raise RuntimeError(
+                "Acesso negado (HTTP 403). O site pode bloquear automatizacao. "
+                "Tente novamente mais tarde ou use outra rede."
+            )
+        r.raise_for_status()
+
+        body = r.text
+        digest = _digest(body)
+        if self.cache:
+            self.cache.put(url, body, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+        return body, digest, not cached or cached.get("sha1") != digest
@@ -0,0 +1,79 @@
+import json
+import re
+import secrets
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.datasets import on_dataset_change
+from services.draws import TEAM_FIELDS
+
+_LOCK = threading.Lock()
+_TEAMS: Dict[str, Tuple[str, List[Optional[bytes]]]] = {}
+
+
+def dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class Splicer:
+    """
+    Monta uma resposta JSON com pedacos ja codificados: `ref(fragmento)` devolve
+    um marcador (string) para usar no lugar do objeto e `render` troca os
+    marcadores pelos bytes num unico passe. O token aleatorio impede que texto
+    vindo do usuario seja confundido com um marcador.
+    """
+
+    def __init__(self):
+        self._token = secrets.token_hex(6)
+        self._parts: List[bytes] = []
+        self._pattern = re.compile(rb'"\xee\x80\x80' + self._token.encode("ascii") + rb":(\d+)\"")
+
+    def ref(self, fragment: bytes) -> str:
+        self._parts.append(fragment)
+        return f"\ue000{self._token}:{len(self._parts) - 1}"
+
+    def render(self, obj: Any) -> bytes:
+        body = dumps(obj)
+        if not self._parts:
+            return body
+        parts = self._parts
+        return self._pattern.sub(lambda m: parts[int(m.group(1))], body)
+
+
+def _team_body(row: Any) -> bytes:
+    # Sem as chaves externas: vira `{"participant":...,<corpo>}` na linha do sorteio.
+    return dumps({f: row.get(f) for f in TEAM_FIELDS})[1:-1]
+
+
+def team_fragment(dataset: str, version: str, rows: List[Any], i: int) -> bytes:
+    """Campos do time `rows[i]` codificados uma vez por versao do dataset."""
+    cached = _TEAMS.get(dataset)
+    if cached is None or cached[0] != version:
+        with _LOCK:
+            cached = _TEAMS.get(dataset)
+            if cached is None or cached[0] != version:
+                cached = (version, [None] * len(rows))
+                _TEAMS[dataset] = cached
+    body = cached[1][i]
+    if body is None:
+        body = _team_body(rows[i])
+        cached[1][i] = body
+    return body
+
+
+def draw_row_fragment(participant: str, team_body: bytes) -> bytes:
+    return b'{"participant":' + dumps(participant) + b"," + team_body + b"}"
+
+
+def stats() -> Dict[str, Any]:
+    out = {}
+    for dataset, (version, bodies) in _TEAMS.items():
+        filled = [b for b in bodies if b is not None]
+        out[dataset] = {"version": version, "teams": len(filled), "bytes": sum(len(b) for b in filled)}
+    return out
+
+
+@on_dataset_change
+def _drop_stale(dataset: str, changelog: Optional[Dict[str, Any]]) -> None:
+    with _LOCK:
+        _TEAMS.pop(dataset, None)
@@ -0,0 +1,297 @@
+import random
+import time
+from bisect import bisect_left
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from services.draws import rating_order
+
+SEPARATE_BY = ("country",)
+MAX_TEAMS = 2048
+
+
+class DrawTimeout(Exception):
+    pass
+
+
+def make_pots(rows: Sequence[Dict[str, Any]], groups: int) -> List[List[int]]:
+    """Potes por rating (mesma ordem do pool): os `groups` melhores no pote 1 e assim por diante."""
+    order = rating_order(list(rows))
+    return [order[i : i + groups] for i in range(0, len(order), groups)]
+
+
+def _attrs(row: Dict[str, Any], separate_by: Sequence[str]) -> FrozenSet[Tuple[str, str]]:
+    return frozenset((f, str(row.get(f) or "").strip()) for f in separate_by if str(row.get(f) or "").strip())
+
+
+class GroupDraw:
+    """
+    Distribui os potes em grupos (um time de cada pote por grupo) sem repetir
+    valores de `separate_by` no mesmo grupo.
+
+    A contagem percorre time a time com memo no multiconjunto de estados dos
+    grupos (grupos com os mesmos atributos sao intercambiaveis), considerando so
+    os atributos de times que ainda faltam. Com as contagens, cada escolha e
+    feita com peso igual ao numero de sorteios completos que ela permite: a
+    amostra e uniforme entre todos os sorteios validos.
+    """
+
+    def __init__(self, rows: Sequence[Dict[str, Any]], groups: int, separate_by: Sequence[str] = SEPARATE_BY):
+        if groups < 2:
+            raise ValueError("Informe ao menos 2 grupos.")
+        if len(rows) < groups:
+            raise ValueError("Menos times que grupos.")
+        self.groups = groups
+        self.pots = make_pots(rows, groups)
+        self.sequence = [(p, team) for p, pot in enumerate(self.pots) for team in pot]
+        self.attrs = [_attrs(r, separate_by) for r in rows]
+        # Atributos que ainda importam a partir de cada posicao da sequencia.
+        self.relevant: List[FrozenSet[Tuple[str, str]]] = [frozenset()] * (len(self.sequence) + 1)
+        acc: FrozenSet[Tuple[str, str]] = frozenset()
+        for k in range(len(self.sequence) - 1, -1, -1):
+            acc = acc | self.attrs[self.sequence[k][1]]
+            self.relevant[k] = acc
+        self._memo: Dict[Tuple[int, Tuple[Any, ...]], int] = {}
+        self._deadline = float("inf")
+
+    def _key(self, k: int, sigs: List[FrozenSet[Tuple[str, str]]], filled: List[bool]) -> Tuple[int, Tuple[Any, ...]]:
+        keep = self.relevant[k]
+        return k, tuple(sorted((tuple(sorted(s & keep)), f) for s, f in zip(sigs, filled)))
+
+    def _options(self, k: int, sigs: List[FrozenSet[Tuple[str, str]]], filled: List[bool]) -> List[int]:
+        attrs = self.attrs[self.sequence[k][1]]
+        return [g for g in range(self.groups) if not filled[g] and not (sigs[g] & attrs)]
+
+    def _advance(self, k: int, filled: List[bool]) -> List[bool]:
+        # Mudou de pote: todos os grupos voltam a aceitar um time.
+        if k + 1 < len(self.sequence) and self.sequence[k + 1][0] != self.sequence[k][0]:
+            return [False] * self.groups
+        return filled
+
+    def _count(self, k: int, sigs: List[FrozenSet[Tuple[str, str]]], filled: List[bool]) -> int:
+        """
+        Numero de sorteios completos a partir da posicao `k`. Pilha explicita em
+        vez de recursao: a profundidade e o numero de times (milhares estouram o
+        limite de recursao do Python). Cada quadro e
+        [k, chave, filled, opcoes, proxima opcao, total, grupo em teste, sig antiga].
+        """
+        n = len(self.sequence)
+        if k == n:
+            return 1
+        key = self._key(k, sigs, filled)
+        cached = self._memo.get(key)
+        if cached is not None:
+            return cached
+        if time.monotonic() > self._deadline:
+            raise DrawTimeout()
+        stack: List[List[Any]] = [[k, key, filled, self._options(k, sigs, filled), 0, 0, None, None]]
+        ret: Optional[int] = None
+        while True:
+            frame = stack[-1]
+            fk, fkey, ffilled, options = frame[0], frame[1], frame[2], frame[3]
+            if ret is not None:
+                g = frame[6]
+                ffilled[g] = False
+                sigs[g] = frame[7]
+                frame[5] += ret
+                ret = None
+            if frame[4] < len(options):
+                # Checado a cada opcao, nao so ao descer: com muitos grupos as
+                # chaves de filhos ja contados sozinhas passam do orcamento.
+                if time.monotonic() > self._deadline:
+                    raise DrawTimeout()
+                g = options[frame[4]]
+                frame[4] += 1
+                frame[6], frame[7] = g, sigs[g]
+                sigs[g] = frame[7] | self.attrs[self.sequence[fk][1]]
+                ffilled[g] = True
+                child_k = fk + 1
+                if child_k == n:
+                    ret = 1
+                    continue
+                child_filled = self._advance(fk, ffilled)
+                child_key = self._key(child_k, sigs, child_filled)
+                cached = self._memo.get(child_key)
+                if cached is not None:
+                    ret = cached
+                    continue
+                stack.append([child_k, child_key, child_filled, self._options(child_k, sigs, child_filled), 0, 0, None, None])
+            else:
+                self._memo[fkey] = frame[5]
+                stack.pop()
+                if not stack:
+                    return frame[5]
+                ret = frame[5]
+
+    def count(self, time_budget: float = 2.0) -> int:
+        self._deadline = time.monotonic() + time_budget
+        return self._count(0, [frozenset()] * self.groups, [False] * self.groups)
+
+    def sample(self, rng: random.Random, time_budget: float = 2.0) -> List[List[int]]:
+        """Sorteio uniforme; levanta DrawTimeout se a contagem estourar o tempo."""
+        total = self.count(time_budget)
+        if total == 0:
+            raise ValueError("Nenhum sorteio possivel com essas restricoes.")
+        sigs: List[FrozenSet[Tuple[str, str]]] = [frozenset()] * self.groups
+        filled = [False] * self.groups
+        out: List[List[int]] = [[] for _ in range(self.groups)]
+        for k, (_, team) in enumerate(self.sequence):
+            attrs = self.attrs[team]
+            weights = []
+            options = self._options(k, sigs, filled)
+            for g in options:
+                old_sig = sigs[g]
+                sigs[g] = old_sig | attrs
+                filled[g] = True
+                weights.append(self._count(k + 1, sigs, self._advance(k, filled)))
+                filled[g] = False
+                sigs[g] = old_sig
+            g = rng.choices(options, weights=weights)[0]
+            sigs[g] = sigs[g] | attrs
+            filled[g] = True
+            filled = self._advance(k, filled)
+            out[g].append(team)
+        return out
+
+    def rejection_sample(self, rng: random.Random, time_budget: float = 2.0) -> List[List[int]]:
+        """
+        Uniforme sem contagem: cada pote e uma permutacao aleatoria dos grupos e
+        o sorteio inteiro e descartado na primeira violacao. Serve quando a
+        contagem nao cabe no tempo mas sorteios validos nao sao raros.
+        """
+        deadline = time.monotonic() + time_budget
+        groups = list(range(self.groups))
+        while time.monotonic() < deadline:
+            for _ in range(256):
+                sigs: List[FrozenSet[Tuple[str, str]]] = [frozenset()] * self.groups
+                out: List[List[int]] = [[] for _ in range(self.groups)]
+                ok = True
+                for pot in self.pots:
+                    rng.shuffle(groups)
+                    for team, g in zip(pot, groups):
+                        if sigs[g] & self.attrs[team]:
+                            ok = False
+                            break
+                        sigs[g] = sigs[g] | self.attrs[team]
+                        out[g].append(team)
+                    if not ok:
+                        break
+                if ok:
+                    return out
+        raise DrawTimeout()
+
+    def search(self, rng: random.Random, time_budget: float = 2.0) -> List[List[int]]:
+        """
+        Alternativa sem contagem (nao uniforme): retrocesso com grupos em ordem
+        aleatoria e verificacao adiante. Depois de cada escolha todo time ainda
+        nao sorteado precisa ter algum grupo compativel, senao a escolha e
+        descartada antes de descer.
+        """
+        deadline = time.monotonic() + time_budget
+        n = len(self.sequence)
+        sigs: List[FrozenSet[Tuple[str, str]]] = [frozenset()] * self.groups
+        filled = [False] * self.groups
+        out: List[List[int]] = [[] for _ in range(self.groups)]
+
+        # Posicoes da sequencia por atributo: so quem divide atributo com o time
+        # recem-colocado pode ter perdido grupos compativeis em potes seguintes.
+        positions: Dict[Tuple[str, str], List[int]] = {}
+        for j, (_, team) in enumerate(self.sequence):
+            for attr in self.attrs[team]:
+                positions.setdefault(attr, []).append(j)
+
+        def viable(k: int, placed: FrozenSet[Tuple[str, str]]) -> bool:
+            # Incremental: antes da escolha todos os times restantes tinham grupo possivel.
+            pot = self.sequence[k][0] if k < n else -1
+            free = [g for g in range(self.groups) if not filled[g]]
+            j = k
+            while j < n and self.sequence[j][0] == pot:
+                attrs = self.attrs[self.sequence[j][1]]
+                if not any(not (sigs[g] & attrs) for g in free):
+                    return False
+                j += 1
+            for attr in placed:
+                ids = positions[attr]
+                for i in range(bisect_left(ids, j), len(ids)):
+                    attrs = self.attrs[self.sequence[ids[i]][1]]
+                    if not any(not (sig & attrs) for sig in sigs):
+                        return False
+            return True
+
+        # Retrocesso com pilha explicita (a profundidade e o numero de times).
+        # Cada quadro e [k, opcoes embaralhadas, proxima opcao, desfazer da escolha atual].
+        if time.monotonic() > deadline:
+            raise DrawTimeout()
+        first = self._options(0, sigs, filled)
+        rng.shuffle(first)
+        stack: List[List[Any]] = [[0, first, 0, None]]
+        while stack:
+            frame = stack[-1]
+            k = frame[0]
+            if frame[3] is not None:
+                g, old_sig, old_filled = frame[3]
+                out[g].pop()
+                sigs[g], filled = old_sig, old_filled
+                frame[3] = None
+            if frame[2] >= len(frame[1]):
+                stack.pop()
+                continue
+            g = frame[1][frame[2]]
+            frame[2] += 1
+            team = self.sequence[k][1]
+            frame[3] = (g, sigs[g], filled)
+            sigs[g] = sigs[g] | self.attrs[team]
+            filled = list(filled)
+            filled[g] = True
+            filled = self._advance(k, filled)
+            out[g].append(team)
+            if not viable(k + 1, self.attrs[team]):
+                continue
+            if k + 1 == n:
+                return out
+            if time.monotonic() > deadline:
+                raise DrawTimeout()
+            options = self._options(k + 1, sigs, filled)
+            rng.shuffle(options)
+            stack.append([k + 1, options, 0, None])
+        raise ValueError("Nenhum sorteio possivel com essas restricoes.")
+
+
+def draw_groups(
+    rows: Sequence[Dict[str, Any]],
+    groups: int,
+    separate_by: Sequence[str] = SEPARATE_BY,
+    seed: Optional[str] = None,
+    time_budget: float = 2.0,
+    count_only: bool = False,
+) -> Dict[str, Any]:
+    """
+    Tenta, dividindo o orcamento de tempo: contagem exata + amostra uniforme,
+    depois amostragem por rejeicao (uniforme, sem contagem) e por fim a busca
+    com retrocesso (so garante um sorteio valido). `uniform` diz qual valeu.
+    """
+    engine = GroupDraw(rows, groups, separate_by)
+    rng = random.Random(seed)
+    deadline = time.monotonic() + time_budget
+    out: Dict[str, Any] = {"pots": engine.pots, "count": None, "uniform": False}
+    try:
+        out["count"] = engine.count(time_budget if count_only else time_budget / 3)
+    except DrawTimeout:
+        pass
+    if count_only:
+        del out["uniform"]
+        return out
+    if out["count"] == 0:
+        raise ValueError("Nenhum sorteio possivel com essas restricoes.")
+
+    if out["count"] is not None:
+        out["groups"], out["uniform"] = engine.sample(rng, max(0.1, deadline - time.monotonic())), True
+        return out
+    try:
+        out["groups"] = engine.rejection_sample(rng, max(0.05, (deadline - time.monotonic()) / 2))
+        out["uniform"] = True
+    except DrawTimeout:
+        try:
+            out["groups"] = engine.search(rng, max(0.1, deadline - time.monotonic()))
+        except DrawTimeout:
+            raise ValueError("Nenhum sorteio encontrado dentro do tempo limite.")
+    return out
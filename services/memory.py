@@ -0,0 +1,217 @@
+import gc
+import itertools
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from array import array
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Tuple
+
+MAX_SNAPSHOTS = int(os.getenv("MEMORY_SNAPSHOTS", "4"))
+# Teto de objetos visitados por deep_size: um dataset grande nao trava o worker.
+MAX_OBJECTS = 2_000_000
+GROUPS = ("lineno", "filename", "traceback")
+# Nao seguidos por deep_size: compartilhados pelo processo inteiro, nao pertencem a estrutura medida.
+_OPAQUE = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+def rss() -> Dict[str, int]:
+    """RSS atual e pico do processo em bytes (/proc no Linux; so o pico via getrusage fora dele)."""
+    out: Dict[str, int] = {}
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith(("VmRSS:", "VmHWM:")):
+                    key = "rss_bytes" if line.startswith("VmRSS") else "rss_peak_bytes"
+                    out[key] = int(line.split()[1]) * 1024
+    except OSError:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        out["rss_peak_bytes"] = peak if sys.platform == "darwin" else peak * 1024
+    return out
+
+
+def deep_size(obj: Any, limit: int = MAX_OBJECTS) -> Tuple[int, bool]:
+    """
+    (bytes, truncado) de `obj` e tudo que ele alcanca por containers, __dict__
+    e __slots__. Cada objeto conta uma vez (strings internadas compartilhadas
+    entre linhas nao se repetem). Modulos, classes e funcoes nao sao seguidos.
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        if len(seen) >= limit:
+            return total, True
+        o = stack.pop()
+        if id(o) in seen or isinstance(o, _OPAQUE):
+            continue
+        seen.add(id(o))
+        total += sys.getsizeof(o)
+        if isinstance(o, (str, bytes, bytearray, int, float, bool, array)) or o is None:
+            continue
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset, deque)):
+            stack.extend(o)
+        else:
+            attrs = getattr(o, "__dict__", None)
+            if attrs is not None:
+                stack.append(attrs)
+            for cls in type(o).__mro__:
+                for slot in getattr(cls, "__slots__", ()):
+                    if hasattr(o, slot):
+                        stack.append(getattr(o, slot))
+    return total, False
+
+
+class MemoryTracker:
+    """
+    Controle do tracemalloc e snapshots nomeados (os ultimos MAX_SNAPSHOTS;
+    cada snapshot ocupa memoria propria). `track` registra estruturas cujo
+    tamanho entra no relatorio.
+    """
+
+    def __init__(self, keep: int = MAX_SNAPSHOTS):
+        self.keep = max(2, keep)
+        self._snapshots: "OrderedDict[int, Tuple[Dict[str, Any], tracemalloc.Snapshot]]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._tracked: Dict[str, Callable[[], Any]] = {}
+
+    def track(self, name: str, getter: Callable[[], Any]) -> None:
+        self._tracked[name] = getter
+
+    def start(self, frames: int = 1) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(max(1, min(frames, 64)))
+        return self.status()
+
+    def stop(self) -> Dict[str, Any]:
+        # Os snapshots guardados continuam validos para top/diff depois de parar.
+        tracemalloc.stop()
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"tracing": tracemalloc.is_tracing()}
+        if out["tracing"]:
+            current, peak = tracemalloc.get_traced_memory()
+            out.update(
+                frames=tracemalloc.get_traceback_limit(),
+                traced_bytes=current,
+                traced_peak_bytes=peak,
+                overhead_bytes=tracemalloc.get_tracemalloc_memory(),
+            )
+        out.update(rss())
+        out["gc"] = {"counts": list(gc.get_count()), "objects": len(gc.get_objects())}
+        with self._lock:
+            out["snapshots"] = [meta for meta, _ in self._snapshots.values()]
+        return out
+
+    def snapshot(self, label: str = "", collect: bool = True) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            raise LookupError("tracemalloc parado. Inicie antes de tirar snapshot.")
+        if collect:
+            gc.collect()
+        snap = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+        meta = {
+            "label": label[:80],
+            "at": time.time(),
+            "frames": tracemalloc.get_traceback_limit(),
+            "traced_bytes": sum(t.size for t in snap.traces),
+            "blocks": len(snap.traces),
+        }
+        with self._lock:
+            meta["id"] = next(self._ids)
+            self._snapshots[meta["id"]] = (meta, snap)
+            while len(self._snapshots) > self.keep:
+                self._snapshots.popitem(last=False)
+        return meta
+
+    def drop(self, snapshot_id: int) -> None:
+        with self._lock:
+            if self._snapshots.pop(snapshot_id, None) is None:
+                raise KeyError(snapshot_id)
+
+    def _get(self, snapshot_id: int) -> Tuple[Dict[str, Any], tracemalloc.Snapshot]:
+        with self._lock:
+            found = self._snapshots.get(snapshot_id)
+        if found is None:
+            raise KeyError(snapshot_id)
+        return found
+
+    def top(self, snapshot_id: int, group: str = "lineno", limit: int = 30) -> Dict[str, Any]:
+        meta, snap = self._get(snapshot_id)
+        stats = snap.statistics(_group(group))
+        return dict(meta, group=group, top=[_stat(s) for s in stats[:limit]])
+
+    def diff(self, old_id: int, new_id: int, group: str = "lineno", limit: int = 30) -> Dict[str, Any]:
+        """Diferenca new - old agrupada; ordena pelo maior crescimento absoluto."""
+        old_meta, old = self._get(old_id)
+        new_meta, new = self._get(new_id)
+        stats = new.compare_to(old, _group(group))
+        return {
+            "old": old_meta,
+            "new": new_meta,
+            "group": group,
+            "size_diff_bytes": sum(s.size_diff for s in stats),
+            "top": [dict(_stat(s), size_diff=s.size_diff, count_diff=s.count_diff) for s in stats[:limit]],
+        }
+
+    def structures(self, deep: bool = False) -> Dict[str, Any]:
+        """Entradas e bytes das estruturas registradas; `deep` percorre o grafo (lento em datasets grandes)."""
+        out: Dict[str, Any] = {}
+        for name, getter in sorted(self._tracked.items()):
+            obj = getter()
+            info: Dict[str, Any]
+            if isinstance(obj, dict) and "bytes" in obj and "entries" in obj:
+                info = dict(obj)  # o dono ja sabe o proprio tamanho (caches com limite em bytes)
+            else:
+                info = {"entries": len(obj) if hasattr(obj, "__len__") else None}
+                if deep:
+                    info["bytes"], truncated = deep_size(obj)
+                    if truncated:
+                        info["truncated"] = True
+                else:
+                    info["shallow_bytes"] = sys.getsizeof(obj)
+            out[name] = info
+        return out
+
+
+def _group(group: str) -> str:
+    if group not in GROUPS:
+        raise ValueError(f"group aceita: {', '.join(GROUPS)}.")
+    return group
+
+
+def _where(frame: tracemalloc.Frame) -> str:
+    filename = frame.filename
+    if filename.startswith(_ROOT):
+        filename = os.path.relpath(filename, _ROOT)
+    # Agrupado por arquivo o tracemalloc zera a linha.
+    return f"{filename}:{frame.lineno}" if frame.lineno else filename
+
+
+def _stat(stat: Any) -> Dict[str, Any]:
+    return {
+        "where": _where(stat.traceback[0]),
+        "traceback": [_where(f) for f in stat.traceback] if len(stat.traceback) > 1 else None,
+        "size": stat.size,
+        "count": stat.count,
+    }
+
+
+MEMORY = MemoryTracker()
@@ -0,0 +1,257 @@
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Modo multi-processo (gunicorn com varios workers): cada processo grava seu
+# agregado em <dir>/<pid>.json e o /metrics de qualquer worker soma os arquivos.
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR", "")
+FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+Labels = Tuple[str, ...]
+# (nome, tipo, ajuda, [(labels como dict, valor)]) devolvido pelos coletores chamados na coleta.
+Sample = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+class _Shard:
+    """Valores de uma thread: so ela escreve, entao incrementar nao precisa de lock."""
+
+    __slots__ = ("counters", "gauges", "hists")
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+        # [contagem por bucket..., +Inf, soma]
+        self.hists: Dict[Tuple[str, Labels], List[float]] = {}
+
+
+class Metrics:
+    """
+    Registro minimo no formato texto do Prometheus. Cada thread agrega no seu
+    proprio shard (criado uma vez, com lock so nesse momento); a coleta soma os
+    shards. A leitura concorrente pode pegar um incremento pela metade do
+    caminho entre duas series, o que e aceitavel para metricas.
+    """
+
+    def __init__(self):
+        self._meta: Dict[str, Tuple[str, str, Tuple[str, ...], Tuple[float, ...]]] = {}
+        self._shards: List[_Shard] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+        self._flusher: Optional[threading.Thread] = None
+
+    def _declare(self, name: str, kind: str, help_text: str, labels: Tuple[str, ...], buckets=()) -> None:
+        self._meta[name] = (kind, help_text, labels, tuple(buckets))
+
+    def counter(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> None:
+        self._declare(name, "counter", help_text, labels)
+
+    def gauge(self, name: str, help_text: str, labels: Tuple[str, ...] = ()) -> None:
+        self._declare(name, "gauge", help_text, labels)
+
+    def histogram(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS) -> None:
+        self._declare(name, "histogram", help_text, labels, buckets)
+
+    def collector(self, fn: Callable[[], Iterable[Sample]]):
+        """Registra uma funcao chamada a cada coleta (estatisticas que ja existem em outro lugar)."""
+        self._collectors.append(fn)
+        return fn
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard()
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name: str, labels: Labels = (), value: float = 1.0) -> None:
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0.0) + value
+
+    def add(self, name: str, labels: Labels = (), value: float = 1.0) -> None:
+        # Gauge por soma de deltas: +1/-1 na mesma thread, total certo somando os shards.
+        gauges = self._shard().gauges
+        key = (name, labels)
+        gauges[key] = gauges.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, labels: Labels = ()) -> None:
+        buckets = self._meta[name][3]
+        hists = self._shard().hists
+        key = (name, labels)
+        hist = hists.get(key)
+        if hist is None:
+            hist = [0.0] * (len(buckets) + 2)
+            hists[key] = hist
+        hist[bisect_left(buckets, value)] += 1
+        hist[-1] += value
+
+    def _merged(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            shards = list(self._shards)
+        out: Dict[str, Dict[str, Any]] = {"counters": {}, "gauges": {}, "hists": {}}
+        for shard in shards:
+            for kind in ("counters", "gauges"):
+                target = out[kind]
+                for key, value in list(getattr(shard, kind).items()):
+                    target[key] = target.get(key, 0.0) + value
+            for key, hist in list(shard.hists.items()):
+                acc = out["hists"].get(key)
+                if acc is None:
+                    out["hists"][key] = list(hist)
+                else:
+                    for i, v in enumerate(hist):
+                        acc[i] += v
+        return out
+
+    # --- multi-processo ---
+
+    def _path(self, pid: int) -> str:
+        return os.path.join(MULTIPROC_DIR, f"{pid}.json")
+
+    def flush(self) -> None:
+        if not MULTIPROC_DIR:
+            return
+        merged = self._merged()
+        doc = {kind: [[k[0], list(k[1]), v] for k, v in values.items()] for kind, values in merged.items()}
+        path = self._path(os.getpid())
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(doc, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def start_flusher(self) -> None:
+        """Thread que grava o agregado deste processo a cada FLUSH_SECONDS (so no modo multi-processo)."""
+        if not MULTIPROC_DIR or (self._flusher is not None and self._flusher.is_alive()):
+            return
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+        def loop() -> None:
+            while True:
+                time.sleep(FLUSH_SECONDS)
+                try:
+                    self.flush()
+                except OSError:
+                    pass
+
+        self._flusher = threading.Thread(target=loop, name="metrics-flush", daemon=True)
+        self._flusher.start()
+
+    def _all_processes(self) -> Dict[str, Dict[str, Any]]:
+        merged = self._merged()
+        if not MULTIPROC_DIR or not os.path.isdir(MULTIPROC_DIR):
+            return merged
+        me = os.getpid()
+        for name in os.listdir(MULTIPROC_DIR):
+            if not name.endswith(".json") or name == f"{me}.json":
+                continue
+            try:
+                pid = int(name[:-5])
+                with open(os.path.join(MULTIPROC_DIR, name), "r", encoding="utf-8") as f:
+                    doc = json.load(f)
+            except (ValueError, OSError):
+                continue
+            # Contadores e histogramas de workers mortos continuam valendo; gauges nao.
+            alive = _pid_alive(pid)
+            for kind in ("counters", "gauges", "hists"):
+                if kind == "gauges" and not alive:
+                    continue
+                target = merged[kind]
+                for metric, labels, value in doc.get(kind) or []:
+                    key = (metric, tuple(labels))
+                    if kind == "hists":
+                        acc = target.setdefault(key, [0.0] * len(value))
+                        for i, v in enumerate(value):
+                            acc[i] += v
+                    else:
+                        target[key] = target.get(key, 0.0) + value
+        return merged
+
+    # --- formato texto ---
+
+    def render(self) -> str:
+        merged = self._all_processes()
+        by_name: Dict[str, List[Tuple[Labels, Any]]] = {}
+        for kind in ("counters", "gauges", "hists"):
+            for (name, labels), value in merged[kind].items():
+                by_name.setdefault(name, []).append((labels, value))
+
+        lines: List[str] = []
+        for name in sorted(by_name):
+            if name not in self._meta:
+                continue
+            kind, help_text, label_names, buckets = self._meta[name]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(by_name[name]):
+                base = dict(zip(label_names, labels))
+                if kind != "histogram":
+                    lines.append(f"{name}{_labels(base)} {_num(value)}")
+                    continue
+                cumulative = 0.0
+                for bound, count in zip(buckets, value):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(dict(base, le=_num(bound)))} {_num(cumulative)}")
+                cumulative += value[len(buckets)]
+                lines.append(f'{name}_bucket{_labels(dict(base, le="+Inf"))} {_num(cumulative)}')
+                lines.append(f"{name}_sum{_labels(base)} {_num(value[-1])}")
+                lines.append(f"{name}_count{_labels(base)} {_num(cumulative)}")
+
+        for fn in self._collectors:
+            for name, kind, help_text, samples in fn():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(labels)} {_num(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _num(value: float) -> str:
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+METRICS = Metrics()
+METRICS.histogram("http_request_duration_seconds", "Latencia das requisicoes por endpoint.", ("endpoint", "method"))
+METRICS.counter("http_requests_total", "Requisicoes por endpoint e status.", ("endpoint", "method", "status"))
+METRICS.gauge("http_requests_in_flight", "Requisicoes em andamento por endpoint.", ("endpoint",))
+METRICS.histogram(
+    "http_response_size_bytes", "Tamanho do corpo das respostas (quando conhecido).", ("endpoint",), SIZE_BUCKETS
+)
+METRICS.counter("sqlite_statements_total", "Comandos SQLite executados, por tipo.", ("kind",))
+METRICS.histogram("sqlite_write_seconds", "Duracao das escritas SQLite, incluindo a espera pelo lock.", ("kind",))
+METRICS.counter("sqlite_busy_total", "Escritas SQLite que desistiram com 'database is locked'.", ("kind",))
+METRICS.counter("dataset_cache_total", "Acessos ao cache de datasets (hit ou a origem da carga).", ("dataset", "result"))
+METRICS.histogram("dataset_load_seconds", "Tempo para (re)carregar um dataset.", ("dataset", "source"))
@@ -0,0 +1,205 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.datasets import load_versioned, on_dataset_change
+from services.draws import filter_indices, rating_order
+from services.pools import ids_to_indices, preset_indices
+
+SET_FILTERS = ("team_types", "genders", "competitions", "countries", "conferences", "divisions")
+DEFAULT_SETS = {"team_types": ["CLUB", "NATIONAL"], "genders": ["MEN", "WOMEN"]}
+
+
+def _sorted_values(values: Any) -> List[Any]:
+    # json distingue 1 de "1" (o filtro tambem), entao o tipo entra na ordenacao.
+    return sorted(set(values), key=lambda v: (type(v).__name__, str(v)))
+
+
+def canonical_filters(filters: Dict[str, Any], preset: str = "") -> Dict[str, Any]:
+    """
+    Documento normalizado com a mesma semantica de filter_indices: listas viram
+    conjuntos ordenados, defaults preenchidos, top_n so conta no modo top.
+    """
+    doc: Dict[str, Any] = {"preset": preset or ""}
+    for name in SET_FILTERS:
+        doc[name] = _sorted_values(filters.get(name) or DEFAULT_SETS.get(name) or [])
+    doc["include_team_ids"] = sorted({str(x) for x in (filters.get("include_team_ids") or []) if str(x).strip()})
+    doc["overall_min"] = int(filters.get("overall_min") or 0)
+    doc["overall_max"] = int(filters.get("overall_max") or 999)
+    doc["include_invalid"] = bool(filters.get("include_invalid") or False)
+    top_n = int(filters.get("top_n") or 0)
+    doc["top_n"] = top_n if filters.get("mode", "all") == "top" and top_n > 0 else 0
+    return doc
+
+
+class PoolCache:
+    """LRU de pools resolvidos (array de indices), limitado pelo tamanho em bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.items: "OrderedDict[Tuple[str, str, str], array]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _cost(key: Tuple[str, str, str], ids: array) -> int:
+        return 64 + sum(len(k) for k in key) + ids.itemsize * len(ids)
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[array]:
+        with self.lock:
+            ids = self.items.get(key)
+            if ids is None:
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return ids
+
+    def peek(self, key: Tuple[str, str, str]) -> Optional[array]:
+        with self.lock:
+            return self.items.get(key)
+
+    def put(self, key: Tuple[str, str, str], ids: array) -> None:
+        cost = self._cost(key, ids)
+        if cost > self.max_bytes:
+            return
+        with self.lock:
+            old = self.items.pop(key, None)
+            if old is not None:
+                self.bytes -= self._cost(key, old)
+            self.items[key] = ids
+            self.bytes += cost
+            while self.bytes > self.max_bytes and self.items:
+                k, v = self.items.popitem(last=False)
+                self.bytes -= self._cost(k, v)
+                self.evictions += 1
+
+    def drop_dataset(self, dataset: str) -> None:
+        with self.lock:
+            for key in [k for k in self.items if k[0] == dataset]:
+                self.bytes -= self._cost(key, self.items.pop(key))
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self.items),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+CACHE = PoolCache(int(os.getenv("POOL_CACHE_BYTES", str(8 * 1024 * 1024))))
+_ORDER: Dict[str, Tuple[str, array]] = {}
+
+
+def _rating_order(dataset: str, version: str, rows: List[Dict[str, Any]]) -> array:
+    cached = _ORDER.get(dataset)
+    if cached is None or cached[0] != version:
+        cached = (version, array("I", rating_order(rows)))
+        _ORDER[dataset] = cached
+    return cached[1]
+
+
+@on_dataset_change
+def _drop_stale(dataset: str, changelog: Optional[Dict[str, Any]]) -> None:
+    # A chave ja inclui a versao; isto so libera a memoria das entradas antigas.
+    CACHE.drop_dataset(dataset)
+
+
+def _pool_ids(
+    dataset: str, version: str, rows: List[Dict[str, Any]], filters: Dict[str, Any], preset: str
+) -> Tuple[str, array]:
+    doc = canonical_filters(filters, preset)
+    key = (dataset, version, json.dumps(doc, sort_keys=True, separators=(",", ":")))
+    ids = CACHE.get(key)
+    if ids is not None:
+        return key[2], ids
+
+    if doc["top_n"]:
+        # top_n diferente do mesmo filtro: recorta o pool completo se ele ja estiver no cache.
+        base_doc = dict(doc, top_n=0)
+        base = CACHE.peek((dataset, version, json.dumps(base_doc, sort_keys=True, separators=(",", ":"))))
+        if base is not None:
+            ids = base[: doc["top_n"]]
+            CACHE.put(key, ids)
+            return key[2], ids
+
+    candidates = None
+    if preset:
+        candidates = preset_indices(dataset, version, rows, preset)
+    elif doc["include_team_ids"]:
+        candidates = ids_to_indices(dataset, version, rows, doc["include_team_ids"])
+    order = _rating_order(dataset, version, rows) if candidates is None else None
+    ids = array("I", filter_indices(rows, filters, candidates, order))
+    CACHE.put(key, ids)
+    return key[2], ids
+
+
+def resolve_pool_ids(
+    dataset: str, filters: Dict[str, Any], preset: str = ""
+) -> Tuple[str, List[Dict[str, Any]], array]:
+    """(versao, linhas, indices do pool em ordem de rating) do mesmo snapshot do dataset."""
+    version, rows = load_versioned(dataset)
+    _, ids = _pool_ids(dataset, version, rows, filters or {}, preset)
+    return version, rows, ids
+
+
+def resolve_pool(dataset: str, filters: Dict[str, Any], preset: str = "") -> List[Dict[str, Any]]:
+    """Pool filtrado e ordenado por rating; previews e sorteios com o mesmo filtro filtram uma vez so."""
+    _, rows, ids = resolve_pool_ids(dataset, filters, preset)
+    return [rows[i] for i in ids]
+
+
+def _cursor_tag(version: str, filter_key: str) -> str:
+    return hashlib.sha1(f"{version}|{filter_key}".encode("utf-8")).hexdigest()[:16]
+
+
+def encode_cursor(tag: str, offset: int) -> str:
+    raw = json.dumps({"t": tag, "o": offset}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return str(data["t"]), max(0, int(data["o"]))
+    except Exception:
+        raise ValueError("Cursor invalido.")
+
+
+def resolve_pool_page(
+    dataset: str, filters: Dict[str, Any], preset: str = "", cursor: str = "", limit: int = 30
+) -> Dict[str, Any]:
+    """
+    Uma pagina do pool ordenado. O cursor amarra versao do dataset + filtro; se o
+    CSV mudar no meio da paginacao o cursor antigo e recusado.
+    """
+    version, rows = load_versioned(dataset)
+    filter_key, ids = _pool_ids(dataset, version, rows, filters or {}, preset)
+    tag = _cursor_tag(version, filter_key)
+    offset = 0
+    if cursor:
+        cursor_tag, offset = decode_cursor(cursor)
+        if cursor_tag != tag:
+            raise ValueError("Cursor expirado: o pool mudou. Recarregue a lista.")
+    end = min(len(ids), offset + max(0, limit))
+    return {
+        "count": len(ids),
+        "offset": offset,
+        "rows": [rows[i] for i in ids[offset:end]],
+        "next_cursor": encode_cursor(tag, end) if end < len(ids) else None,
+    }
@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.datasets import load_versioned
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+POOLS_PATH = os.path.join(os.path.dirname(APP_DIR), "data", "pools.json")
+
+_LOCK = threading.Lock()
+_FILE: Dict[str, Any] = {"stamp": None, "data": {}, "body": b"{}", "etag": ""}
+_COMPILED: Dict[str, Tuple[Any, str, Dict[str, Dict[str, Any]]]] = {}
+_ID_INDEX: Dict[str, Tuple[str, Dict[str, List[int]]]] = {}
+
+
+def read_pools(path: str = POOLS_PATH) -> Dict[str, Any]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except FileNotFoundError:
+        return {}
+    except Exception:
+        return {}
+
+
+def index_team_ids(rows: List[Dict[str, Any]]) -> Dict[str, List[int]]:
+    # Mesma regra do filtro antigo (str(team_id)); ids repetidos (NBA/WNBA) apontam para varias linhas.
+    out: Dict[str, List[int]] = {}
+    for i, r in enumerate(rows):
+        out.setdefault(str(r.get("team_id")), []).append(i)
+    return out
+
+
+def resolve_presets(rows: List[Dict[str, Any]], presets: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    by_id = index_team_ids(rows)
+    out: Dict[str, Dict[str, Any]] = {}
+    for preset in presets or []:
+        key = str(preset.get("key") or "").strip()
+        if not key:
+            continue
+        indices: List[int] = []
+        unknown: List[str] = []
+        ambiguous: List[str] = []
+        seen = set()
+        for raw in preset.get("include_team_ids") or []:
+            team_id = str(raw).strip()
+            if not team_id or team_id in seen:
+                continue
+            seen.add(team_id)
+            hits = by_id.get(team_id)
+            if not hits:
+                unknown.append(team_id)
+                continue
+            if len(hits) > 1:
+                ambiguous.append(team_id)
+            indices.extend(hits)
+        out[key] = {"indices": sorted(indices), "unknown_ids": unknown, "ambiguous_ids": ambiguous}
+    return out
+
+
+def _pools_stamp() -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(POOLS_PATH)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _pools_file() -> Dict[str, Any]:
+    stamp = _pools_stamp()
+    if _FILE["stamp"] == stamp and stamp is not None:
+        return _FILE
+    with _LOCK:
+        if _FILE["stamp"] != stamp or stamp is None:
+            data = read_pools()
+            body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            _FILE.update(stamp=stamp, data=data, body=body, etag=hashlib.sha1(body).hexdigest())
+    return _FILE
+
+
+def load_pools() -> Dict[str, Any]:
+    return _pools_file()["data"]
+
+
+def room_filters(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Filtros de uma sala salva com o preset de pools.json resolvido para
+    include_team_ids: o cliente so guarda a chave em ui.preset
+    ("pool_<dataset>_<chave>"), mas quem le a sala espera a lista de ids.
+    """
+    filters = payload.get("filters") if isinstance(payload.get("filters"), dict) else {}
+    ui = payload.get("ui") if isinstance(payload.get("ui"), dict) else {}
+    dataset = str(payload.get("dataset") or "fc25")
+    preset = str(ui.get("preset") or "")
+    prefix = f"pool_{dataset}_"
+    if "include_team_ids" in filters or not preset.startswith(prefix):
+        return filters
+    key = preset[len(prefix):]
+    for p in load_pools().get(dataset) or []:
+        if str(p.get("key") or "").strip() == key:
+            return dict(filters, include_team_ids=list(p.get("include_team_ids") or []))
+    return filters
+
+
+def pools_body() -> Tuple[bytes, str]:
+    """JSON do pools.json ja serializado + ETag; so muda quando o arquivo muda."""
+    f = _pools_file()
+    return f["body"], f["etag"]
+
+
+def _id_index(dataset: str, version: str, rows: List[Dict[str, Any]]) -> Dict[str, List[int]]:
+    cached = _ID_INDEX.get(dataset)
+    if cached is None or cached[0] != version:
+        cached = (version, index_team_ids(rows))
+        _ID_INDEX[dataset] = cached
+    return cached[1]
+
+
+def _compiled(dataset: str, version: str, rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    f = _pools_file()
+    cached = _COMPILED.get(dataset)
+    if cached is not None and cached[0] == f["stamp"] and cached[1] == version:
+        return cached[2]
+
+    presets = f["data"].get(dataset) or []
+    compiled = resolve_presets(rows, presets)
+    for p in presets:
+        key = str(p.get("key") or "").strip()
+        if key in compiled:
+            compiled[key]["indices"] = tuple(compiled[key]["indices"])
+            compiled[key]["defaults"] = p.get("defaults") or {}
+            compiled[key]["label"] = p.get("label") or key
+    _COMPILED[dataset] = (f["stamp"], version, compiled)
+    return compiled
+
+
+def compiled_presets(dataset: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Presets do dataset resolvidos para indices de linha. Recompila quando o
+    pools.json ou o CSV mudam.
+    """
+    version, rows = load_versioned(dataset)
+    return _compiled(dataset, version, rows)
+
+
+def preset_indices(dataset: str, version: str, rows: List[Dict[str, Any]], key: str) -> Tuple[int, ...]:
+    preset = _compiled(dataset, version, rows).get(key)
+    if preset is None:
+        raise ValueError("Preset invalido.")
+    return preset["indices"]
+
+
+def ids_to_indices(dataset: str, version: str, rows: List[Dict[str, Any]], team_ids: List[Any]) -> List[int]:
+    index = _id_index(dataset, version, rows)
+    indices = set()
+    for raw in team_ids:
+        team_id = str(raw).strip()
+        if team_id:
+            indices.update(index.get(team_id, ()))
+    return sorted(indices)
+
+
+def presets_report() -> Dict[str, Dict[str, Any]]:
+    out: Dict[str, Dict[str, Any]] = {}
+    for dataset in load_pools():
+        try:
+            compiled = compiled_presets(dataset)
+        except Exception as e:
+            out[dataset] = {"error": str(e)}
+            continue
+        out[dataset] = {
+            key: {
+                "count": len(p["indices"]),
+                "unknown_ids": p["unknown_ids"],
+                "ambiguous_ids": p["ambiguous_ids"],
+            }
+            for key, p in compiled.items()
+        }
+    return out
@@ -0,0 +1,285 @@
+import cProfile
+import hashlib
+import hmac
+import io
+import itertools
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+# Endpoints (regra do Flask, ex.: "/api/draw") sempre perfilados com cProfile; "*" = todos.
+PROFILE_ENDPOINTS = {e.strip() for e in os.getenv("PROFILE_ENDPOINTS", "").split(",") if e.strip()}
+# Requisicoes acima deste tempo sao guardadas com as pilhas amostradas (0 desliga a amostragem).
+SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "0"))
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_MS", "5")) / 1000.0
+KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+# Chave dos endpoints de admin, usada tambem para assinar o X-Profile (ver sign_header); vazia desliga o cabecalho.
+SECRET = os.getenv("ADMIN_TOKEN", "")
+HEADER = "X-Profile"
+MAX_STACK = 64
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_ROOT = os.path.dirname(_HERE)
+
+
+def sign_header(path: str, ttl: int = 300, secret: str = SECRET, now: Optional[float] = None) -> str:
+    """Valor do X-Profile para `path`: "<expira>.<hmac-sha256 de 'expira:path'>"."""
+    expires = int((time.time() if now is None else now) + ttl)
+    sig = hmac.new(secret.encode("utf-8"), f"{expires}:{path}".encode("utf-8"), hashlib.sha256).hexdigest()
+    return f"{expires}.{sig}"
+
+
+def header_ok(value: str, path: str, secret: str = SECRET) -> bool:
+    if not secret or not value or "." not in value:
+        return False
+    expires, sig = value.split(".", 1)
+    try:
+        if int(expires) < time.time():
+            return False
+    except ValueError:
+        return False
+    expected = hmac.new(secret.encode("utf-8"), f"{expires}:{path}".encode("utf-8"), hashlib.sha256).hexdigest()
+    return hmac.compare_digest(sig, expected)
+
+
+def _label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(_ROOT):
+        filename = os.path.relpath(filename, _ROOT)
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+def _pstats_label(func: Tuple[str, int, str]) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name
+    if filename.startswith(_ROOT):
+        filename = os.path.relpath(filename, _ROOT)
+    else:
+        filename = os.path.basename(filename)
+    return f"{name} ({filename}:{line})"
+
+
+def collapse_pstats(stats: Dict[Any, Any]) -> Counter:
+    """
+    Pilhas colapsadas (formato do flamegraph.pl, peso em microssegundos) a
+    partir do grafo de chamadas do cProfile. O cProfile so guarda pares
+    chamador->chamado, entao o tempo de cada funcao e repartido entre os
+    caminhos na proporcao do tempo recebido de cada chamador: aproximado,
+    mas bom o bastante para ver onde o tempo foi.
+    """
+    children: Dict[Any, List[Tuple[Any, float]]] = {}
+    for func, (_cc, _nc, _tt, _ct, callers) in stats.items():
+        for caller, (_ccc, _cnc, _ctt, cct) in callers.items():
+            children.setdefault(caller, []).append((func, cct))
+    roots = [f for f, v in stats.items() if not v[4]]
+    out: Counter = Counter()
+
+    def walk(func, share: float, path: List[str], seen: Set[Any]) -> None:
+        _cc, _nc, tt, ct, _callers = stats[func]
+        path = path + [_pstats_label(func)]
+        weight = int(tt * share * 1_000_000)
+        if weight > 0:
+            out[";".join(path)] += weight
+        if len(path) >= MAX_STACK or ct <= 0:
+            return
+        for child, via in children.get(func, ()):
+            if child in seen:
+                continue
+            # Parte do tempo do filho que veio deste chamador, escalada pela fracao deste caminho.
+            child_ct = stats[child][3]
+            if child_ct > 0 and via > 0:
+                walk(child, share * via / child_ct, path, seen | {child})
+
+    for root in roots:
+        walk(root, 1.0, [], {root})
+    return out
+
+
+class _Sampler:
+    """
+    Amostrador de baixo custo: uma thread le a pilha das threads marcadas a
+    cada SAMPLE_INTERVAL via sys._current_frames(). So roda enquanto ha
+    requisicao marcada; sem marcacao, fica parada no Event.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._watched: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, ident: int) -> None:
+        with self._lock:
+            self._watched[ident] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="profile-sampler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def stop(self, ident: int) -> Counter:
+        with self._lock:
+            stacks = self._watched.pop(ident, Counter())
+            if not self._watched:
+                self._wake.clear()
+        return stacks
+
+    def _loop(self) -> None:
+        me = threading.get_ident()
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, stacks in self._watched.items():
+                    frame = frames.get(ident)
+                    if frame is None or ident == me:
+                        continue
+                    names: List[str] = []
+                    while frame is not None and len(names) < MAX_STACK:
+                        names.append(_label(frame.f_code))
+                        frame = frame.f_back
+                    stacks[";".join(reversed(names))] += 1
+
+
+class Profiler:
+    """
+    Perfis por requisicao num buffer circular dos ultimos KEEP. Dois modos:
+    cProfile (endpoint em PROFILE_ENDPOINTS ou X-Profile assinado) e
+    amostragem (toda requisicao quando PROFILE_SLOW_MS > 0; so as lentas ficam).
+    """
+
+    def __init__(self, keep: int = KEEP, slow_ms: float = SLOW_MS, endpoints=PROFILE_ENDPOINTS):
+        self.slow_ms = slow_ms
+        self.endpoints = set(endpoints)
+        self._ring: Deque[Dict[str, Any]] = deque(maxlen=max(1, keep))
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._sampler = _Sampler(SAMPLE_INTERVAL)
+
+    @property
+    def sampling(self) -> bool:
+        return self.slow_ms > 0
+
+    @property
+    def active(self) -> bool:
+        """Algum modo ligado? Sem nenhum, os hooks da app nem chegam a montar estado."""
+        return bool(self.endpoints or self.sampling or SECRET)
+
+    def wants(self, endpoint: str, header: str, path: str) -> bool:
+        """cProfile nesta requisicao? Por configuracao do endpoint ou cabecalho assinado."""
+        if "*" in self.endpoints or endpoint in self.endpoints:
+            return True
+        return bool(header) and header_ok(header, path)
+
+    def begin(self, profile: bool) -> Dict[str, Any]:
+        """Inicia a coleta da requisicao atual; o dict volta em `end`."""
+        state: Dict[str, Any] = {"started": time.perf_counter(), "ident": threading.get_ident()}
+        if profile:
+            state["cprofile"] = cProfile.Profile()
+            state["cprofile"].enable()
+        elif self.sampling:
+            self._sampler.start(state["ident"])
+            state["sampled"] = True
+        return state
+
+    def end(self, state: Dict[str, Any], info: Dict[str, Any]) -> Optional[int]:
+        """Fecha a coleta; guarda no buffer se foi cProfile ou passou do limite. Devolve o id guardado."""
+        elapsed_ms = (time.perf_counter() - state["started"]) * 1000.0
+        prof: Optional[cProfile.Profile] = state.get("cprofile")
+        stacks: Optional[Counter] = None
+        if prof is not None:
+            prof.disable()
+        elif state.get("sampled"):
+            stacks = self._sampler.stop(state["ident"])
+            if elapsed_ms < self.slow_ms:
+                return None
+        else:
+            return None
+
+        record = dict(info, duration_ms=round(elapsed_ms, 2), at=time.time())
+        if prof is not None:
+            prof.create_stats()
+            record["mode"] = "cprofile"
+            record["pstats"] = marshal.dumps(prof.stats)
+            record["collapsed"] = collapse_pstats(prof.stats)
+        else:
+            record["mode"] = "sampled"
+            record["samples"] = sum(stacks.values())
+            record["collapsed"] = stacks
+        with self._lock:
+            record["id"] = next(self._ids)
+            self._ring.append(record)
+        return record["id"]
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            records = list(self._ring)
+        return [
+            {k: v for k, v in r.items() if k not in ("pstats", "collapsed")} | {"has_pstats": "pstats" in r}
+            for r in reversed(records)
+        ]
+
+    def records(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._ring)
+
+    def get(self, profile_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for r in self._ring:
+                if r["id"] == profile_id:
+                    return r
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._ring.clear()
+
+
+def folded(record: Dict[str, Any]) -> str:
+    """Texto "pilha;...;funcao peso" por linha, entrada do flamegraph.pl/speedscope."""
+    buf = io.StringIO()
+    for stack, weight in sorted(record["collapsed"].items()):
+        buf.write(f"{stack} {weight}\n")
+    return buf.getvalue()
+
+
+def top_functions(record: Dict[str, Any], limit: int = 20) -> List[Dict[str, Any]]:
+    """Funcoes com mais tempo proprio (pstats) ou mais amostras no topo da pilha."""
+    if "pstats" in record:
+        stats = marshal.loads(record["pstats"])
+        ranked = sorted(stats.items(), key=lambda kv: kv[1][2], reverse=True)[:limit]
+        return [
+            {"function": _pstats_label(f), "calls": v[1], "self_ms": round(v[2] * 1000, 3), "total_ms": round(v[3] * 1000, 3)}
+            for f, v in ranked
+        ]
+    leaves: Counter = Counter()
+    for stack, count in record["collapsed"].items():
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    return [{"function": f, "samples": n} for f, n in leaves.most_common(limit)]
+
+
+PROFILER = Profiler()
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gera o cabecalho X-Profile assinado com ADMIN_TOKEN.")
+    parser.add_argument("path", help="Caminho da requisicao, ex.: /api/draw")
+    parser.add_argument("--ttl", type=int, default=300, help="Validade em segundos.")
+    args = parser.parse_args()
+    if not SECRET:
+        parser.error("Defina ADMIN_TOKEN.")
+    print(f"{HEADER}: {sign_header(args.path, args.ttl)}")
+
+
+if __name__ == "__main__":
+    main()
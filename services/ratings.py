@@ -0,0 +1,337 @@
+import argparse
+import base64
+import json
+import math
+import sqlite3
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Elo classico; todo mundo comeca em 1500.
+ELO_START = 1500.0
+ELO_K = 32.0
+# Glicko-1: desvio inicial/maximo e quanto ele volta a crescer por dia sem jogar
+# (de 50 para 350 em cerca de um ano).
+GLICKO_START = 1500.0
+RD_START = 350.0
+RD_MIN = 30.0
+RD_DAILY_C2 = (RD_START**2 - 50.0**2) / 365.0
+_Q = math.log(10) / 400
+
+LEADERBOARD_FIELDS = ("elo", "glicko")
+REBUILD_BATCH = 1000
+
+# (id, played_at, nome_a, nome_b, pontos_de_a)
+Event = Tuple[int, int, str, str, float]
+
+
+def player_key(name: str) -> str:
+    """Chave do jogador entre salas: sem acento, minusculas, espacos normalizados."""
+    text = unicodedata.normalize("NFKD", str(name or ""))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(text.casefold().split())
+
+
+class PlayerState:
+    __slots__ = ("key", "name", "elo", "glicko", "rd", "games", "wins", "draws", "losses", "last_played", "dirty")
+
+    def __init__(self, key: str, name: str):
+        self.key = key
+        self.name = name
+        self.elo = ELO_START
+        self.glicko = GLICKO_START
+        self.rd = RD_START
+        self.games = self.wins = self.draws = self.losses = 0
+        self.last_played = 0
+        self.dirty = False
+
+    @classmethod
+    def from_row(cls, row: Sequence[Any]) -> "PlayerState":
+        # (player, name, elo, glicko, rd, games, wins, draws, losses[, last_played])
+        state = cls(row[0], row[1])
+        state.elo, state.glicko, state.rd, state.games, state.wins, state.draws, state.losses = row[2:9]
+        if len(row) > 9:
+            state.last_played = row[9]
+        return state
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "player": self.key,
+            "name": self.name,
+            "elo": round(self.elo, 1),
+            "glicko": round(self.glicko, 1),
+            "rd": round(self.rd, 1),
+            "games": self.games,
+            "wins": self.wins,
+            "draws": self.draws,
+            "losses": self.losses,
+        }
+
+
+def _g(rd: float) -> float:
+    return 1 / math.sqrt(1 + 3 * (_Q * rd) ** 2 / math.pi**2)
+
+
+def _current_rd(state: PlayerState, played_at: int) -> float:
+    if not state.games or played_at <= state.last_played:
+        return state.rd
+    days = (played_at - state.last_played) / 86400
+    return min(RD_START, math.sqrt(state.rd**2 + RD_DAILY_C2 * days))
+
+
+def _glicko(r: float, rd: float, r_opp: float, rd_opp: float, score: float) -> Tuple[float, float]:
+    g = _g(rd_opp)
+    expected = 1 / (1 + 10 ** (-g * (r - r_opp) / 400))
+    d2 = 1 / (_Q**2 * g**2 * expected * (1 - expected))
+    denom = 1 / rd**2 + 1 / d2
+    return r + _Q / denom * g * (score - expected), max(RD_MIN, math.sqrt(1 / denom))
+
+
+def apply_match(a: PlayerState, b: PlayerState, score_a: float, played_at: int) -> Tuple[float, float]:
+    """Atualiza os dois jogadores com um resultado (1, 0.5, 0 para `a`). O(1). Retorna os deltas de Elo."""
+    expected_a = 1 / (1 + 10 ** ((b.elo - a.elo) / 400))
+    delta_a = ELO_K * (score_a - expected_a)
+    rd_a, rd_b = _current_rd(a, played_at), _current_rd(b, played_at)
+    ga, rda = _glicko(a.glicko, rd_a, b.glicko, rd_b, score_a)
+    gb, rdb = _glicko(b.glicko, rd_b, a.glicko, rd_a, 1 - score_a)
+    a.elo += delta_a
+    b.elo -= delta_a
+    a.glicko, a.rd, b.glicko, b.rd = ga, rda, gb, rdb
+    for state, score in ((a, score_a), (b, 1 - score_a)):
+        state.games += 1
+        if score == 1:
+            state.wins += 1
+        elif score == 0:
+            state.losses += 1
+        else:
+            state.draws += 1
+        state.last_played = max(state.last_played, played_at)
+        state.dirty = True
+    return delta_a, -delta_a
+
+
+def parse_result(raw: Dict[str, Any]) -> Tuple[str, str, float, Optional[str]]:
+    """`{a, b, score: [gols_a, gols_b]}` ou `{a, b, result: 1|0.5|0}`; `ref` opcional evita duplicar o jogo."""
+    if not isinstance(raw, dict):
+        raise ValueError("Cada resultado deve ser um objeto {a, b, score}.")
+    a, b = str(raw.get("a") or "").strip(), str(raw.get("b") or "").strip()
+    if not player_key(a) or not player_key(b):
+        raise ValueError("Informe os dois jogadores.")
+    if player_key(a) == player_key(b):
+        raise ValueError("Um jogador nao pode enfrentar ele mesmo.")
+    score = raw.get("score")
+    if isinstance(score, list) and len(score) == 2:
+        try:
+            goals_a, goals_b = float(score[0]), float(score[1])
+        except (TypeError, ValueError):
+            raise ValueError("Placar invalido.")
+        result = 1.0 if goals_a > goals_b else 0.0 if goals_a < goals_b else 0.5
+    elif raw.get("result") in (0, 0.5, 1):
+        result = float(raw["result"])
+    else:
+        raise ValueError("Informe score [a, b] ou result 1, 0.5 ou 0.")
+    ref = raw.get("ref")
+    return a, b, result, (str(ref)[:120] if ref else None)
+
+
+def _load_states(con: sqlite3.Connection, keys: Iterable[str], states: Dict[str, PlayerState]) -> None:
+    missing = [k for k in set(keys) if k not in states]
+    for i in range(0, len(missing), 500):
+        chunk = missing[i : i + 500]
+        cur = con.execute(
+            "SELECT player, name, elo, glicko, rd, games, wins, draws, losses, last_played FROM player_ratings"
+            f" WHERE player IN ({','.join('?' * len(chunk))})",
+            chunk,
+        )
+        for row in cur:
+            states[row[0]] = PlayerState.from_row(row)
+
+
+def _apply_events(con: sqlite3.Connection, events: Sequence[Event], states: Dict[str, PlayerState]) -> None:
+    """Aplica os eventos em ordem e grava historico + estado dos jogadores tocados."""
+    _load_states(con, [player_key(e[2]) for e in events] + [player_key(e[3]) for e in events], states)
+    history = []
+    for event_id, played_at, name_a, name_b, score_a in events:
+        key_a, key_b = player_key(name_a), player_key(name_b)
+        a = states.get(key_a) or states.setdefault(key_a, PlayerState(key_a, name_a))
+        b = states.get(key_b) or states.setdefault(key_b, PlayerState(key_b, name_b))
+        a.name, b.name = name_a, name_b
+        delta_a, delta_b = apply_match(a, b, score_a, played_at)
+        history.append((key_a, event_id, name_b, score_a, a.elo, delta_a, a.glicko, a.rd))
+        history.append((key_b, event_id, name_a, 1 - score_a, b.elo, delta_b, b.glicko, b.rd))
+    con.executemany(
+        "INSERT OR REPLACE INTO rating_history (player, event_id, opponent, score, elo, elo_delta, glicko, rd)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        history,
+    )
+    dirty = [s for s in states.values() if s.dirty]
+    con.executemany(
+        "INSERT OR REPLACE INTO player_ratings"
+        " (player, name, elo, glicko, rd, games, wins, draws, losses, last_played)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (s.key, s.name, s.elo, s.glicko, s.rd, s.games, s.wins, s.draws, s.losses, s.last_played)
+            for s in dirty
+        ],
+    )
+    for s in dirty:
+        s.dirty = False
+
+
+def record_results(
+    con: sqlite3.Connection, results: Sequence[Tuple[str, str, float, Optional[str]]], source: str
+) -> Dict[str, Any]:
+    """
+    Grava os resultados no log de eventos e atualiza os ratings na mesma
+    transacao (`con` em autocommit). Jogos com `ref` ja registrado para a mesma
+    origem sao ignorados: reenviar o placar de uma partida nao conta duas vezes.
+    """
+    now = int(time.time())
+    created = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(now))
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        events: List[Event] = []
+        duplicates = 0
+        for name_a, name_b, score_a, ref in results:
+            cur = con.execute(
+                "INSERT OR IGNORE INTO rating_events (created_at, played_at, source, ref, player_a, player_b, score_a)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (created, now, source, ref, name_a, name_b, score_a),
+            )
+            if cur.rowcount:
+                events.append((cur.lastrowid, now, name_a, name_b, score_a))
+            else:
+                duplicates += 1
+        states: Dict[str, PlayerState] = {}
+        if events:
+            _apply_events(con, events, states)
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    touched = {player_key(n) for e in events for n in (e[2], e[3])}
+    return {
+        "recorded": len(events),
+        "duplicates": duplicates,
+        "players": [states[k].to_dict() for k in sorted(touched)],
+    }
+
+
+def rebuild(con: sqlite3.Connection, batch: int = REBUILD_BATCH) -> Dict[str, int]:
+    """
+    Recalcula todos os ratings a partir do log de eventos. Le o log em blocos
+    pela chave (id > ultimo) e so mantem em memoria os jogadores do bloco atual:
+    o resto fica na tabela, entao a memoria nao cresce com o tamanho do log.
+    """
+    con.execute("BEGIN IMMEDIATE")
+    try:
+        con.execute("DELETE FROM player_ratings")
+        con.execute("DELETE FROM rating_history")
+        last, total = 0, 0
+        while True:
+            events = con.execute(
+                "SELECT id, played_at, player_a, player_b, score_a FROM rating_events WHERE id > ? ORDER BY id LIMIT ?",
+                (last, batch),
+            ).fetchall()
+            if not events:
+                break
+            _apply_events(con, events, {})
+            last = events[-1][0]
+            total += len(events)
+        players = con.execute("SELECT COUNT(*) FROM player_ratings").fetchone()[0]
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    return {"events": total, "players": players}
+
+
+def _encode(values: List[Any]) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode(cursor: str, size: int) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Cursor invalido.")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Cursor invalido.")
+    return values
+
+
+def leaderboard(con: sqlite3.Connection, by: str = "elo", cursor: str = "", limit: int = 50) -> Dict[str, Any]:
+    """Ranking por `by` (desc, empate pela chave) com paginacao por chave: cada pagina e uma busca no indice."""
+    if by not in LEADERBOARD_FIELDS:
+        raise ValueError(f"by deve ser {' ou '.join(LEADERBOARD_FIELDS)}.")
+    sql = "SELECT player, name, elo, glicko, rd, games, wins, draws, losses FROM player_ratings"
+    params: List[Any] = []
+    if cursor:
+        tag, value, player = _decode(cursor, 3)
+        if tag != by or not isinstance(value, (int, float)) or not isinstance(player, str):
+            raise ValueError("Cursor invalido.")
+        sql += f" WHERE {by} < ? OR ({by} = ? AND player > ?)"
+        params += [value, value, player]
+    sql += f" ORDER BY {by} DESC, player LIMIT ?"
+    rows = con.execute(sql, params + [limit + 1]).fetchall()
+    out = [PlayerState.from_row(row).to_dict() for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = _encode([by, last[2] if by == "elo" else last[3], last[0]])
+    return {"by": by, "rows": out, "next_cursor": next_cursor}
+
+
+def player_history(con: sqlite3.Connection, name: str, cursor: str = "", limit: int = 50) -> Optional[Dict[str, Any]]:
+    """Jogador e seus jogos do mais recente para o mais antigo, paginados pelo id do evento."""
+    key = player_key(name)
+    row = con.execute(
+        "SELECT player, name, elo, glicko, rd, games, wins, draws, losses FROM player_ratings WHERE player = ?", (key,)
+    ).fetchone()
+    if not row:
+        return None
+    state = PlayerState.from_row(row)
+    before = _decode(cursor, 1)[0] if cursor else None
+    if before is not None and not isinstance(before, int):
+        raise ValueError("Cursor invalido.")
+    cur = con.execute(
+        "SELECT h.event_id, e.created_at, e.source, h.opponent, h.score, h.elo, h.elo_delta, h.glicko, h.rd"
+        " FROM rating_history h JOIN rating_events e ON e.id = h.event_id"
+        " WHERE h.player = ? AND h.event_id < ? ORDER BY h.event_id DESC LIMIT ?",
+        (key, before if before is not None else 2**63 - 1, limit + 1),
+    )
+    games = [
+        {
+            "event": r[0],
+            "created_at": r[1],
+            "source": r[2],
+            "opponent": r[3],
+            "score": r[4],
+            "elo": round(r[5], 1),
+            "elo_delta": round(r[6], 1),
+            "glicko": round(r[7], 1),
+            "rd": round(r[8], 1),
+        }
+        for r in cur.fetchall()
+    ]
+    next_cursor = _encode([games[limit - 1]["event"]]) if len(games) > limit else None
+    return {"player": state.to_dict(), "history": games[:limit], "next_cursor": next_cursor}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recalcula os ratings dos jogadores a partir do log de eventos.")
+    parser.add_argument("--db", default="data/history.sqlite3")
+    parser.add_argument("--batch", type=int, default=REBUILD_BATCH)
+    args = parser.parse_args()
+    con = sqlite3.connect(args.db, isolation_level=None)
+    try:
+        started = time.monotonic()
+        out = rebuild(con, max(1, args.batch))
+        print(f"{out['events']} eventos, {out['players']} jogadores em {time.monotonic() - started:.2f}s")
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Tuple
+
+# Colunas com poucos valores distintos ("CLUB", "MEN", "NATIONAL TEAMS"...): uma unica string por valor.
+CATEGORICAL_FIELDS = (
+    "team_type",
+    "gender",
+    "competition",
+    "country",
+    "league",
+    "conference",
+    "division",
+    "category",
+    "city",
+)
+
+
+class RecordSchema:
+    """Ordem das colunas compartilhada por todas as linhas de um CSV."""
+
+    __slots__ = ("fields", "index", "categorical")
+
+    def __init__(self, fields: Tuple[str, ...]):
+        self.fields = fields
+        self.index = {f: i for i, f in enumerate(fields)}
+        self.categorical = tuple(self.index[f] for f in CATEGORICAL_FIELDS if f in self.index)
+
+    def __reduce__(self):
+        return schema_for, (self.fields,)
+
+    def record(self, row: Dict[str, Any]) -> "TeamRecord":
+        values = [row.get(f) for f in self.fields]
+        for i in self.categorical:
+            if isinstance(values[i], str):
+                values[i] = sys.intern(values[i])
+        return TeamRecord(self, tuple(values))
+
+
+_SCHEMAS: Dict[Tuple[str, ...], RecordSchema] = {}
+
+
+def schema_for(fields: Tuple[str, ...]) -> RecordSchema:
+    schema = _SCHEMAS.get(fields)
+    if schema is None:
+        schema = _SCHEMAS.setdefault(fields, RecordSchema(fields))
+    return schema
+
+
+class TeamRecord(Mapping):
+    """
+    Linha de time imutavel: uma tupla de valores + o schema do CSV. Se comporta
+    como dict para leitura (get, [], items, **), o que basta para filtros,
+    sorteio e exportacao.
+    """
+
+    __slots__ = ("_schema", "_values")
+
+    def __init__(self, schema: RecordSchema, values: Tuple[Any, ...]):
+        self._schema = schema
+        self._values = values
+
+    def __reduce__(self):
+        return TeamRecord, (self._schema, self._values)
+
+    def __getitem__(self, key: str) -> Any:
+        i = self._schema.index.get(key)
+        if i is None:
+            raise KeyError(key)
+        return self._values[i]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        i = self._schema.index.get(key)
+        return default if i is None else self._values[i]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._schema.index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._schema.fields)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __repr__(self) -> str:
+        return f"TeamRecord({self.to_dict()!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(zip(self._schema.fields, self._values))
+
+
+def make_record(row: Dict[str, Any]) -> TeamRecord:
+    return schema_for(tuple(row)).record(row)
@@ -0,0 +1,55 @@
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from services.datasets import on_dataset_change
+
+
+class ResponseCache:
+    """
+    Respostas JSON de leitura ja serializadas, por (endpoint, dataset) e versao do
+    dataset. O ETag e o sha1 do corpo, entao dois processos com o mesmo CSV
+    respondem o mesmo ETag.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str], Tuple[str, bytes, str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name: str, dataset: str, version: str, build: Callable[[], Any]) -> Tuple[bytes, str]:
+        key = (name, dataset)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1], entry[2]
+
+        self.misses += 1
+        body = json.dumps(build(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        etag = hashlib.sha1(body).hexdigest()
+        with self._lock:
+            self._entries[key] = (version, body, etag)
+        return body, etag
+
+    def drop_dataset(self, dataset: Optional[str] = None) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if dataset is None or k[1] == dataset]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": sum(len(e[1]) for e in self._entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+RESPONSES = ResponseCache()
+
+
+@on_dataset_change
+def _drop_stale(dataset: str, changelog: Optional[Dict[str, Any]]) -> None:
+    RESPONSES.drop_dataset(dataset)
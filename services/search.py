@@ -0,0 +1,184 @@
+import heapq
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from services.datasets import load_versioned, on_dataset_change
+from services.draws import filter_indices
+from services.pools import preset_indices
+
+# Trigramas presentes em mais que esta fracao dos times so reforcam a nota de
+# quem ja e candidato (nao abrem candidatos): "  f", "fc " etc. nao custam uma varredura.
+COMMON_GRAM_SHARE = 0.05
+# Depois de juntar este tanto de candidatos, os trigramas seguintes (mais frequentes) so pontuam.
+MAX_CANDIDATES = 2000
+MAX_LIMIT = 50
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(text: str) -> str:
+    """Sem acento, minusculas, so letras/digitos separados por um espaco."""
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(c for c in text if not unicodedata.combining(c)).casefold()
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def trigrams(text: str, partial_last: bool = False) -> FrozenSet[str]:
+    """
+    Trigramas por palavra com dois espacos antes e um depois ("  ab", " abc"...),
+    como no pg_trgm: inicio de palavra vira trigrama proprio e busca por prefixo
+    funciona. `partial_last` tira o espaco final da ultima palavra (texto ainda sendo digitado).
+    """
+    words = text.split()
+    out = set()
+    for k, word in enumerate(words):
+        padded = "  " + word + ("" if partial_last and k == len(words) - 1 else " ")
+        out.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return frozenset(out)
+
+
+def _prefix_share(query: str, name: str) -> float:
+    """Letras da busca que casam com o inicio de alguma palavra do nome, em fracao (0 a 1)."""
+    words = name.split()
+    matched = total = 0
+    for q in query.split():
+        total += len(q)
+        best = 0
+        for w in words:
+            n = 0
+            for a, b in zip(q, w):
+                if a != b:
+                    break
+                n += 1
+            best = max(best, n)
+        matched += best
+    return matched / total if total else 0.0
+
+
+class TrigramIndex:
+    """Indice invertido trigrama -> ids (crescentes) sobre o `team_name` normalizado."""
+
+    __slots__ = ("names", "grams", "postings", "common")
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.names = [normalize(r.get("team_name") or "") for r in rows]
+        self.grams = [trigrams(n) for n in self.names]
+        postings: Dict[str, List[int]] = {}
+        for i, grams in enumerate(self.grams):
+            for g in grams:
+                postings.setdefault(g, []).append(i)
+        self.postings = {g: array("I", ids) for g, ids in postings.items()}
+        self.common = max(8, int(len(rows) * COMMON_GRAM_SHARE))
+
+    def score(self, i: int, query: str, qgrams: FrozenSet[str], hits: int) -> float:
+        # Inicio de palavra pesa mais que o Jaccard dos trigramas (senao nome curto
+        # ganha: "barca" dava Bari antes de FC Barcelona); prefixo inteiro ganha bonus.
+        name = self.names[i]
+        jaccard = hits / (len(qgrams) + len(self.grams[i]) - hits)
+        score = 0.5 * jaccard + 1.5 * _prefix_share(query, name)
+        if name.startswith(query):
+            score += 1.0
+        elif (" " + name).find(" " + query) >= 0:
+            score += 0.5
+        return score
+
+    def search(
+        self, query: str, limit: int = 10, keep: Optional[Callable[[Sequence[int]], Sequence[int]]] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        (id, nota) dos `limit` melhores. Os trigramas vao do mais raro ao mais
+        frequente: os raros geram candidatos e, quando eles ja passam de
+        MAX_CANDIDATES (ou o trigrama e comum), os demais so contam para quem ja
+        apareceu (teste no conjunto do time). O mais raro sempre gera candidatos.
+        `keep` recebe os candidatos (crescentes) e devolve os que passam nos filtros.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+        qgrams = trigrams(query, partial_last=True)
+        found = sorted((g for g in qgrams if g in self.postings), key=lambda g: len(self.postings[g]))
+        if not found:
+            return []
+        counts: Dict[int, int] = {}
+        rest: List[str] = []
+        for g in found:
+            posting = self.postings[g]
+            if counts and (len(counts) >= MAX_CANDIDATES or len(posting) > self.common):
+                rest.append(g)
+                continue
+            for i in posting:
+                counts[i] = counts.get(i, 0) + 1
+        if rest:
+            for i in counts:
+                grams = self.grams[i]
+                counts[i] += sum(1 for g in rest if g in grams)
+        candidates = counts.keys() if keep is None else keep(sorted(counts))
+        scored = ((i, self.score(i, query, qgrams, counts[i])) for i in candidates)
+        return heapq.nlargest(limit, scored, key=lambda x: x[1])
+
+
+_INDEX: Dict[str, Tuple[str, TrigramIndex]] = {}
+
+
+def team_index(dataset: str, version: str, rows: List[Dict[str, Any]]) -> TrigramIndex:
+    """Indice do dataset, montado uma vez por versao."""
+    cached = _INDEX.get(dataset)
+    if cached is None or cached[0] != version:
+        cached = (version, TrigramIndex(rows))
+        _INDEX[dataset] = cached
+    return cached[1]
+
+
+def indexes() -> Dict[str, TrigramIndex]:
+    return {dataset: index for dataset, (_version, index) in _INDEX.items()}
+
+
+def _contains(sorted_ids: Sequence[int], i: int) -> bool:
+    k = bisect_left(sorted_ids, i)
+    return k < len(sorted_ids) and sorted_ids[k] == i
+
+
+@on_dataset_change
+def _drop_stale(dataset: str, changelog: Optional[Dict[str, Any]]) -> None:
+    _INDEX.pop(dataset, None)
+
+
+def search_teams(
+    dataset: str, query: str, filters: Optional[Dict[str, Any]] = None, preset: str = "", limit: int = 10
+) -> Dict[str, Any]:
+    """
+    Autocomplete de times. Preset e facetas sao aplicados so aos candidatos da
+    busca (sem resolver o pool inteiro); top_n nao se aplica aqui.
+    """
+    version, rows = load_versioned(dataset)
+    index = team_index(dataset, version, rows)
+    members = preset_indices(dataset, version, rows, preset) if preset else None
+    facets = dict(filters or {}, mode="all")
+
+    def keep(ids: Sequence[int]) -> List[int]:
+        if members is not None:
+            ids = [i for i in ids if _contains(members, i)]
+        return filter_indices(rows, facets, ids)
+
+    hits = index.search(query, max(1, min(limit, MAX_LIMIT)), keep)
+    return {
+        "dataset": dataset,
+        "version": version,
+        "q": query,
+        "results": [
+            {
+                "team_id": rows[i].get("team_id"),
+                "team_name": rows[i].get("team_name"),
+                "overall": rows[i].get("overall"),
+                "team_type": rows[i].get("team_type"),
+                "gender": rows[i].get("gender"),
+                "competition": rows[i].get("competition"),
+                "country": rows[i].get("country"),
+                "score": round(score, 3),
+            }
+            for i, score in hits
+        ],
+    }
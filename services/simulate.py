@@ -0,0 +1,342 @@
+import hashlib
+import math
+import random
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from services.bracket import BYE, seed_order, seed_positions
+from services.datasets import dataset_meta
+from services.draws import round_robin_rounds
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - o app roda sem numpy, so com menos iteracoes
+    np = None
+
+# Futebol: gols ~ Poisson(BASE_GOALS * exp(GOAL_K * (ataque - defesa))).
+BASE_GOALS = 1.35
+GOAL_K = 0.045
+# Basquete: pontos ~ Normal(posses * pontos por posse, POINTS_SD).
+POSSESSIONS = 100
+BASE_PPP = 1.10
+PPP_K = 0.01
+POINTS_SD = 11.0
+
+CHUNK = 2000
+# Teto de celulas (simulacoes x partidas) por bloco vetorizado, para limitar memoria.
+CHUNK_CELLS = 2_000_000
+MAX_ITERATIONS = 100_000
+MAX_PARTICIPANTS = 256
+# Gols alem disso tem probabilidade desprezivel nas taxas do modelo.
+MAX_GOALS = 16
+
+
+def _strength(row: Dict[str, Any]) -> Tuple[float, float]:
+    def num(field: str) -> float:
+        try:
+            return float(row.get(field) or 0)
+        except (TypeError, ValueError):
+            return 0.0
+
+    mid = num("midfield") / 2
+    return num("attack") + mid, num("defence") + mid
+
+
+def seed_int(seed: Optional[str]) -> Optional[int]:
+    # Seeds de texto (como no /api/draw) viram inteiro estavel para numpy e random.
+    if not seed:
+        return None
+    return int.from_bytes(hashlib.sha1(str(seed).encode("utf-8")).digest()[:8], "big")
+
+
+def sport_for(dataset: str) -> str:
+    meta = dataset_meta(dataset) or {}
+    return "basketball" if meta.get("sport") == "basketball" else "football"
+
+
+class Model:
+    """Taxas de pontuacao por confronto derivadas dos ratings (ataque x defesa)."""
+
+    def __init__(self, rows: Sequence[Dict[str, Any]], sport: str = "football"):
+        self.sport = sport
+        strengths = [_strength(r) for r in rows]
+        self.attack = [a for a, _ in strengths]
+        self.defence = [d for _, d in strengths]
+
+    def rate(self, a: int, b: int) -> float:
+        """Gols esperados (futebol) ou pontos esperados (basquete) de `a` contra `b`."""
+        diff = (self.attack[a] - self.defence[b]) / 1.5
+        if self.sport == "basketball":
+            return POSSESSIONS * BASE_PPP * math.exp(PPP_K * diff)
+        return BASE_GOALS * math.exp(GOAL_K * diff)
+
+    def rates(self, home: Sequence[int], away: Sequence[int]) -> Tuple[List[float], List[float]]:
+        return [self.rate(a, b) for a, b in zip(home, away)], [self.rate(b, a) for a, b in zip(home, away)]
+
+
+def _deadline(time_budget: float) -> float:
+    return time.monotonic() + max(0.01, time_budget)
+
+
+def _poisson(rng: random.Random, lam: float) -> int:
+    # Knuth: suficiente para taxas de gols (< 5).
+    limit, k, p = math.exp(-lam), 0, rng.random()
+    while p > limit:
+        k += 1
+        p *= rng.random()
+    return k
+
+
+def _score_py(model: Model, rng: random.Random, lam_h: float, lam_a: float) -> Tuple[float, float]:
+    if model.sport == "basketball":
+        return rng.gauss(lam_h, POINTS_SD), rng.gauss(lam_a, POINTS_SD)
+    return float(_poisson(rng, lam_h)), float(_poisson(rng, lam_a))
+
+
+def _fixtures(players: int, double: bool) -> Tuple[List[int], List[int]]:
+    home: List[int] = []
+    away: List[int] = []
+    for pairs in round_robin_rounds(players, double):
+        for a, b in pairs:
+            home.append(a)
+            away.append(b)
+    return home, away
+
+
+def _by_team(values: "np.ndarray", teams: "np.ndarray", n: int) -> "np.ndarray":
+    """Soma por time de uma matriz (simulacoes x partidas): (simulacoes x n), sem matriz de incidencia."""
+    size = values.shape[0]
+    idx = (np.arange(size)[:, None] * n + teams).ravel()
+    return np.bincount(idx, weights=values.ravel(), minlength=size * n).reshape(size, n)
+
+
+def _summary(
+    players: int, iterations: int, positions: List[List[int]], playoff_spots: int, engine: str, elapsed: float
+) -> Dict[str, Any]:
+    table = []
+    for i in range(players):
+        dist = [c / iterations for c in positions[i]] if iterations else [0.0] * players
+        table.append(
+            {
+                "index": i,
+                "title": dist[0],
+                "playoff": sum(dist[:playoff_spots]),
+                "expected_position": sum((p + 1) * v for p, v in enumerate(dist)),
+                "positions": dist,
+            }
+        )
+    return {"iterations": iterations, "engine": engine, "elapsed_ms": round(elapsed * 1000, 1), "teams": table}
+
+
+def simulate_season(
+    rows: Sequence[Dict[str, Any]],
+    iterations: int = 10_000,
+    double: bool = False,
+    playoff_spots: int = 4,
+    sport: str = "football",
+    seed: Optional[int] = None,
+    time_budget: float = 1.0,
+) -> Dict[str, Any]:
+    """
+    Monte Carlo de temporadas de pontos corridos (3/1/0 no futebol; vitoria no
+    basquete) com desempate por saldo e depois sorteio. Roda em blocos ate
+    `iterations` ou ate estourar `time_budget`; o total rodado vem na resposta.
+    """
+    n = len(rows)
+    if n < 2:
+        raise ValueError("Informe ao menos 2 participantes.")
+    started = time.monotonic()
+    deadline = _deadline(time_budget)
+    iterations = max(1, min(iterations, MAX_ITERATIONS))
+    model = Model(rows, sport)
+    home, away = _fixtures(n, double)
+    lam_h, lam_a = model.rates(home, away)
+    positions = [[0] * n for _ in range(n)]
+    done = 0
+
+    if np is not None:
+        rng = np.random.default_rng(seed)
+        m = len(home)
+        home_v = np.asarray(home)
+        away_v = np.asarray(away)
+        lam_h_v = np.asarray(lam_h)
+        lam_a_v = np.asarray(lam_a)
+        counts = np.zeros((n, n), dtype=np.int64)
+        chunk = max(1, min(CHUNK, CHUNK_CELLS // max(1, m)))
+        while done < iterations and (done == 0 or time.monotonic() < deadline):
+            size = min(chunk, iterations - done)
+            if sport == "basketball":
+                sh = rng.normal(lam_h_v, POINTS_SD, (size, m))
+                sa = rng.normal(lam_a_v, POINTS_SD, (size, m))
+                pts_h = (sh > sa).astype(float)
+                pts_a = 1.0 - pts_h
+            else:
+                sh = rng.poisson(lam_h_v, (size, m)).astype(float)
+                sa = rng.poisson(lam_a_v, (size, m)).astype(float)
+                pts_h = np.where(sh > sa, 3.0, np.where(sh == sa, 1.0, 0.0))
+                pts_a = np.where(sa > sh, 3.0, np.where(sh == sa, 1.0, 0.0))
+            points = _by_team(pts_h, home_v, n) + _by_team(pts_a, away_v, n)
+            diff = _by_team(sh - sa, home_v, n) + _by_team(sa - sh, away_v, n)
+            key = points * 1e6 + diff * 10 + rng.random((size, n))
+            ranked = np.argsort(-key, axis=1)
+            # counts[time, posicao] num bincount so: indice time * n + posicao.
+            counts += np.bincount((ranked * n + np.arange(n)).ravel(), minlength=n * n).reshape(n, n)
+            done += size
+        positions = counts.tolist()
+        engine = "numpy"
+    else:
+        rng_py = random.Random(seed)
+        while done < iterations and (done == 0 or time.monotonic() < deadline):
+            points = [0.0] * n
+            diff = [0.0] * n
+            for a, b, lh, la in zip(home, away, lam_h, lam_a):
+                sh, sa = _score_py(model, rng_py, lh, la)
+                if sport == "basketball":
+                    win = 1.0 if sh > sa else 0.0
+                    points[a] += win
+                    points[b] += 1.0 - win
+                else:
+                    points[a] += 3.0 if sh > sa else 1.0 if sh == sa else 0.0
+                    points[b] += 3.0 if sa > sh else 1.0 if sh == sa else 0.0
+                diff[a] += sh - sa
+                diff[b] += sa - sh
+            ranked = sorted(range(n), key=lambda i: (-points[i], -diff[i], rng_py.random()))
+            for p, i in enumerate(ranked):
+                positions[i][p] += 1
+            done += 1
+        engine = "python"
+
+    return _summary(n, done, positions, min(max(1, playoff_spots), n), engine, time.monotonic() - started)
+
+
+def _win_matrix(model: Model, n: int) -> List[List[float]]:
+    """P(i elimina j) num jogo unico; empate no futebol vai para os penaltis (50%)."""
+    if np is not None:
+        attack = np.asarray(model.attack, dtype=float)
+        defence = np.asarray(model.defence, dtype=float)
+        diff = (attack[:, None] - defence[None, :]) / 1.5
+        if model.sport == "basketball":
+            li = POSSESSIONS * BASE_PPP * np.exp(PPP_K * diff)
+            z = (li - li.T) / (POINTS_SD * 2)
+            out = 0.5 * (1 + np.vectorize(math.erf)(z))
+        else:
+            li = BASE_GOALS * np.exp(GOAL_K * diff)
+            # pmf[k][i][j] = P(i marca k gols contra j), pela recorrencia p(k) = p(k-1) * l / k.
+            pmf = np.empty((MAX_GOALS, n, n))
+            pmf[0] = np.exp(-li)
+            for k in range(1, MAX_GOALS):
+                pmf[k] = pmf[k - 1] * li / k
+            other = pmf.transpose(0, 2, 1)
+            below = np.cumsum(other, axis=0) - other
+            out = (pmf * below).sum(axis=0) + (pmf * other).sum(axis=0) / 2
+        np.fill_diagonal(out, 0.5)
+        return out.tolist()
+
+    def pmf(lam: float) -> List[float]:
+        p = [math.exp(-lam)]
+        for k in range(1, MAX_GOALS):
+            p.append(p[-1] * lam / k)
+        return p
+
+    out = [[0.5] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(n):
+            if i == j:
+                continue
+            li, lj = model.rate(i, j), model.rate(j, i)
+            if model.sport == "basketball":
+                out[i][j] = 0.5 * (1 + math.erf((li - lj) / (POINTS_SD * 2)))
+                continue
+            pi, pj = pmf(li), pmf(lj)
+            win = draw = below = 0.0
+            for a in range(MAX_GOALS):
+                win += pi[a] * below
+                draw += pi[a] * pj[a]
+                below += pj[a]
+            out[i][j] = win + draw / 2
+    return out
+
+
+def simulate_bracket(
+    rows: Sequence[Dict[str, Any]],
+    iterations: int = 10_000,
+    seeding: str = "overall",
+    sport: str = "football",
+    seed: Optional[int] = None,
+    time_budget: float = 1.0,
+) -> Dict[str, Any]:
+    """
+    Monte Carlo do mata-mata com o mesmo chaveamento de services.bracket.
+    `positions[k]` de cada time e a chance de cair na fase k (0 = campeao,
+    1 = vice, 2 = semifinal...).
+    """
+    n = len(rows)
+    if n < 2:
+        raise ValueError("Informe ao menos 2 participantes.")
+    started = time.monotonic()
+    deadline = _deadline(time_budget)
+    iterations = max(1, min(iterations, MAX_ITERATIONS))
+    model = Model(rows, sport)
+    win = _win_matrix(model, n)
+    order = seed_order([int(r.get("overall") or 0) for r in rows], seeding, None if seed is None else str(seed))
+    size = 1
+    while size < n:
+        size *= 2
+    leaves = [order[s - 1] if s <= n else BYE for s in seed_positions(size)]
+    depth = size.bit_length() - 1
+    # reached[i][r]: vezes em que i chegou a fase com 2^(depth-r) times.
+    reached = [[0] * (depth + 1) for _ in range(n)]
+    done = 0
+
+    if np is not None:
+        rng = np.random.default_rng(seed)
+        # Indice n = BYE: quem enfrenta a folga sempre passa.
+        pw = np.zeros((n + 1, n + 1))
+        pw[:n, :n] = win
+        pw[:n, n] = 1.0
+        counts = np.zeros((n + 1, depth + 1), dtype=np.int64)
+        base = np.asarray([n if v == BYE else v for v in leaves])
+        while done < iterations and (done == 0 or time.monotonic() < deadline):
+            chunk = min(CHUNK, iterations - done)
+            cur = np.broadcast_to(base, (chunk, size))
+            for r in range(depth):
+                a, b = cur[:, 0::2], cur[:, 1::2]
+                cur = np.where(rng.random(a.shape) < pw[a, b], a, b)
+                counts[:, r + 1] += np.bincount(cur.ravel(), minlength=n + 1)
+            done += chunk
+        counts[:, 0] = done
+        reached = counts[:n].tolist()
+        engine = "numpy"
+    else:
+        rng_py = random.Random(seed)
+        while done < iterations and (done == 0 or time.monotonic() < deadline):
+            cur = leaves
+            for r in range(depth):
+                nxt = []
+                for k in range(0, len(cur), 2):
+                    a, b = cur[k], cur[k + 1]
+                    if b == BYE or (a != BYE and rng_py.random() < win[a][b]):
+                        nxt.append(a)
+                    else:
+                        nxt.append(b)
+                cur = nxt
+                for i in cur:
+                    if i != BYE:
+                        reached[i][r + 1] += 1
+            done += 1
+        for i in range(n):
+            reached[i][0] = done
+        engine = "python"
+
+    # Da contagem "chegou a fase r" para "parou na fase": campeao, vice, semis...
+    table = []
+    for i in range(n):
+        share = [c / done for c in reached[i]]
+        stop = [share[depth]] + [share[r] - share[r + 1] for r in range(depth - 1, -1, -1)]
+        table.append({"index": i, "title": share[depth], "final": share[depth - 1] if depth else 1.0, "positions": stop})
+    return {
+        "iterations": done,
+        "engine": engine,
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+        "teams": table,
+    }
@@ -0,0 +1,172 @@
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+# Pontos de uma folga (bye); vitoria 1, empate 0.5, derrota 0.
+BYE_POINTS = 1.0
+# Limite de passos da busca com retrocesso antes de cair no emparelhamento com menos revanches.
+MAX_STEPS = 200_000
+
+Result = Tuple[int, Optional[int], Optional[float]]
+
+
+class Standings:
+    """Pontos, adversarios, folgas e Buchholz a partir das rodadas ja jogadas."""
+
+    __slots__ = ("players", "score", "opponents", "had_bye", "buchholz")
+
+    def __init__(self, players: int, rounds: Sequence[Sequence[Result]]):
+        self.players = players
+        self.score = [0.0] * players
+        self.opponents: List[Set[int]] = [set() for _ in range(players)]
+        self.had_bye = [False] * players
+        for games in rounds:
+            for a, b, result in games:
+                if b is None:
+                    self.had_bye[a] = True
+                    self.score[a] += BYE_POINTS
+                    continue
+                self.opponents[a].add(b)
+                self.opponents[b].add(a)
+                if result is not None:
+                    self.score[a] += result
+                    self.score[b] += 1 - result
+        # Buchholz: soma dos pontos dos adversarios (folga nao conta).
+        self.buchholz = [sum(self.score[o] for o in self.opponents[i]) for i in range(players)]
+
+    def ranking(self, ratings: Optional[Sequence[int]] = None) -> List[int]:
+        rating = ratings or [0] * self.players
+        return sorted(range(self.players), key=lambda i: (-self.score[i], -self.buchholz[i], -rating[i], i))
+
+    def table(self, ratings: Optional[Sequence[int]] = None) -> List[Dict[str, Any]]:
+        return [
+            {"index": i, "rank": pos, "score": self.score[i], "buchholz": self.buchholz[i]}
+            for pos, i in enumerate(self.ranking(ratings), start=1)
+        ]
+
+
+def _pick_bye(order: List[int], standings: Standings) -> int:
+    # Ultimo colocado que ainda nao folgou (se todos ja folgaram, o ultimo).
+    for i in reversed(order):
+        if not standings.had_bye[i]:
+            return i
+    return order[-1]
+
+
+def _pair(order: List[int], opponents: List[Set[int]], allow_rematch: bool) -> Optional[List[Tuple[int, int]]]:
+    """
+    Emparelha na ordem da classificacao: o primeiro livre pega o adversario
+    livre mais proximo (mesmo grupo de pontos antes de descer) que ainda nao
+    enfrentou. Com retrocesso quando o fim da lista fica sem par; a pilha
+    guarda, por nivel, o indice do candidato tentado.
+    """
+    n = len(order)
+    used = [False] * n
+    pairs: List[Tuple[int, int]] = []
+    stack: List[Tuple[int, int]] = []  # (posicao do primeiro, posicao do candidato)
+    steps = 0
+    first, start = 0, -1
+    while True:
+        while first < n and used[first]:
+            first += 1
+        if first >= n:
+            return pairs
+        if start < 0:
+            start = first + 1
+        chosen = -1
+        for j in range(start, n):
+            if not used[j] and (allow_rematch or order[j] not in opponents[order[first]]):
+                chosen = j
+                break
+        steps += 1
+        if chosen >= 0 and steps < MAX_STEPS:
+            used[first] = used[chosen] = True
+            pairs.append((order[first], order[chosen]))
+            stack.append((first, chosen))
+            first, start = first + 1, -1
+            continue
+        if not stack or steps >= MAX_STEPS:
+            return None
+        # Desfaz o ultimo par e tenta o proximo candidato para aquele jogador.
+        first, prev = stack.pop()
+        pairs.pop()
+        used[first] = used[prev] = False
+        start = prev + 1
+
+
+def _pair_fewest_rematches(order: List[int], opponents: List[Set[int]]) -> List[Tuple[int, int]]:
+    """
+    Saida quando a busca sem revanche esgota MAX_STEPS. Guloso na ordem da
+    classificacao (o adversario inedito mais proximo; revanche so sem outra
+    opcao) e depois troca de parceiros entre pares: cada revanche procura o
+    par mais proximo na tabela com quem a troca elimina revanches.
+    """
+    n = len(order)
+    used = [False] * n
+    pairs: List[List[int]] = []  # posicoes em `order`
+    for first in range(n):
+        if used[first]:
+            continue
+        free = [j for j in range(first + 1, n) if not used[j]]
+        chosen = next((j for j in free if order[j] not in opponents[order[first]]), free[0])
+        used[first] = used[chosen] = True
+        pairs.append([first, chosen])
+
+    def rematch(x: int, y: int) -> bool:
+        return order[y] in opponents[order[x]]
+
+    improved = True
+    while improved:
+        improved = False
+        for p, (a, b) in enumerate(pairs):
+            if not rematch(a, b):
+                continue
+            # Pares mais proximos na classificacao primeiro: mantem os grupos de pontos.
+            for q in sorted(range(len(pairs)), key=lambda q: abs(pairs[q][0] - a)):
+                if q == p:
+                    continue
+                c, d = pairs[q]
+                before = 1 + rematch(c, d)
+                for x, y in (((a, c), (b, d)), ((a, d), (b, c))):
+                    if rematch(*x) + rematch(*y) < before:
+                        pairs[p], pairs[q] = sorted(x), sorted(y)
+                        improved = True
+                        break
+                if improved:
+                    break
+            if improved:
+                break
+    pairs.sort()
+    return [(order[a], order[b]) for a, b in pairs]
+
+
+def pair_round(
+    players: int,
+    rounds: Sequence[Sequence[Result]],
+    ratings: Optional[Sequence[int]] = None,
+) -> Dict[str, Any]:
+    """
+    Proxima rodada do suico. `rounds` sao as rodadas anteriores como
+    (a, b, pontos_de_a) com b=None para folga. O primeiro de cada par manda o jogo.
+    """
+    if players < 2:
+        raise ValueError("Informe ao menos 2 jogadores.")
+    standings = Standings(players, rounds)
+    order = standings.ranking(ratings)
+
+    bye = None
+    if len(order) % 2 == 1:
+        bye = _pick_bye(order, standings)
+        order = [i for i in order if i != bye]
+
+    rematches = 0
+    pairs = _pair(order, standings.opponents, allow_rematch=False)
+    if pairs is None:
+        pairs = _pair_fewest_rematches(order, standings.opponents)
+        rematches = sum(1 for a, b in pairs if b in standings.opponents[a])
+
+    return {
+        "round": len(rounds) + 1,
+        "pairs": [list(p) for p in pairs],
+        "bye": bye,
+        "rematches": rematches,
+        "standings": standings.table(ratings),
+    }
@@ -0,0 +1,210 @@
+import csv
+import json
+import os
+import secrets
+import zipfile
+from typing import IO, Any, Dict, Iterator, List, Optional
+from xml.etree.ElementTree import ParseError
+
+from services.changelog import KEY_FIELDS, discard_changelog, row_key
+from services.datasets import DATA_DIR, USER_DIR
+from services.xlsx import iter_rows, read_shared_strings, sheet_paths
+
+DATASETS_JSON = os.path.join(DATA_DIR, "datasets.json")
+MAX_UPLOAD_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+MAX_UPLOAD_ROWS = 100_000
+MAX_ERRORS = 50
+CHUNK = 64 * 1024
+
+# Colunas do CSV gravado (mesmo layout dos datasets embutidos).
+OUTPUT_COLUMNS = [
+    "team_id",
+    "team_name",
+    "team_type",
+    "gender",
+    "overall",
+    "attack",
+    "midfield",
+    "defence",
+    "competition",
+    "country",
+    "conference",
+    "division",
+    "is_valid",
+]
+COLUMN_DEFAULTS = {"team_type": "CLUB", "gender": "MEN", "is_valid": "1"}
+# Faceta booleana no datasets.json -> coluna opcional que ela habilita.
+FACET_COLUMNS = {"competition": "competition", "country": "country", "conference": "conference", "division": "division"}
+# Faceta com lista de valores permitidos -> coluna validada contra a lista.
+ENUM_COLUMNS = {"team_types": "team_type", "genders": "gender"}
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def new_dataset_key() -> str:
+    return f"u_{secrets.token_hex(6)}"
+
+
+def upload_path(key: str) -> str:
+    return os.path.join(USER_DIR, f"{key}.upload")
+
+
+def save_stream(stream: IO[bytes], dest: str, limit: int = MAX_UPLOAD_BYTES) -> int:
+    """Copia o corpo da requisicao para disco em blocos, abortando ao passar de `limit` bytes."""
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    total = 0
+    try:
+        with open(dest, "wb") as f:
+            for chunk in iter(lambda: stream.read(CHUNK), b""):
+                total += len(chunk)
+                if total > limit:
+                    raise UploadTooLarge(limit)
+                f.write(chunk)
+    except BaseException:
+        if os.path.exists(dest):
+            os.remove(dest)
+        raise
+    return total
+
+
+def load_schema(template: str) -> Dict[str, Any]:
+    """Entrada do datasets.json usada como esquema do upload (campos de rating e facetas)."""
+    with open(DATASETS_JSON, "r", encoding="utf-8") as f:
+        entries = json.load(f).get("datasets") or []
+    for entry in entries:
+        if entry.get("key") == template:
+            return entry
+    raise ValueError(f"Modelo invalido. Use: {', '.join(e.get('key', '') for e in entries)}.")
+
+
+def _iter_csv(path: str) -> Iterator[List[str]]:
+    with open(path, "rb") as raw:
+        head = raw.read(4096)
+    # utf-8-sig tira o BOM do Excel; ';' e comum em CSV salvo em pt-BR.
+    lines = head.decode("utf-8", "ignore").splitlines()
+    first = lines[0] if lines else ""
+    delimiter = ";" if first.count(";") > first.count(",") else ","
+    with open(path, "r", encoding="utf-8-sig", errors="replace", newline="") as f:
+        yield from csv.reader(f, delimiter=delimiter)
+
+
+def _iter_xlsx(path: str) -> Iterator[List[str]]:
+    with zipfile.ZipFile(path, "r") as zf:
+        sheets = sheet_paths(zf)
+        if not sheets:
+            raise ValueError("Planilha sem abas.")
+        yield from iter_rows(zf, next(iter(sheets.values())), read_shared_strings(zf))
+
+
+def iter_upload_rows(path: str) -> Iterator[List[str]]:
+    """Linhas do arquivo (cabecalho primeiro), em streaming: XLSX pela assinatura zip, senao CSV."""
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if magic == b"PK\x03\x04":
+        return _iter_xlsx(path)
+    return _iter_csv(path)
+
+
+def _header_map(header: List[str], schema: Dict[str, Any]) -> Dict[str, int]:
+    """Coluna de saida -> indice na planilha. Nomes comparados sem caixa/espacos."""
+    names = {str(h or "").strip().lower(): i for i, h in enumerate(header)}
+    out: Dict[str, int] = {}
+    rating_fields = schema.get("rating_fields") or {}
+    for field in ("overall", "attack", "midfield", "defence"):
+        source = str(rating_fields.get(field) or field).lower()
+        if source not in names:
+            raise ValueError(f"Coluna obrigatoria ausente: {source}.")
+        out[field] = names[source]
+    if "team_name" not in names:
+        raise ValueError("Coluna obrigatoria ausente: team_name.")
+    filters = schema.get("filters") or {}
+    optional = ["team_id", "team_name", "is_valid"]
+    optional += [col for facet, col in ENUM_COLUMNS.items() if facet in filters]
+    optional += [col for facet, col in FACET_COLUMNS.items() if filters.get(facet)]
+    for col in optional:
+        if col in names:
+            out[col] = names[col]
+    return out
+
+
+def _rating(value: str) -> Optional[int]:
+    try:
+        number = int(float(value))
+    except (TypeError, ValueError):
+        return None
+    return number if 0 <= number <= 99 else None
+
+
+def convert_upload(src: str, dest_csv: str, template: str) -> Dict[str, Any]:
+    """
+    Le o upload linha a linha, valida contra o esquema do `template` e grava o
+    CSV normalizado em `dest_csv`. So as chaves (team_id/genero) ficam em
+    memoria, para achar duplicadas; as linhas vao direto para o disco.
+    Retorna o relatorio {rows, errors, warnings}; com erros o CSV nao e publicado.
+    """
+    schema = load_schema(template)
+    filters = schema.get("filters") or {}
+    enums = {col: set(filters[facet]) for facet, col in ENUM_COLUMNS.items() if facet in filters}
+    errors: List[str] = []
+    warnings: List[str] = []
+    rows = 0
+    tmp = f"{dest_csv}.tmp"
+    os.makedirs(os.path.dirname(dest_csv), exist_ok=True)
+    try:
+        reader = iter_upload_rows(src)
+        header = next(reader, None)
+        if not header:
+            raise ValueError("Arquivo vazio.")
+        columns = _header_map(header, schema)
+        seen: Dict[str, int] = {}
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=OUTPUT_COLUMNS)
+            writer.writeheader()
+            for line, raw in enumerate(reader, start=2):
+                if not any(str(v).strip() for v in raw):
+                    continue
+                rows += 1
+                if rows > MAX_UPLOAD_ROWS:
+                    errors.append(f"Mais de {MAX_UPLOAD_ROWS} linhas.")
+                    break
+                row = {c: "" for c in OUTPUT_COLUMNS}
+                for col, idx in columns.items():
+                    row[col] = str(raw[idx]).strip() if idx < len(raw) else ""
+                for col, default in COLUMN_DEFAULTS.items():
+                    row[col] = row[col] or default
+                row["team_type"], row["gender"] = row["team_type"].upper(), row["gender"].upper()
+                row["team_id"] = row["team_id"] or str(line - 1)
+                if not row["team_name"]:
+                    errors.append(f"Linha {line}: team_name vazio.")
+                for field in ("overall", "attack", "midfield", "defence"):
+                    value = _rating(row[field])
+                    if value is None:
+                        errors.append(f"Linha {line}: {field} deve ser inteiro de 0 a 99 ({row[field] or 'vazio'}).")
+                    row[field] = str(value or 0)
+                for col, allowed in enums.items():
+                    if row[col] not in allowed:
+                        errors.append(f"Linha {line}: {col} deve ser {' ou '.join(sorted(allowed))} ({row[col]}).")
+                key = row_key(row)
+                if key in seen:
+                    errors.append(f"Linha {line}: chave duplicada ({'/'.join(KEY_FIELDS)} = {key}), ja usada na linha {seen[key]}.")
+                seen[key] = line
+                if len(errors) >= MAX_ERRORS:
+                    warnings.append(f"Validacao interrompida apos {MAX_ERRORS} erros.")
+                    break
+                writer.writerow(row)
+        if not rows and not errors:
+            errors.append("Nenhum time no arquivo.")
+    except (ValueError, KeyError, zipfile.BadZipFile, ParseError) as e:
+        errors.append(str(e) or "Arquivo invalido.")
+    except csv.Error as e:
+        # Ex.: byte NUL no meio do arquivo.
+        errors.append(f"CSV invalido: {e}.")
+    if errors:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    else:
+        discard_changelog(dest_csv)
+        os.replace(tmp, dest_csv)
+    return {"rows": rows, "errors": errors, "warnings": warnings}
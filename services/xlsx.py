@@ -0,0 +1,154 @@
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterator, List, Optional
+
+NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+_ROW = f"{{{NS_MAIN}}}row"
+_CELL = f"{{{NS_MAIN}}}c"
+_VALUE = f"{{{NS_MAIN}}}v"
+_TEXT = f"{{{NS_MAIN}}}t"
+_INLINE = f"{{{NS_MAIN}}}is"
+_SHEET_DATA = f"{{{NS_MAIN}}}sheetData"
+_SI = f"{{{NS_MAIN}}}si"
+_PHONETIC = f"{{{NS_MAIN}}}rPh"
+_SHEET = f"{{{NS_MAIN}}}sheet"
+_REL_ID = f"{{{NS_REL}}}id"
+_RELATIONSHIP = f"{{{NS_PKG_REL}}}Relationship"
+
+
+def _ref_to_idx(ref: str) -> int:
+    # "AB12" -> 27, sem regex: so as letras iniciais importam.
+    idx = 0
+    for ch in ref:
+        o = ord(ch)
+        if o < 65 or o > 90:
+            break
+        idx = idx * 26 + (o - 64)
+    return idx - 1
+
+
+def _text_of(elem: ET.Element) -> str:
+    # Rich text (<r><t>..</t></r>) vira a concatenacao dos runs; ignora rPh (fonetica).
+    parts = []
+    for child in elem:
+        if child.tag == _TEXT:
+            parts.append(child.text or "")
+        elif child.tag != _PHONETIC:
+            for t in child.iter(_TEXT):
+                parts.append(t.text or "")
+    return "".join(parts)
+
+
+def read_shared_strings(zf: zipfile.ZipFile) -> List[str]:
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    out: List[str] = []
+    with zf.open("xl/sharedStrings.xml") as f:
+        for _, elem in ET.iterparse(f, events=("end",)):
+            if elem.tag == _SI:
+                out.append(_text_of(elem))
+                elem.clear()
+    return out
+
+
+def _resolve_target(target: str) -> str:
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join("xl", target))
+
+
+def sheet_paths(zf: zipfile.ZipFile) -> Dict[str, str]:
+    names = set(zf.namelist())
+    rels: Dict[str, str] = {}
+    if "xl/_rels/workbook.xml.rels" in names:
+        root = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+        for rel in root.iter(_RELATIONSHIP):
+            rel_id = rel.get("Id")
+            target = rel.get("Target")
+            if rel_id and target:
+                rels[rel_id] = _resolve_target(target)
+
+    out: Dict[str, str] = {}
+    wb = ET.fromstring(zf.read("xl/workbook.xml"))
+    for sheet in wb.iter(_SHEET):
+        name = sheet.get("name")
+        if not name:
+            continue
+        path = rels.get(sheet.get(_REL_ID) or "")
+        if not path:
+            # Planilhas sem rels: cai no padrao antigo sheet{sheetId}.xml
+            sheet_id = sheet.get("sheetId")
+            if sheet_id and sheet_id.isdigit():
+                path = f"xl/worksheets/sheet{sheet_id}.xml"
+        if path and path in names:
+            out[name] = path
+    return out
+
+
+def sheet_path_by_name(zf: zipfile.ZipFile, name: str) -> Optional[str]:
+    return sheet_paths(zf).get(name)
+
+
+def iter_rows(zf: zipfile.ZipFile, sheet_path: str, shared_strings: Optional[List[str]] = None) -> Iterator[List[str]]:
+    """
+    Le a aba em streaming (iterparse) e devolve uma lista de strings por linha.
+    Linhas sem celulas sao ignoradas; colunas ausentes viram "".
+    """
+    shared = shared_strings if shared_strings is not None else []
+    with zf.open(sheet_path) as f:
+        parent: Optional[ET.Element] = None
+        for event, elem in ET.iterparse(f, events=("start", "end")):
+            tag = elem.tag
+            if event == "start":
+                if tag == _SHEET_DATA:
+                    parent = elem
+                continue
+            if tag != _ROW:
+                continue
+
+            row: List[str] = []
+            last = -1
+            for c in elem.iter(_CELL):
+                ref = c.get("r")
+                idx = _ref_to_idx(ref) if ref else last + 1
+                if idx < 0:
+                    continue
+                kind = c.get("t")
+                if kind == "inlineStr":
+                    inline = c.find(_INLINE)
+                    value = _text_of(inline) if inline is not None else ""
+                else:
+                    v = c.find(_VALUE)
+                    value = (v.text or "") if v is not None else ""
+                    if kind == "s" and value:
+                        try:
+                            value = shared[int(value)]
+                        except (ValueError, IndexError):
+                            pass
+                if idx >= len(row):
+                    row.extend([""] * (idx + 1 - len(row)))
+                row[idx] = value
+                last = idx
+
+            elem.clear()
+            if parent is not None:
+                parent.clear()
+            if row:
+                yield row
+
+
+def iter_sheet_rows(zf: zipfile.ZipFile, name: str) -> Iterator[List[str]]:
+    path = sheet_path_by_name(zf, name)
+    if not path:
+        raise FileNotFoundError(f"Aba {name} nao encontrada no XLSX.")
+    return iter_rows(zf, path, read_shared_strings(zf))
+
+
+def open_sheet_rows(xlsx_path: str, name: str) -> Iterator[List[str]]:
+    # O zip fica aberto enquanto o gerador estiver vivo; fecha ao terminar.
+    with zipfile.ZipFile(xlsx_path, "r") as zf:
+        yield from iter_sheet_rows(zf, name)
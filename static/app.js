@@ -13,6 +13,7 @@ const state = {
 const bracketState = {
   rounds: [],
   pendingByes: [],
+  key: "",
 };
 
 const BUILTIN_PRESETS = {
@@ -108,7 +109,8 @@ function poolToPreset(dataset, pool) {
     label,
     hero: { kicker, title, subtitle },
     defaults: pool.defaults || {},
-    filters: { include_team_ids: pool.include_team_ids || [] },
+    poolKey: String(pool.key || "").trim(),
+    filters: {},
   };
 }
 
@@ -643,10 +645,12 @@ async function drawNow() {
   const balanceMode = $("balanceSelect")?.value || "random";
   const format = $("formatSelect")?.value || "bracket";
   const exclude = getExcludeTeams();
+  const activePreset = PRESETS[state.preset];
 
   const payload = {
     dataset: state.dataset,
     participants: state.participants,
+    preset: activePreset?.poolKey && activePreset.dataset === state.dataset ? activePreset.poolKey : undefined,
     filters,
     balance_mode: balanceMode,
     avoid_repeat: exclude.length > 0,
@@ -817,6 +821,7 @@ function resetBracket() {
 
 function buildBracket(drawRows, balanceMode) {
   resetBracket();
+  bracketState.key = `${Date.now().toString(36)}${Math.random().toString(36).slice(2, 8)}`;
 
   const entries = (drawRows || []).map((row) => ({
     participant: row.participant,
@@ -975,6 +980,20 @@ function applyScoreWinner(match) {
   match.winner = scoreA > scoreB ? "a" : "b";
 }
 
+function reportRatingResult(match, ref) {
+  // Placar confirmado vira evento no ranking dos jogadores; o ref evita contar o mesmo jogo duas vezes.
+  if (!match.a?.participant || !match.b?.participant || !match.winner) return;
+  if (match.scoreA == null || match.scoreB == null) return;
+  fetch("/api/ratings/results", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({
+      source: "bracket",
+      results: [{ a: match.a.participant, b: match.b.participant, score: [match.scoreA, match.scoreB], ref }],
+    }),
+  }).catch(() => {});
+}
+
 function swapHomeAway() {
   if (!bracketState.rounds.length) return;
   const round = bracketState.rounds[bracketState.rounds.length - 1];
@@ -1119,6 +1138,7 @@ function renderBracket() {
       applyBtn.textContent = "Confirmar";
       applyBtn.onclick = () => {
         applyScoreWinner(match);
+        reportRatingResult(match, `${bracketState.key}:${rIdx}:${mIdx}`);
         renderBracket();
         maybeAdvance(rIdx);
       };
@@ -1160,7 +1180,7 @@ async function runRoundRobin() {
     res = await fetch("/api/round_robin", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ draw: state.lastDraw.draw || [] }),
+      body: JSON.stringify({ draw: state.lastDraw.draw || [], format: "indexed" }),
     });
   } catch {
     showError("Falha ao gerar todos contra todos.");
@@ -1174,7 +1194,9 @@ async function runRoundRobin() {
   }
 
   rrMeta.textContent = `${data.players} jogadores · ${data.total_matches} partidas`;
-  (data.matches || []).forEach((m, idx) => {
+  const people = data.participants || [];
+  const matches = (data.rounds || []).flatMap((r) => r.matches.map(([a, b]) => ({ a: people[a], b: people[b] })));
+  matches.forEach((m, idx) => {
     const tr = document.createElement("tr");
     const cells = [
       idx + 1,
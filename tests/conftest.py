@@ -0,0 +1,7 @@
+import os
+import sys
+import tempfile
+
+# Banco descartavel: importar o app cria as tabelas em HISTORY_DB, nunca no historico real.
+os.environ.setdefault("HISTORY_DB", os.path.join(tempfile.mkdtemp(prefix="history-"), "history.sqlite3"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,97 @@
+import random
+import sqlite3
+
+import pytest
+
+import app as webapp
+from services.bracket import MAX_ENTRANTS, OPEN, Bracket, replay, seed_order
+
+
+def _random_ops(bracket, rng, count):
+    ops = []
+    for _ in range(count):
+        ready = [n for n in range(1, bracket.size) if bracket.slots[2 * n] >= 0 and bracket.slots[2 * n + 1] >= 0]
+        node = rng.choice(ready)
+        side = rng.choice((0, 1, -1))
+        bracket.apply(node, side)
+        ops.append([node, side])
+    return ops
+
+
+@pytest.mark.parametrize("entrants", [2, 5, 8, 13])
+def test_replay_matches_live_tree(entrants):
+    rng = random.Random(entrants)
+    order = seed_order([rng.randint(60, 90) for _ in range(entrants)])
+    live = Bracket(entrants, order)
+    ops = _random_ops(live, rng, 40)
+    assert replay(entrants, order, ops).slots == live.slots
+    # Replay em duas partes (cache do processo + ops que faltam) da no mesmo.
+    partial = replay(entrants, order, ops[:17])
+    for node, side in ops[17:]:
+        partial.apply(node, side)
+    assert partial.slots == live.slots
+
+
+def test_clearing_result_reopens_later_rounds():
+    bracket = Bracket(4, [0, 1, 2, 3])
+    bracket.apply(2, 0)
+    bracket.apply(3, 0)
+    bracket.apply(1, 0)
+    assert bracket.champion() is not None
+    bracket.apply(2, -1)
+    assert bracket.slots[2] == OPEN and bracket.slots[1] == OPEN
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(webapp, "LIVE_CACHE_SIZE", 1)
+    return webapp.app.test_client()
+
+
+def test_evicted_bracket_reloads_from_op_log(client):
+    draw = [{"team_name": f"T{i}", "overall": 90 - i} for i in range(8)]
+    first = client.post("/api/brackets", json={"draw": draw}).get_json()
+    node = next(m["node"] for m in first["rounds"][0]["matches"])
+    ok = client.post(f"/api/brackets/{first['id']}/ops", json={"seq": 0, "ops": [[node, 1]]})
+    assert ok.status_code == 200
+    expected = client.get(f"/api/brackets/{first['id']}").get_json()
+
+    other = client.post("/api/brackets", json={"draw": draw}).get_json()
+    assert first["id"] not in webapp._BRACKETS and other["id"] in webapp._BRACKETS
+
+    again = client.get(f"/api/brackets/{first['id']}").get_json()
+    assert again == expected and again["seq"] == 1
+    stale = client.post(f"/api/brackets/{first['id']}/ops", json={"seq": 0, "ops": [[node, 0]]})
+    assert stale.status_code == 409
+
+
+def test_failed_write_leaves_cache_on_the_log():
+    client = webapp.app.test_client()
+    draw = [{"team_name": f"T{i}", "overall": 90 - i} for i in range(4)]
+    created = client.post("/api/brackets", json={"draw": draw}).get_json()
+    node = created["rounds"][0]["matches"][0]["node"]
+    before = webapp.bracket_state(created["id"], lambda b: list(b.slots))
+
+    con = webapp.db_connect()
+    con.execute("CREATE TRIGGER fail_ops BEFORE INSERT ON bracket_ops BEGIN SELECT RAISE(ABORT, 'disco cheio'); END")
+    con.commit()
+    try:
+        with pytest.raises(sqlite3.Error):
+            webapp.append_bracket_ops(created["id"], 0, [[node, 0]])
+    finally:
+        con.execute("DROP TRIGGER fail_ops")
+        con.commit()
+        con.close()
+    assert webapp.bracket_state(created["id"], lambda b: list(b.slots)) == before
+    assert webapp.append_bracket_ops(created["id"], 0, [[node, 0]])[0] == 1
+
+
+def test_create_tolerates_bad_ratings_and_caps_entrants():
+    client = webapp.app.test_client()
+    draw = [{"team_name": "A", "overall": "n/a"}, {"team_name": "B", "overall": "81.5"}, {"team_name": "C"}, "D"]
+    created = client.post("/api/brackets", json={"draw": draw})
+    assert created.status_code == 200
+    assert created.get_json()["participants"] == draw
+
+    big = [{"team_name": f"T{i}", "overall": 70} for i in range(MAX_ENTRANTS + 1)]
+    assert client.post("/api/brackets", json={"draw": big}).status_code == 400
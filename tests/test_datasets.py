@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+from services import datasets
+from services.changelog import changelog_path_for, read_changelog, write_csv, write_incremental
+
+HEADERS = ["team_id", "team_name", "gender", "overall", "attack", "midfield", "defence", "is_valid"]
+KEY = "t_changelog"
+
+
+def _row(team_id, name, overall):
+    return {
+        "team_id": team_id,
+        "team_name": name,
+        "gender": "MEN",
+        "overall": overall,
+        "attack": overall,
+        "midfield": overall,
+        "defence": overall,
+        "is_valid": "1",
+    }
+
+
+def _touch(path, step):
+    # Garante carimbo novo mesmo em sistemas de arquivos com mtime grosso.
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + step * 1_000_000_000))
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = str(tmp_path / "teams.csv")
+    datasets.DATASETS[KEY] = {"label": "Teste", "path": path, "sport": "soccer"}
+    seen = []
+    listener = datasets.on_dataset_change(lambda key, changelog: seen.append(changelog) if key == KEY else None)
+    yield path, seen
+    datasets.DATASETS.pop(KEY, None)
+    datasets._CACHE.pop(KEY, None)
+    datasets._LISTENERS.remove(listener)
+
+
+def _fresh(path):
+    entry = datasets._read_entry(path, datasets._file_stamp(path))
+    return entry["version"], [dict(r) for r in entry["rows"]]
+
+
+def test_changelog_patch_matches_fresh_read(dataset):
+    path, seen = dataset
+    write_incremental(path, HEADERS, [_row("1", "A", 70), _row("2", "B", 71), _row("3", "C", 72)])
+    datasets.load_rows(KEY)
+
+    # Alterado, removido e um novo no meio do arquivo.
+    write_incremental(path, HEADERS, [_row("1", "A", 80), _row("9", "N", 60), _row("3", "C", 72)])
+    assert read_changelog(path)["csv_stamp"] == list(datasets._file_stamp(path))
+
+    version, rows = datasets.load_versioned(KEY)
+    assert seen and seen[-1] is not None, "esperava aplicar o changelog"
+    assert (version, [dict(r) for r in rows]) == _fresh(path)
+    assert [r["team_id"] for r in rows] == ["1", "9", "3"]
+
+
+def test_full_write_discards_changelog(dataset):
+    path, seen = dataset
+    write_incremental(path, HEADERS, [_row("1", "A", 70)])
+    write_incremental(path, HEADERS, [_row("1", "A", 70), _row("2", "B", 71)])
+    assert os.path.exists(changelog_path_for(path))
+    datasets.load_rows(KEY)
+
+    write_csv(path, HEADERS, [_row("5", "E", 50)])
+    _touch(path, 2)
+    assert not os.path.exists(changelog_path_for(path))
+    version, rows = datasets.load_versioned(KEY)
+    assert seen[-1] is None
+    assert (version, [dict(r) for r in rows]) == _fresh(path)
+
+
+def test_stale_changelog_is_ignored(dataset):
+    path, seen = dataset
+    write_incremental(path, HEADERS, [_row("1", "A", 70)])
+    datasets.load_rows(KEY)
+    write_incremental(path, HEADERS, [_row("1", "A", 75)])
+
+    # Arquivo editado a mao depois do changelog: o carimbo nao bate mais.
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        f.write("2,B,MEN,60,60,60,60,1\r\n")
+    _touch(path, 3)
+    version, rows = datasets.load_versioned(KEY)
+    assert seen[-1] is None
+    assert (version, [dict(r) for r in rows]) == _fresh(path)
+    assert [r["team_id"] for r in rows] == ["1", "2"]
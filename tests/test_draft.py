@@ -0,0 +1,29 @@
+import sqlite3
+
+import pytest
+
+import app as webapp
+
+
+def _picks(draft_id):
+    return webapp.draft_state(draft_id, lambda d: list(d.picks))
+
+
+def test_failed_write_leaves_cache_on_the_log():
+    pool = [{"team_id": str(i), "team_name": f"T{i}", "overall": 90 - i} for i in range(6)]
+    draft_id, _ = webapp.create_draft("fc25", ["A", "B"], 2, pool)
+    seq, _ = webapp.append_draft_ops(draft_id, 0, [{"team": 0}])
+    before = _picks(draft_id)
+
+    con = webapp.db_connect()
+    con.execute("CREATE TRIGGER fail_ops BEFORE INSERT ON draft_ops BEGIN SELECT RAISE(ABORT, 'disco cheio'); END")
+    con.commit()
+    try:
+        with pytest.raises(sqlite3.Error):
+            webapp.append_draft_ops(draft_id, seq, [{"team": 1}, {"undo": True}, {"best": "overall"}])
+    finally:
+        con.execute("DROP TRIGGER fail_ops")
+        con.commit()
+        con.close()
+    assert _picks(draft_id) == before
+    assert webapp.append_draft_ops(draft_id, seq, [{"team": 1}])[0] == seq + 1
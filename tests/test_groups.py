@@ -0,0 +1,78 @@
+import itertools
+import random
+from collections import Counter
+
+import pytest
+
+import app as webapp
+from services.groups import MAX_TEAMS, GroupDraw, draw_groups
+
+
+def _rows(countries, seed=0):
+    rng = random.Random(seed)
+    return [{"team_name": f"T{i}", "overall": rng.randint(60, 90), "country": c} for i, c in enumerate(countries)]
+
+
+def _valid(rows, groups, out):
+    placed = sorted(t for g in out for t in g)
+    if placed != list(range(len(rows))) or len(out) != groups:
+        return False
+    return all(len({rows[t]["country"] for t in g}) == len(g) for g in out)
+
+
+def _brute(engine, rows):
+    """Todos os sorteios validos: cada pote e uma injecao pote -> grupos."""
+    found = []
+    per_pot = [itertools.permutations(range(engine.groups), len(pot)) for pot in engine.pots]
+    for choice in itertools.product(*per_pot):
+        out = [[] for _ in range(engine.groups)]
+        for pot, targets in zip(engine.pots, choice):
+            for team, g in zip(pot, targets):
+                out[g].append(team)
+        if _valid(rows, engine.groups, out):
+            found.append(tuple(tuple(g) for g in out))
+    return found
+
+
+@pytest.mark.parametrize(
+    "countries,groups",
+    [("AABBCC", 3), ("AAABBC", 3), ("ABCDEFG", 3), ("AABBCCDD", 4), ("AAAB", 2), ("AAAA", 2)],
+)
+def test_count_matches_brute_force(countries, groups):
+    rows = _rows(countries)
+    engine = GroupDraw(rows, groups)
+    assert engine.count() == len(_brute(engine, rows))
+
+
+def test_sample_is_uniform():
+    rows = _rows("AABBCC", 1)
+    engine = GroupDraw(rows, 3)
+    outcomes = _brute(engine, rows)
+    rng = random.Random(7)
+    draws = 300 * len(outcomes)
+    seen = Counter(tuple(tuple(g) for g in engine.sample(rng)) for _ in range(draws))
+    assert set(seen) == set(outcomes)
+    assert all(abs(c - 300) < 90 for c in seen.values()), seen
+
+
+def test_fallbacks_respect_constraints():
+    rows = _rows("AABBCCDDEE" * 2, 2)
+    engine = GroupDraw(rows, 5)
+    rng = random.Random(3)
+    assert _valid(rows, 5, engine.rejection_sample(rng, 2.0))
+    assert _valid(rows, 5, engine.search(rng, 2.0))
+
+
+def test_large_draw_does_not_recurse():
+    rows = [{"team_name": str(i), "overall": 60 + i % 30, "country": f"C{i % 40}"} for i in range(600)]
+    out = draw_groups(rows, 300, seed="big", time_budget=3.0)
+    assert _valid(rows, 300, out["groups"])
+
+
+def test_impossible_draw_is_400():
+    client = webapp.app.test_client()
+    res = client.post("/api/groups", json={"draw": _rows("AAAA"), "groups": 2})
+    assert res.status_code == 400 and res.get_json()["error"]
+    big = [{"team_name": str(i), "overall": 70} for i in range(MAX_TEAMS + 1)]
+    res = client.post("/api/groups", json={"draw": big, "groups": 2})
+    assert res.status_code == 400 and str(MAX_TEAMS) in res.get_json()["error"]
@@ -0,0 +1,114 @@
+import pytest
+
+import app as webapp
+from services.ratings import (
+    ELO_START,
+    RD_START,
+    PlayerState,
+    apply_match,
+    leaderboard,
+    parse_result,
+    player_history,
+    player_key,
+    rebuild,
+    record_results,
+)
+
+
+@pytest.fixture
+def con():
+    con = webapp.db_connect(isolation_level=None)
+    for table in ("rating_history", "player_ratings", "rating_events"):
+        con.execute(f"DELETE FROM {table}")
+    yield con
+    con.close()
+
+
+def _ratings(con):
+    rows = con.execute("SELECT player, elo, glicko, rd, games, wins, draws, losses FROM player_ratings ORDER BY player")
+    return [tuple(round(v, 6) if isinstance(v, float) else v for v in r) for r in rows]
+
+
+def test_player_key_folds_accents_and_case():
+    assert player_key("  José   da SILVA ") == player_key("jose da silva") == "jose da silva"
+
+
+def test_apply_match_is_zero_sum_and_tightens_rd():
+    a, b = PlayerState("a", "A"), PlayerState("b", "B")
+    delta_a, delta_b = apply_match(a, b, 1.0, 1000)
+    assert delta_a == pytest.approx(16.0) and delta_b == -delta_a
+    assert a.elo + b.elo == pytest.approx(2 * ELO_START)
+    assert a.glicko > 1500 > b.glicko and a.rd < RD_START and b.rd < RD_START
+    apply_match(a, b, 0.5, 2000)
+    assert (a.wins, a.draws, b.losses, b.draws, a.games) == (1, 1, 1, 1, 2)
+
+
+def test_parse_result_variants():
+    assert parse_result({"a": "x", "b": "y", "score": [2, 2]})[2] == 0.5
+    assert parse_result({"a": "x", "b": "y", "result": 0, "ref": "m1"}) == ("x", "y", 0.0, "m1")
+    with pytest.raises(ValueError):
+        parse_result({"a": "Ana", "b": "ana ", "result": 1})
+
+
+def test_ref_is_recorded_once(con):
+    first = record_results(con, [("Ana", "Bia", 1.0, "b1:3")], "bracket")
+    again = record_results(con, [("Ana", "Bia", 1.0, "b1:3")], "bracket")
+    assert (first["recorded"], again["recorded"], again["duplicates"]) == (1, 0, 1)
+    assert con.execute("SELECT games FROM player_ratings WHERE player = 'ana'").fetchone()[0] == 1
+
+
+def test_rebuild_matches_incremental(con):
+    names = [f"P{i}" for i in range(12)]
+    for r in range(5):
+        games = [(names[i], names[(i + r + 1) % 12], (0.0, 0.5, 1.0)[(i + r) % 3], None) for i in range(12)]
+        record_results(con, games, "manual")
+    incremental = _ratings(con)
+    assert rebuild(con, batch=7) == {"events": 60, "players": 12}
+    assert _ratings(con) == incremental
+
+
+@pytest.mark.parametrize("by", ["elo", "glicko"])
+def test_leaderboard_cursor_pages_cover_everyone_once(con, by):
+    games = [(f"W{i}", f"L{i}", 1.0, None) for i in range(5)]
+    # Empates: quatro jogadores parados em 1500 desempatam pela chave.
+    games += [("T1", "T2", 0.5, None), ("T3", "T4", 0.5, None)]
+    record_results(con, games, "manual")
+    full = leaderboard(con, by, "", 200)["rows"]
+    assert len(full) == 14
+
+    seen, cursor = [], ""
+    while True:
+        page = leaderboard(con, by, cursor, 3)
+        seen.extend(page["rows"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert seen == full
+    assert [r[by] for r in full] == sorted((r[by] for r in full), reverse=True)
+
+
+def test_player_history_pages_newest_first(con):
+    for i in range(7):
+        record_results(con, [("Ana", f"Op{i}", 1.0, None)], "manual")
+    full = player_history(con, "ANA", "", 50)
+    assert [g["opponent"] for g in full["history"]] == [f"Op{i}" for i in range(6, -1, -1)]
+
+    seen, cursor = [], ""
+    while True:
+        page = player_history(con, "ana", cursor, 2)
+        seen.extend(page["history"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert seen == full["history"]
+    assert player_history(con, "ninguem") is None
+
+
+def test_bad_cursor_is_400(con):
+    record_results(con, [("Ana", "Bia", 1.0, None)], "manual")
+    with pytest.raises(ValueError):
+        leaderboard(con, "elo", "bm90LWpzb24", 10)
+    client = webapp.app.test_client()
+    assert client.get("/api/ratings/leaderboard?cursor=%%%").status_code == 400
+    glicko_cursor = leaderboard(con, "glicko", "", 1)["next_cursor"]
+    assert client.get(f"/api/ratings/leaderboard?by=elo&cursor={glicko_cursor}").status_code == 400
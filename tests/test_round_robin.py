@@ -0,0 +1,65 @@
+import json
+from collections import Counter
+
+import pytest
+
+import app as webapp
+from services.draws import round_robin_page, round_robin_rounds, round_robin_size
+
+
+@pytest.mark.parametrize("players", [2, 3, 4, 7, 10, 21])
+def test_every_pair_meets_once(players):
+    rounds = list(round_robin_rounds(players))
+    total_rounds, total_matches = round_robin_size(players)
+    assert len(rounds) == total_rounds
+    pairs = [frozenset(m) for r in rounds for m in r]
+    assert len(pairs) == total_matches == len(set(pairs))
+    for r in rounds:
+        seen = [i for m in r for i in m]
+        assert len(seen) == len(set(seen)), "jogador duas vezes na mesma rodada"
+        # Impar: exatamente um folga por rodada.
+        assert len(seen) == players - players % 2
+
+
+@pytest.mark.parametrize("players", [4, 6, 9, 16])
+def test_home_away_balanced(players):
+    home = Counter(a for r in round_robin_rounds(players) for a, _ in r)
+    away = Counter(b for r in round_robin_rounds(players) for _, b in r)
+    assert all(abs(home[i] - away[i]) <= 1 for i in range(players))
+
+
+def test_double_round_robin_mirrors_first_leg():
+    players = 6
+    rounds = list(round_robin_rounds(players, double=True))
+    half = len(rounds) // 2
+    assert [[(b, a) for a, b in r] for r in rounds[:half]] == rounds[half:]
+    assert round_robin_size(players, True) == (len(rounds), players * (players - 1))
+
+
+def test_pages_slice_the_full_schedule():
+    full = list(round_robin_rounds(9, True))
+    got = []
+    start = 1
+    while True:
+        page = round_robin_page(9, True, start, 4)
+        if not page["rounds"]:
+            break
+        assert page["rounds"][0]["round"] == start
+        got.extend(r["matches"] for r in page["rounds"])
+        start += 4
+    assert got == [list(r) for r in full]
+
+
+def test_api_indexed_and_ndjson_match():
+    client = webapp.app.test_client()
+    draw = [{"participant": f"P{i}", "team_name": f"T{i}"} for i in range(5)]
+    indexed = client.post("/api/round_robin", json={"draw": draw, "format": "indexed"}).get_json()
+    assert indexed["participants"] == draw
+    second = client.post("/api/round_robin", json={"draw": draw, "format": "indexed", "round_from": 2, "rounds": 1})
+    assert "participants" not in second.get_json()
+    assert second.get_json()["rounds"] == indexed["rounds"][1:2]
+
+    lines = client.post("/api/round_robin", json={"draw": draw, "format": "ndjson"}).get_data().splitlines()
+    head, body = json.loads(lines[0]), [json.loads(line) for line in lines[1:]]
+    assert head["total_rounds"] == len(body) == indexed["total_rounds"]
+    assert [r["matches"] for r in body] == [r["matches"] for r in indexed["rounds"]]
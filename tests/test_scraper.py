@@ -0,0 +1,113 @@
+import csv
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import build_teams_dataset
+from services.fetcher import CachedFetcher
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "fifacm")
+PAGES = {
+    "/25/leagues": "leagues.html",
+    "/25/league/13/premier-league": "premier-league.html",
+    "/25/league/53/laliga": "laliga.html",
+}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Servidor de fixtures com ETag: responde 304 quando o cliente ja tem o corpo.
+    def do_GET(self):
+        self.server.hits.append(self.path)
+        if self.path == "/blocked":
+            self.send_response(403)
+            self.end_headers()
+            return
+        name = PAGES.get(self.path)
+        if name is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        with open(os.path.join(FIXTURES, name), "rb") as f:
+            body = f.read()
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if self.headers.get("If-None-Match") == etag:
+            self.server.not_modified += 1
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.hits, httpd.not_modified = [], 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd, f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _build(tmp_path, base_url):
+    out = str(tmp_path / "teams.csv")
+    count = build_teams_dataset.build_dataset(
+        output_csv=out,
+        sleep_s=0,
+        workers=2,
+        base_url=base_url,
+        cache_dir=str(tmp_path / "cache"),
+        checkpoint_dir=str(tmp_path / "checkpoints"),
+        max_age_s=0,
+    )
+    with open(out, "r", encoding="utf-8", newline="") as f:
+        return count, list(csv.DictReader(f))
+
+
+def test_scrape_fixture_site(server, tmp_path):
+    httpd, base_url = server
+    count, rows = _build(tmp_path, base_url)
+
+    assert count == 4
+    assert [r["team_name"] for r in rows] == ["Real Madrid", "Manchester City", "Arsenal", "FC Barcelona"]
+    city = rows[1]
+    assert (city["team_id"], city["league"], city["overall"], city["attack"], city["midfield"], city["defence"]) == (
+        "10",
+        "Premier League",
+        "85",
+        "86",
+        "85",
+        "84",
+    )
+    assert city["team_url"] == f"{base_url}/25/team/10/manchester-city"
+    # Liga quebrada (404) vira aviso, nao derruba o build.
+    assert "/25/league/99/broken" in httpd.hits
+
+
+def test_rescrape_revalidates_with_etag(server, tmp_path):
+    httpd, base_url = server
+    _, first = _build(tmp_path, base_url)
+    httpd.hits.clear()
+
+    _, second = _build(tmp_path, base_url)
+    assert second == first
+    # Indice + 2 ligas voltam 304 e reaproveitam cache/checkpoint.
+    assert httpd.not_modified == 3
+
+
+def test_fetcher_reports_403(server, tmp_path):
+    _, base_url = server
+    fetcher = CachedFetcher({}, cache_dir=str(tmp_path / "cache"), rate=1000)
+    with pytest.raises(RuntimeError, match="403"):
+        fetcher.get(f"{base_url}/blocked")
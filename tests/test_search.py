@@ -0,0 +1,19 @@
+from services.search import TrigramIndex
+
+NAMES = ["Bari", "Barrow", "Barnsley", "FC Barcelona", "Barcelona SC Guayaquil", "Real Madrid", "Madrid CFF"]
+
+
+def _search(query, limit=10):
+    index = TrigramIndex([{"team_name": n} for n in NAMES])
+    return [NAMES[i] for i, _ in index.search(query, limit)]
+
+
+def test_word_prefix_beats_short_trigram_match():
+    assert _search("barca", 2) == ["FC Barcelona", "Barcelona SC Guayaquil"]
+    assert _search("madr", 2) == ["Madrid CFF", "Real Madrid"]
+
+
+def test_full_prefix_ranks_first():
+    top = _search("bar", 3)
+    assert top[0] == "Bari" and "FC Barcelona" not in top
+    assert _search("fc bar", 1) == ["FC Barcelona"]
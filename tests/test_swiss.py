@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from services import swiss
+
+
+def _play(players, rounds_count, seed):
+    rng = random.Random(seed)
+    rounds, seen, rematches = [], set(), 0
+    for _ in range(rounds_count):
+        out = swiss.pair_round(players, rounds)
+        placed = [i for pair in out["pairs"] for i in pair] + ([out["bye"]] if out["bye"] is not None else [])
+        assert sorted(placed) == list(range(players))
+        games = []
+        for a, b in out["pairs"]:
+            key = frozenset((a, b))
+            rematches += key in seen
+            seen.add(key)
+            games.append((a, b, rng.choice((0.0, 0.5, 1.0))))
+        if out["bye"] is not None:
+            games.append((out["bye"], None, None))
+        rounds.append(games)
+    return rounds, rematches
+
+
+@pytest.mark.parametrize("players", [8, 9, 16])
+def test_no_rematch_while_possible(players):
+    _, rematches = _play(players, players - 1 if players % 2 == 0 else 5, players)
+    assert rematches == 0
+
+
+def test_fallback_avoids_rematches(monkeypatch):
+    # Busca curta: a partir de algumas rodadas todo emparelhamento passa pela saida gulosa + trocas.
+    monkeypatch.setattr(swiss, "MAX_STEPS", 50)
+    _, rematches = _play(40, 25, 1)
+    assert rematches == 0
+
+
+def test_fallback_repairs_greedy_dead_end():
+    # Guloso na ordem: 0-1, 2-3 e sobra 4-5 ja jogado; a troca resolve.
+    opponents = [set() for _ in range(6)]
+    for a, b in ((4, 5), (0, 2), (1, 3)):
+        opponents[a].add(b)
+        opponents[b].add(a)
+    pairs = swiss._pair_fewest_rematches(list(range(6)), opponents)
+    assert sorted(x for p in pairs for x in p) == list(range(6))
+    assert not any(b in opponents[a] for a, b in pairs)
+    assert all(a < b for a, b in pairs)
+
+
+def test_byes_rotate():
+    rounds, _ = _play(7, 7, 3)
+    byes = [a for games in rounds for a, b, _ in games if b is None]
+    assert len(set(byes)) == 7
@@ -0,0 +1,46 @@
+import pytest
+
+import app as webapp
+from services import datasets
+from services.changelog import write_csv
+
+KEY = "u_0123456789ab"
+HEADERS = ["team_id", "team_name", "team_type", "gender", "overall", "attack", "midfield", "defence", "is_valid"]
+
+
+@pytest.fixture
+def uploaded(tmp_path, monkeypatch):
+    monkeypatch.setattr(datasets, "USER_DIR", str(tmp_path))
+    rows = [
+        {"team_id": str(i), "team_name": f"T{i}", "team_type": "CLUB", "gender": "MEN", "overall": 70 + i,
+         "attack": 70, "midfield": 70, "defence": 70, "is_valid": "1"}
+        for i in range(4)
+    ]
+    write_csv(datasets.user_dataset_csv(KEY), HEADERS, rows)
+    datasets.register_dataset(KEY, "Enviado", 424242, "soccer")
+    yield
+    datasets.unregister_dataset(KEY)
+
+
+@pytest.mark.parametrize(
+    "method,url,body",
+    [
+        ("get", f"/api/stats?dataset={KEY}", None),
+        ("get", f"/api/facets?dataset={KEY}", None),
+        ("get", f"/api/teams/search?dataset={KEY}&q=t1", None),
+        ("post", "/api/pool_preview", {"dataset": KEY}),
+        ("post", "/api/draw", {"dataset": KEY, "participants": ["A", "B"]}),
+    ],
+)
+def test_user_dataset_is_private(uploaded, method, url, body):
+    client = webapp.app.test_client()
+    assert getattr(client, method)(url, json=body).status_code == 404
+
+    with client.session_transaction() as sess:
+        sess["user_id"] = 424242
+    assert getattr(client, method)(url, json=body).status_code == 200
+
+
+def test_build_jobs_read_without_session(uploaded):
+    _, rows = datasets.load_versioned(KEY)
+    assert len(rows) == 4